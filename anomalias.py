@@ -0,0 +1,280 @@
+# anomalias.py
+"""
+Detecção de anomalias de custo sobre `manutencoes`, toda vetorizada (pandas groupby/rolling):
+
+- "preco":     preço unitário acima de ANOMALIA_FATOR_PRECO x a mediana das últimas
+               ANOMALIA_JANELA_PRECO compras do mesmo `cod_peca` (sem contar a própria linha);
+- "gasto":     gasto mensal de um veículo acima de ANOMALIA_FATOR_GASTO x a mediana dos seus
+               ANOMALIA_JANELA_MESES meses anteriores (e ANOMALIA_GASTO_MIN acima dela);
+- "duplicada": mesmo item lançado de novo na mesma NF (fornecedor + nf) ou na mesma SC
+               (sc + veículo), com mesma quantidade e preço.
+
+Incremental: `detectar()` só olha linhas com id acima do cursor salvo em `anomalias_estado`,
+buscando do histórico apenas o contexto necessário (últimas N compras das peças envolvidas,
+meses anteriores dos veículos envolvidos, lançamentos com as mesmas NF/SC). Edições e
+exclusões de linhas antigas não movem o cursor: use `reprocessar()`.
+
+Uso:
+    anomalias.detectar()                 # novas linhas desde a última execução
+    anomalias.listar("preco", de="2025-01")
+"""
+import json
+import time
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from config import (
+    ANOMALIA_FATOR_GASTO, ANOMALIA_FATOR_PRECO, ANOMALIA_GASTO_MIN, ANOMALIA_JANELA_MESES,
+    ANOMALIA_JANELA_PRECO, ANOMALIA_MIN_HIST, DB_PATH,
+)
+from db import get_conn, iter_frames, run_write
+
+TABLE = "anomalias"
+ESTADO = "anomalias_estado"
+TIPOS = {"preco": "Preço acima da mediana", "gasto": "Salto no gasto mensal", "duplicada": "Lançamento duplicado"}
+
+_MES = "COALESCE(strftime('%Y-%m', data), mes, '')"
+_VALOR = "COALESCE(vlr_peca, qtd * vlr_unitario, 0)"
+_COLS = (f"id, veiculo_id, placa, data, {_MES} AS mes, sc, cod_peca, qtd, vlr_unitario, "
+         f"fornecedor, nf, {_VALOR} AS valor")
+_CHAVE_NF = ["fornecedor", "nf", "cod_peca", "qtd", "vlr_unitario"]
+_CHAVE_SC = ["sc", "veiculo_id", "cod_peca", "qtd", "vlr_unitario"]
+
+_schema_ready: set = set()
+
+def _ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            tipo TEXT NOT NULL,
+            chave TEXT NOT NULL,            -- id da linha ("preco"/"duplicada") ou veiculo_id|mes ("gasto")
+            manutencao_id INTEGER,
+            veiculo_id INTEGER,
+            placa TEXT,
+            mes TEXT,
+            cod_peca TEXT,
+            fornecedor TEXT,
+            valor REAL,                     -- preço unitário / gasto do mês
+            referencia REAL,                -- mediana de comparação / id do lançamento original
+            razao REAL,
+            detectado_em TEXT NOT NULL,
+            PRIMARY KEY (tipo, chave)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ix_anomalias_mes ON {TABLE}(mes);
+        CREATE TABLE IF NOT EXISTS {ESTADO} (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+        -- contexto do incremental: últimas compras da peça, meses do veículo, mesmas NF/SC
+        CREATE INDEX IF NOT EXISTS ix_manutencoes_cod_peca ON manutencoes(cod_peca, data);
+        CREATE INDEX IF NOT EXISTS ix_manutencoes_veiculo ON manutencoes(veiculo_id);
+        CREATE INDEX IF NOT EXISTS ix_manutencoes_nf ON manutencoes(nf);
+        CREATE INDEX IF NOT EXISTS ix_manutencoes_sc ON manutencoes(sc);
+        """)
+    _schema_ready.add(str(DB_PATH))
+
+def _frame(sql: str, params=()) -> pd.DataFrame:
+    partes = list(iter_frames(sql, params, size=200_000, read=False))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+def _json(valores) -> str:
+    return json.dumps([v for v in pd.unique(valores) if v is not None and v == v], default=str)
+
+# ---------- detectores (recebem as linhas novas + o contexto, marcadas por "novo") ----------
+def _precos(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[df["cod_peca"].notna() & (df["vlr_unitario"] > 0)].sort_values(["cod_peca", "data", "id"], kind="stable")
+    if df.empty:
+        return df.iloc[:0]
+    anterior = df.groupby("cod_peca", sort=False)["vlr_unitario"].shift()
+    mediana = (anterior.groupby(df["cod_peca"], sort=False)
+               .rolling(ANOMALIA_JANELA_PRECO, min_periods=ANOMALIA_MIN_HIST).median()
+               .reset_index(level=0, drop=True))
+    df = df.assign(referencia=mediana)
+    alvo = df["novo"] & (df["vlr_unitario"] > ANOMALIA_FATOR_PRECO * df["referencia"])
+    return df.loc[alvo].assign(
+        tipo="preco", chave=lambda d: d["id"].astype(str), valor=lambda d: d["vlr_unitario"],
+        manutencao_id=lambda d: d["id"],
+    )
+
+def _gastos(mensal: pd.DataFrame, desde: pd.Series) -> pd.DataFrame:
+    """`mensal`: veiculo_id, placa, mes, valor; `desde`: 1º mês a reavaliar por veículo."""
+    if mensal.empty:
+        return mensal
+    mensal = mensal.sort_values(["veiculo_id", "mes"], kind="stable")
+    anterior = mensal.groupby("veiculo_id", sort=False)["valor"].shift()
+    mediana = (anterior.groupby(mensal["veiculo_id"], sort=False)
+               .rolling(ANOMALIA_JANELA_MESES, min_periods=3).median()
+               .reset_index(level=0, drop=True))
+    mensal = mensal.assign(referencia=mediana)
+    alvo = (
+        (mensal["mes"] >= mensal["veiculo_id"].map(desde))
+        & (mensal["valor"] > ANOMALIA_FATOR_GASTO * mensal["referencia"])
+        & (mensal["valor"] - mensal["referencia"] >= ANOMALIA_GASTO_MIN)
+    )
+    return mensal.loc[alvo].assign(
+        tipo="gasto", chave=lambda d: d["veiculo_id"].astype(str) + "|" + d["mes"],
+    )
+
+def _duplicadas(df: pd.DataFrame) -> pd.DataFrame:
+    achados = []
+    for chave in (_CHAVE_NF, _CHAVE_SC):
+        base = df.dropna(subset=chave[:2])
+        base = base[(base[chave[1]].astype(str) != "")].sort_values("id", kind="stable")
+        if base.empty:
+            continue
+        original = base.groupby(chave, sort=False, dropna=False)["id"].transform("min")
+        achados.append(base.assign(referencia=original).loc[lambda d: d["novo"] & (d["id"] != d["referencia"])])
+    if not achados:
+        return df.iloc[:0]
+    dup = pd.concat(achados).drop_duplicates("id")
+    return dup.assign(tipo="duplicada", chave=lambda d: d["id"].astype(str), manutencao_id=lambda d: d["id"])
+
+# ---------- execução ----------
+def _ler_cursor() -> int:
+    with get_conn() as conn:
+        row = conn.execute(f"SELECT valor FROM {ESTADO} WHERE chave = 'manutencoes';").fetchone()
+    return int(row[0]) if row else 0
+
+def _contexto(novos: pd.DataFrame, ultimo: int):
+    """Linhas antigas (id <= ultimo) necessárias p/ avaliar as novas."""
+    if not ultimo:
+        return novos.iloc[:0], novos.iloc[:0]
+    hist_preco = _frame(f"""
+        SELECT {_COLS} FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY cod_peca ORDER BY data DESC, id DESC) AS rn
+            FROM manutencoes
+            WHERE id <= ? AND cod_peca IN (SELECT value FROM json_each(?))
+        ) WHERE rn <= ?
+    """, (ultimo, _json(novos["cod_peca"]), ANOMALIA_JANELA_PRECO))
+    hist_dup = _frame(f"""
+        SELECT {_COLS} FROM manutencoes
+        WHERE id <= ? AND (nf IN (SELECT value FROM json_each(?)) OR sc IN (SELECT value FROM json_each(?)))
+    """, (ultimo, _json(novos["nf"]), _json(novos["sc"])))
+    return hist_preco, hist_dup
+
+def _mensal(novos: pd.DataFrame, ultimo: int):
+    """
+    Gasto por veículo/mês e o 1º mês a reavaliar de cada veículo. Na varredura completa
+    agrega as próprias linhas lidas; no incremental busca só os veículos com linhas novas,
+    a partir de JANELA meses antes do mês mais antigo afetado.
+    """
+    novos = novos[novos["veiculo_id"].notna() & (novos["mes"] != "")]
+    if not ultimo:
+        mensal = (novos.groupby(["veiculo_id", "mes"], sort=False)
+                  .agg(placa=("placa", "first"), valor=("valor", "sum")).reset_index())
+        return mensal, pd.Series("", index=mensal["veiculo_id"].unique())
+    desde = novos.groupby(novos["veiculo_id"].astype(int))["mes"].min()
+    if desde.empty:
+        return pd.DataFrame(), desde
+    inicio = (pd.Period(desde.min(), "M") - ANOMALIA_JANELA_MESES).strftime("%Y-%m")
+    mensal = _frame(f"""
+        SELECT veiculo_id, MAX(placa) AS placa, {_MES} AS mes, SUM({_VALOR}) AS valor
+        FROM manutencoes
+        WHERE veiculo_id IN (SELECT value FROM json_each(?)) AND {_MES} >= ?
+        GROUP BY veiculo_id, 3
+    """, (_json(desde.index), inicio))
+    return mensal, desde
+
+def _gravar(achados: pd.DataFrame, gastos_refeitos: pd.Series, ultimo_id: int, completo: bool) -> None:
+    agora = datetime.now().isoformat(timespec="seconds")
+    cols = ["tipo", "chave", "manutencao_id", "veiculo_id", "placa", "mes", "cod_peca", "fornecedor",
+            "valor", "referencia", "razao"]
+    achados = achados.reindex(columns=cols)
+    linhas = [
+        tuple(None if (isinstance(v, float) and np.isnan(v)) else (v.item() if hasattr(v, "item") else v) for v in r)
+        + (agora,)
+        for r in achados.itertuples(index=False, name=None)
+    ]
+
+    def _tx(conn):
+        if completo:
+            conn.execute(f"DELETE FROM {TABLE};")
+        elif not gastos_refeitos.empty:
+            # o gasto dos meses reavaliados é recalculado por inteiro (a mediana mudou)
+            conn.executemany(
+                f"DELETE FROM {TABLE} WHERE tipo = 'gasto' AND veiculo_id = ? AND mes >= ?;",
+                [(int(v), m) for v, m in gastos_refeitos.items()],
+            )
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO {TABLE} ({", ".join(cols)}, detectado_em)
+            VALUES ({", ".join("?" * (len(cols) + 1))});
+        """, linhas)
+        conn.execute(f"""
+            INSERT INTO {ESTADO} (chave, valor) VALUES ('manutencoes', ?)
+            ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor;
+        """, (ultimo_id,))
+    run_write(_tx)
+
+def detectar(completo: bool = False) -> dict:
+    """
+    Processa as linhas de `manutencoes` acima do cursor (todas, com `completo`) e grava as
+    anomalias encontradas. Retorna {"linhas": n, "preco": n, "gasto": n, "duplicada": n, "ms": t}.
+    """
+    _ensure_schema()
+    t0 = time.perf_counter()
+    ultimo = 0 if completo else _ler_cursor()
+    with get_conn() as conn:
+        maximo = conn.execute("SELECT COALESCE(MAX(id), 0) FROM manutencoes;").fetchone()[0]
+    resultado = {"linhas": 0, **{t: 0 for t in TIPOS}, "ms": 0.0}
+    if maximo <= ultimo:
+        return resultado
+
+    novos = _frame(f"SELECT {_COLS} FROM manutencoes WHERE id > ? AND id <= ?", (ultimo, maximo))
+    novos["novo"] = True
+    hist_preco, hist_dup = _contexto(novos, ultimo)
+    mensal, desde = _mensal(novos, ultimo)
+
+    precos = _precos(pd.concat([hist_preco.assign(novo=False), novos], ignore_index=True))
+    dups = _duplicadas(pd.concat([hist_dup.assign(novo=False), novos], ignore_index=True))
+    gastos = _gastos(mensal, desde)
+    achados = pd.concat([precos, gastos, dups], ignore_index=True)
+    if not achados.empty:
+        achados["razao"] = np.where(achados["tipo"] == "duplicada", np.nan,
+                                    achados["valor"] / achados["referencia"].replace(0, np.nan))
+    _gravar(achados, desde, maximo, completo)
+
+    resultado.update(
+        linhas=len(novos), preco=len(precos), gasto=len(gastos), duplicada=len(dups),
+        ms=round((time.perf_counter() - t0) * 1000, 1),
+    )
+    metrics.observe("anomalias.scan_ms", resultado["ms"])
+    metrics.incr("anomalias.linhas", len(novos))
+    return resultado
+
+def reprocessar() -> dict:
+    """Refaz a detecção sobre todo o histórico (após edições/exclusões ou mudança de parâmetros)."""
+    return detectar(completo=True)
+
+def listar(tipo: Optional[str] = None, de: Optional[str] = None, ate: Optional[str] = None,
+           limite: Optional[int] = 1000) -> pd.DataFrame:
+    """Anomalias gravadas, mais recentes/maiores primeiro; `de`/`ate` em aaaa-mm."""
+    _ensure_schema()
+    conds, params = [], []
+    if tipo:
+        conds.append("tipo = ?"); params.append(tipo)
+    if de:
+        conds.append("mes >= ?"); params.append(de[:7])
+    if ate:
+        conds.append("mes <= ?"); params.append(ate[:7])
+    sql = f"SELECT * FROM {TABLE}" + (" WHERE " + " AND ".join(conds) if conds else "")
+    sql += " ORDER BY mes DESC, razao DESC"
+    if limite:
+        sql += f" LIMIT {int(limite)}"
+    with get_conn() as conn:
+        return pd.read_sql(sql, conn, params=params)
+
+def resumo(de: Optional[str] = None, ate: Optional[str] = None) -> dict:
+    """Quantidade de anomalias por tipo no período."""
+    _ensure_schema()
+    conds, params = [], []
+    if de:
+        conds.append("mes >= ?"); params.append(de[:7])
+    if ate:
+        conds.append("mes <= ?"); params.append(ate[:7])
+    where = (" WHERE " + " AND ".join(conds)) if conds else ""
+    with get_conn() as conn:
+        contagem = dict(conn.execute(f"SELECT tipo, COUNT(*) FROM {TABLE}{where} GROUP BY tipo;", params).fetchall())
+    return {t: contagem.get(t, 0) for t in TIPOS}
@@ -0,0 +1,242 @@
+# api.py
+"""
+API HTTP/JSON para integrações, ao lado do Streamlit (stdlib: ThreadingHTTPServer).
+
+Reaproveita a camada de serviço (ordens_servico.upsert_os_lote,
+manutencoes.inserir_manutencoes, leituras.importar, usuarios.authenticate), db.select_page, feed_erp e um ConnectionPool de
+leitura + um de escrita; HTTP/1.1 com keep-alive (Content-Length em toda resposta).
+
+    POST /sessao              {"login", "senha"} -> {"token"}   (demais rotas: Authorization: Bearer <token>)
+    GET  /veiculos            ?placa= &num_frota= &marca= &status= &page= &per_page=
+    GET  /os                  ?placa= &num_os= &status= &prioridade= &page= &per_page=
+    GET  /manutencoes         ?placa= &cod_peca= &fornecedor= &nf= &mes= &tipo= &page= &per_page=
+    POST /manutencoes         [{...}, ...] ou {"itens": [...]}  -> 201 {"ids": [...]}
+    PUT  /os                  {...} ou [{...}, ...] (upsert por num_os) -> {"ids": [...]}
+    POST /leituras            [{placa|veiculo_id, ts, km, horas}, ...] ou {"itens": [...]}
+                              -> 201 {"gravadas", "rejeitadas", "erros"} (inválidas são puladas)
+    GET  /feed                ?cursor= &tabelas=manutencoes,ordens_servico &limite= (&formato=ndjson)
+    GET  /saude
+
+Uso:
+    python -m api --port 8502
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+import feed_erp
+import metrics
+from config import API_HOST, API_MAX_LOTE, API_MAX_PAGE, API_POOL_SIZE, API_PORT
+from services import leituras, manutencoes, ordens_servico, usuarios
+
+_MAX_CORPO = 10 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+class ErroAPI(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+# recurso -> (tabela, colunas, filtros "contém", filtros de igualdade)
+RECURSOS = {
+    "/veiculos": ("veiculos",
+                  ["id", "num_frota", "placa", "modelo", "marca", "ano_fabricacao", "chassi",
+                   "classe_mecanica", "classe_operacional", "status"],
+                  ("placa", "num_frota", "modelo", "marca"), ("status", "classe_mecanica", "classe_operacional")),
+    "/os": ("ordens_servico", ["id", *ordens_servico.OS_COLS],
+            ("placa", "num_os", "descricao", "responsavel"), ("status", "prioridade")),
+    "/manutencoes": ("manutencoes", ["id", *manutencoes.MAN_COLS],
+                     ("placa", "cod_peca", "fornecedor", "nf", "desc_peca"), ("mes", "tipo", "sc")),
+}
+
+_leitura = db.ConnectionPool(API_POOL_SIZE, readonly=True)
+_escrita = db.ConnectionPool(max(2, API_POOL_SIZE // 4))
+
+# ---------- rotas ----------
+def _listar(rota: str, q: dict) -> dict:
+    tabela, colunas, contem, iguais = RECURSOS[rota]
+    try:
+        page = max(int(q.get("page", 1)), 1)
+        per_page = min(max(int(q.get("per_page", 50)), 1), API_MAX_PAGE)
+    except ValueError:
+        raise ErroAPI(400, "page/per_page devem ser inteiros.")
+    with _leitura.conexao("tuple") as conn:
+        cols, rows, total = db.select_page(
+            tabela, colunas, contains={c: q.get(c) for c in contem}, equals={c: q.get(c) for c in iguais},
+            page=page, per_page=per_page, conn=conn,
+        )
+    return {
+        "dados": [dict(zip(cols, r)) for r in rows], "total": total, "page": page, "per_page": per_page,
+        "proxima": page + 1 if page * per_page < total else None,
+    }
+
+def _lote(corpo, chave: str) -> list:
+    itens = corpo.get(chave) if isinstance(corpo, dict) and chave in corpo else corpo
+    itens = [itens] if isinstance(itens, dict) else itens
+    if not isinstance(itens, list) or not itens or not all(isinstance(i, dict) for i in itens):
+        raise ErroAPI(400, "Envie um objeto ou uma lista de objetos.")
+    if len(itens) > API_MAX_LOTE:
+        raise ErroAPI(413, f"Máximo de {API_MAX_LOTE} itens por requisição.")
+    return itens
+
+def _criar_manutencoes(corpo) -> tuple:
+    itens = _lote(corpo, "itens")
+    with _escrita.conexao() as conn:
+        ids = manutencoes.inserir_manutencoes(itens, conn)
+    return 201, {"ids": ids}
+
+def _upsert_os(corpo) -> tuple:
+    itens = _lote(corpo, "itens")
+    with _escrita.conexao() as conn:
+        ids = ordens_servico.upsert_os_lote(itens, conn)
+    return 200, {"ids": ids}
+
+def _gravar_leituras(corpo) -> tuple:
+    itens = _lote(corpo, "itens")
+    with _escrita.conexao() as conn:
+        res = leituras.importar(itens, "api", conn)
+    return 201, res
+
+def _feed(q: dict):
+    tabelas = [t for t in (q.get("tabelas") or ",".join(feed_erp.TABELAS)).split(",") if t]
+    try:
+        limite = min(max(int(q.get("limite", 1000)), 1), db.DEFAULT_CHUNK)
+    except ValueError:
+        raise ErroAPI(400, "limite deve ser inteiro.")
+    try:
+        registros, cursor, fim = feed_erp.pagina(q.get("cursor") or None, tabelas, limite)
+    except feed_erp.CursorInvalido as e:
+        raise ErroAPI(409, str(e))
+    if q.get("formato") == "ndjson":
+        return feed_erp.ndjson(registros).encode("utf-8"), {"X-Cursor": cursor, "X-Fim": "1" if fim else "0"}
+    return {"registros": registros, "cursor": cursor, "fim": fim}
+
+def _sessao(corpo) -> tuple:
+    if not isinstance(corpo, dict):
+        raise ErroAPI(400, "Envie {\"login\", \"senha\"}.")
+    user = usuarios.authenticate(corpo.get("login") or "", corpo.get("senha") or "")
+    if not user or not usuarios.is_active(user.id):
+        raise ErroAPI(401, "Login ou senha inválidos.")
+    return 201, {"token": usuarios.create_session(user.id), "usuario": user.username}
+
+# ---------- HTTP ----------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados: sem isso, +40 ms (delayed ACK)
+    server_version = "FrotaAPI/1.0"
+
+    def log_message(self, fmt, *args):  # o acesso vai p/ metrics, não p/ stderr
+        pass
+
+    def _responder(self, status: int, corpo, cabecalhos: dict = None) -> None:
+        if isinstance(corpo, bytes):
+            dados, tipo = corpo, "application/x-ndjson"
+        else:
+            dados, tipo = json.dumps(corpo, ensure_ascii=False, default=str).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", f"{tipo}; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (cabecalhos or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        if tamanho > _MAX_CORPO:
+            self.close_connection = True  # corpo não lido: a conexão não pode ser reaproveitada
+            raise ErroAPI(413, "Corpo grande demais.")
+        bruto = self.rfile.read(tamanho) if tamanho else b""
+        try:
+            return json.loads(bruto or b"null")
+        except ValueError:
+            raise ErroAPI(400, "JSON inválido.")
+
+    def _usuario(self) -> dict:
+        h = self.headers.get("Authorization") or ""
+        user = usuarios.get_session_user(h[7:].strip() if h.lower().startswith("bearer ") else None)
+        if not user:
+            raise ErroAPI(401, "Token ausente ou inválido.")
+        return user
+
+    def _tratar(self, metodo: str) -> None:
+        t0 = time.perf_counter()
+        url = urlsplit(self.path)
+        rota = url.path.rstrip("/") or "/"
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        status, corpo, cabecalhos = 200, None, None
+        try:
+            # o corpo é sempre consumido (mesmo em erro) p/ manter a conexão keep-alive utilizável
+            dados = self._corpo() if metodo in ("POST", "PUT") else None
+            if (metodo, rota) == ("GET", "/saude"):
+                corpo = {"ok": True}
+            elif (metodo, rota) == ("POST", "/sessao"):
+                status, corpo = _sessao(dados)
+            else:
+                self._usuario()
+                if metodo == "GET" and rota in RECURSOS:
+                    corpo = _listar(rota, q)
+                elif (metodo, rota) == ("POST", "/manutencoes"):
+                    status, corpo = _criar_manutencoes(dados)
+                elif (metodo, rota) in (("PUT", "/os"), ("POST", "/os")):
+                    status, corpo = _upsert_os(dados)
+                elif (metodo, rota) == ("POST", "/leituras"):
+                    status, corpo = _gravar_leituras(dados)
+                elif (metodo, rota) == ("GET", "/feed"):
+                    corpo = _feed(q)
+                    if isinstance(corpo, tuple):
+                        corpo, cabecalhos = corpo
+                else:
+                    raise ErroAPI(404, f"Rota não encontrada: {metodo} {rota}")
+        except ErroAPI as e:
+            status, corpo = e.status, {"erro": str(e)}
+        except ValueError as e:  # validação da persistência (num_os ausente, placa desconhecida...)
+            status, corpo = 400, {"erro": str(e)}
+        except sqlite3.IntegrityError as e:
+            status, corpo = 409, {"erro": str(e)}
+        except Exception:
+            # detalhe só no log: a mensagem da exceção pode expor SQL/caminhos ao cliente
+            log.exception("Erro interno em %s %s", metodo, rota)
+            metrics.incr("api.erro_interno")
+            status, corpo = 500, {"erro": "Erro interno."}
+        self._responder(status, corpo, cabecalhos)
+        nome = f"{metodo} {rota}" if status != 404 else "404"  # rotas inexistentes não viram métricas novas
+        metrics.observe(f"api.{nome}.ms", (time.perf_counter() - t0) * 1000)
+        metrics.incr(f"api.status.{status}")
+
+    def do_GET(self):
+        self._tratar("GET")
+
+    def do_POST(self):
+        self._tratar("POST")
+
+    def do_PUT(self):
+        self._tratar("PUT")
+
+def criar_servidor(host: str = API_HOST, port: int = API_PORT) -> ThreadingHTTPServer:
+    db.bootstrap()
+    servidor = ThreadingHTTPServer((host, port), _Handler)
+    servidor.daemon_threads = True
+    return servidor
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default=API_HOST)
+    ap.add_argument("--port", type=int, default=API_PORT)
+    args = ap.parse_args()
+    servidor = criar_servidor(args.host, args.port)
+    print(f"API em http://{args.host}:{servidor.server_address[1]}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        _leitura.close()
+        _escrita.close()
@@ -2,13 +2,16 @@ import os
 import subprocess
 from datetime import datetime
 import base64
+import uuid
 import streamlit as st
+import importlib
 import inspect  # <- precisa para o helper
 
+import instrumentation
 from config import apply_config
 from db import bootstrap
-from modules import auth, cadastro_frota, abertura_os, manutencao, relatorios
-import modules.listar_editar_carros as listar_editar_carros
+from instrumentation import phase
+from modules import auth  # login; as páginas são importadas só quando abertas (PAGINAS)
 
 APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
 
@@ -33,13 +36,61 @@ def call_show(fn, **kwargs):
         # se não der pra inspecionar ou ainda assim der ruim, chama sem kwargs
         return fn()
 
+# --- páginas: o módulo só é importado quando o menu dele é aberto pela 1ª vez no processo
+# (relatorios traz altair/pandas; quem abre só a Frota não paga por eles no cold start)
+def _pagina(nome: str):
+    with phase(f"import:{nome}"):
+        return importlib.import_module(f"modules.{nome}")
+
+def _inicio(user):
+    # call_show evita TypeError quando a função não aceita graphs_only
+    call_show(_pagina("relatorios").show, graphs_only=True)
+
+def _frota(user):
+    cadastro_frota, listar_editar_carros = _pagina("cadastro_frota"), _pagina("listar_editar_carros")
+    desired = st.session_state.get("frota_tab", "Listar/Editar")
+    order = ["Cadastrar", "Listar/Editar"] if desired == "Cadastrar" else ["Listar/Editar", "Cadastrar"]
+    tabA, tabB = st.tabs(order)
+
+    if order[0] == "Cadastrar":
+        with tabA:
+            cadastro_frota.show()
+        with tabB:
+            st.session_state["frota_tab"] = "Listar/Editar"
+            listar_editar_carros.page()
+    else:
+        with tabA:
+            listar_editar_carros.page()
+        with tabB:
+            cadastro_frota.show()
+
+def _manutencao(user):
+    # idem para com_expansor
+    call_show(_pagina("manutencao").show, com_expansor=True)
+
+# menu -> (render, só admin)
+PAGINAS = {
+    "Início": (_inicio, False),
+    "Frota": (_frota, False),
+    "Ordens de Serviço": (lambda user: _pagina("abertura_os").show(), False),
+    "Manutenção": (_manutencao, False),
+    "Preventiva": (lambda user: _pagina("preventiva").show(), False),
+    "Relatórios": (lambda user: _pagina("relatorios").show(), False),
+    "Admin (Usuários)": (lambda user: _pagina("admin_users").show(user=user), True),
+    "Desempenho": (lambda user: _pagina("desempenho").show(user=user), True),
+}
+
 
 # ===================== Config & Bootstrap =====================
 apply_config()
-bootstrap()
+instrumentation.begin_rerun(sessao=st.session_state.setdefault("_rerun_sessao", uuid.uuid4().hex))
+with phase("bootstrap"):
+    bootstrap()
 
 # ===================== Login =====================
-user = auth.require_login()
+with phase("login"):
+    user = auth.require_login()
+instrumentation.annotate(usuario=user["username"])
 
 # Aba padrão após login
 if "menu" not in st.session_state:
@@ -146,7 +197,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ===================== SIDEBAR =====================
-with st.sidebar:
+with st.sidebar, phase("sidebar"):
     logo_path = "assets/oxe.logo.png"
     if os.path.exists(logo_path):
         # img como data URI, clicável, sem botão
@@ -180,9 +231,7 @@ with st.sidebar:
     st.markdown("</div></div>", unsafe_allow_html=True)
 
     # Menu
-    options = ["Início", "Frota", "Ordens de Serviço", "Manutenção"]
-    if user.get("role") == "admin":
-        options.append("Admin (Usuários)")
+    options = [nome for nome, (_, so_admin) in PAGINAS.items() if not so_admin or user.get("role") == "admin"]
     default_index = options.index(st.session_state.get("menu", "Início")) if st.session_state.get("menu", "Início") in options else 0
     selecionado = st.radio(label="", options=options, index=default_index)
     st.session_state["menu"] = selecionado
@@ -190,42 +239,19 @@ with st.sidebar:
 # ===================== ROTEAMENTO =====================
 menu = st.session_state.get("menu", "Início")
 
-if menu == "Início":
-    # call_show evita TypeError quando a função não aceita graphs_only
-    call_show(relatorios.show, graphs_only=True)
-
-elif menu == "Frota":
-    desired = st.session_state.get("frota_tab", "Listar/Editar")
-    order = ["Cadastrar", "Listar/Editar"] if desired == "Cadastrar" else ["Listar/Editar", "Cadastrar"]
-    tabA, tabB = st.tabs(order)
-
-    if order[0] == "Cadastrar":
-        with tabA:
-            cadastro_frota.show()
-        with tabB:
-            st.session_state["frota_tab"] = "Listar/Editar"
-            listar_editar_carros.page()
-    else:
-        with tabA:
-            listar_editar_carros.page()
-        with tabB:
-            cadastro_frota.show()
-
-elif menu == "Ordens de Serviço":
-    abertura_os.show()
-
-elif menu == "Manutenção":
-    # idem para com_expansor
-    call_show(manutencao.show, com_expansor=True)
-
-elif menu == "Admin (Usuários)":
-    from modules import admin_users
-    admin_users.show()
+instrumentation.annotate(pagina=menu)
+render, so_admin = PAGINAS.get(menu, PAGINAS["Início"])
+with phase(f"pagina:{menu}"):
+    if not so_admin or user.get("role") == "admin":
+        render(user)
 
 # ===================== RODAPÉ =====================
 _now_br = datetime.now().strftime("%d/%m/%Y %H:%M")
-_commit = get_git_commit_hash()
+with phase("rodape.git"):
+    _commit = get_git_commit_hash()
 st.markdown(
     f'<div class="app-footer">Versão <b>{APP_VERSION}</b> · {_now_br} · commit <b>{_commit}</b> · Desenvolvido por <b>NeuralSys</b></div>',
     unsafe_allow_html=True
 )
+
+instrumentation.end_rerun()
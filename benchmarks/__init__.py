@@ -0,0 +1,14 @@
+# benchmarks/__init__.py
+"""Utilitários comuns aos benchmarks (rodar da raiz: python -m benchmarks.<nome>)."""
+import math
+
+
+def percentil(ordenados: list, q: float) -> float:
+    """Percentil por posto mais próximo (ceil(q*n)-1) de uma lista já ordenada; 0.0 se vazia.
+
+    Mesma regra de instrumentation._percentil, sem importá-lo: o instrumentation puxa o
+    config, e alguns benchmarks só podem importá-lo depois de fixar FROTA_DB_PATH.
+    """
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, max(0, math.ceil(q * len(ordenados)) - 1))]
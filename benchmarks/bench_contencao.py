@@ -0,0 +1,125 @@
+# benchmarks/bench_contencao.py
+"""
+Contenção leitura x escrita no SQLite, por REPORTING_MODE.
+
+Sobe leitores (consulta de relatório, como services.relatorios.carregar) e escritores
+(INSERT de manutenção, como services.manutencoes) em threads por alguns segundos e
+compara latência de escrita e nº de 'database is locked' entre os modos.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_contencao --linhas 200000 --segundos 10
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MODOS = ("off", "readonly", "snapshot")
+
+SQL_RELATORIO = """
+    SELECT m.id, v.num_frota, m.placa, v.modelo, v.marca, m.data, m.mes, m.tipo,
+           COALESCE(m.vlr_peca, m.qtd * m.vlr_unitario) AS custo, m.fornecedor, m.nf
+    FROM manutencoes m
+    LEFT JOIN veiculos v ON v.id = m.veiculo_id
+"""
+
+def _popular(db_path: str, linhas: int) -> None:
+    con = sqlite3.connect(db_path)
+    con.executemany(
+        "INSERT INTO veiculos (num_frota, placa, modelo, marca) VALUES (?, ?, ?, ?)",
+        ((f"FR-{i:04d}", f"ABC{i:04d}", "FH540", "VOLVO") for i in range(500)),
+    )
+    rnd = random.Random(1)
+    con.executemany(
+        "INSERT INTO manutencoes (veiculo_id, placa, data, mes, tipo, qtd, vlr_unitario, vlr_peca, fornecedor, nf) "
+        "VALUES (?, ?, ?, ?, 'Peça', 1, ?, ?, 'FORNECEDOR', 'NF')",
+        ((v := rnd.randint(1, 500), f"ABC{v - 1:04d}", "2025-01-01", "2025-01", x := rnd.uniform(10, 900), x)
+         for _ in range(linhas)),
+    )
+    con.commit()
+    con.close()
+
+def _cenario(db_path: str, linhas: int, segundos: float, leitores: int, escritores: int) -> dict:
+    """Roda no subprocesso (FROTA_REPORTING_MODE já definido) e devolve as métricas."""
+    os.environ["FROTA_DB_PATH"] = db_path
+    import db
+    import metrics
+    db.bootstrap()
+    _popular(db_path, linhas)
+    metrics.reset()
+    fim = time.monotonic() + segundos
+    ops = {"leituras": 0, "escritas": 0, "erros": 0}
+    lock = threading.Lock()
+
+    def leitor():
+        while time.monotonic() < fim:
+            try:
+                with db.get_read_conn() as conn:
+                    conn.execute(SQL_RELATORIO).fetchall()
+                with lock: ops["leituras"] += 1
+            except sqlite3.OperationalError:
+                with lock: ops["erros"] += 1
+
+    def escritor():
+        while time.monotonic() < fim:
+            try:
+                db.execute_write(
+                    "INSERT INTO manutencoes (veiculo_id, placa, data, mes, tipo, qtd, vlr_unitario, vlr_peca) "
+                    "VALUES (1, 'ABC0000', '2025-02-01', '2025-02', 'Peça', 1, 10, 10)"
+                )
+                with lock: ops["escritas"] += 1
+            except sqlite3.OperationalError:
+                with lock: ops["erros"] += 1
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=leitor) for _ in range(leitores)]
+    threads += [threading.Thread(target=escritor) for _ in range(escritores)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return {"ops": ops, **metrics.snapshot("db.")}
+
+def run(linhas: int = 200_000, segundos: float = 10, leitores: int = 4, escritores: int = 4) -> dict:
+    resultados = {}
+    for modo in MODOS:
+        # banco novo por modo: o modo "off" não pode herdar o WAL dos outros
+        db_path = os.path.join(tempfile.mkdtemp(prefix=f"bench_cont_{modo}_"), "bench.db")
+        env = {**os.environ, "FROTA_REPORTING_MODE": modo}
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_contencao", "--_cenario", db_path, "--linhas", str(linhas),
+             "--segundos", str(segundos), "--leitores", str(leitores), "--escritores", str(escritores)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        resultados[modo] = json.loads(out.strip().splitlines()[-1])
+    return resultados
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--linhas", type=int, default=200_000)
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--leitores", type=int, default=4)
+    ap.add_argument("--escritores", type=int, default=4)
+    ap.add_argument("--json", help="grava o resultado completo neste arquivo")
+    ap.add_argument("--_cenario", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args._cenario:
+        print(json.dumps(_cenario(args._cenario, args.linhas, args.segundos, args.leitores, args.escritores)))
+        sys.exit(0)
+
+    res = run(args.linhas, args.segundos, args.leitores, args.escritores)
+    for modo, r in res.items():
+        h_rw = r["histograms"].get("db.write.lock_wait_ms", {})
+        locked = sum(v for k, v in r["counters"].items() if k.endswith(".locked"))
+        print(f"[{modo:8}] leituras={r['ops']['leituras']:5} escritas={r['ops']['escritas']:5} "
+              f"erros={r['ops']['erros']:3} locked={locked:3} "
+              f"retries={r['counters'].get('db.write.retries', 0):3} "
+              f"espera lock escrita p50={h_rw.get('p50')}ms p95={h_rw.get('p95')}ms max={h_rw.get('max')}ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
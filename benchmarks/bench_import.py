@@ -0,0 +1,140 @@
+# benchmarks/bench_import.py
+"""
+Custo de import (cold start) das páginas e tempo até a 1ª pintura de cada menu.
+
+1. imports: para cada módulo de página roda `python -X importtime` num processo novo,
+   com o streamlit já importado (ele é pago de qualquer jeito), e soma o acumulado do
+   módulo; lista também as dependências mais pesadas que ele puxou.
+2. pintura: num processo novo por menu (como logo depois de um redeploy), abre o app.py
+   com AppTest já logado e mede o 1º run() — imports tardios, carga e renderização.
+
+O app importa as páginas sob demanda (PAGINAS em app.py); uma página que volte a puxar
+pandas/altair no topo aparece aqui como regressão.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --menus Início Frota --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MODULOS = [
+    "app_login",  # o que o app.py importa antes do login
+    "modules.relatorios", "modules.cadastro_frota", "modules.listar_editar_carros",
+    "modules.abertura_os", "modules.manutencao", "modules.preventiva", "modules.admin_users", "modules.desempenho",
+]
+MENUS = ["Início", "Frota", "Ordens de Serviço", "Manutenção", "Preventiva", "Relatórios", "Admin (Usuários)", "Desempenho"]
+
+# imports feitos pelo app.py no topo (sem o streamlit, que entra como base)
+_IMPORTS_APP = "import instrumentation, config, db; from modules import auth"
+
+def _importtime(stmt: str) -> list:
+    """[(nivel, acumulado_us, modulo)] do `-X importtime` de `stmt`, após o streamlit."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import streamlit; print('--', file=__import__('sys').stderr); {stmt}"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    )
+    linhas, depois = [], False
+    for ln in proc.stderr.splitlines():
+        if ln == "--":
+            depois = True
+            continue
+        if not depois or not ln.startswith("import time:") or "|" not in ln:
+            continue
+        _, acumulado, nome = ln[len("import time:"):].split("|")
+        if not acumulado.strip().isdigit():
+            continue  # cabeçalho
+        linhas.append(((len(nome) - len(nome.lstrip())) // 2, int(acumulado), nome.strip()))
+    return linhas
+
+def medir_imports(modulos=MODULOS, top: int = 5) -> dict:
+    res = {}
+    for mod in modulos:
+        linhas = _importtime(_IMPORTS_APP if mod == "app_login" else f"import {mod}")
+        raiz = [(us, nome) for nivel, us, nome in linhas if nivel == 0]
+        pesados = sorted(((us, nome) for nivel, us, nome in linhas if nivel == 1), reverse=True)[:top]
+        res[mod] = {
+            "ms": round(sum(us for us, _ in raiz) / 1000, 1),
+            "modulos": len(linhas),
+            "pesados": [{"modulo": nome, "ms": round(us / 1000, 1)} for us, nome in pesados],
+        }
+    return res
+
+def _pintura(menu: str) -> dict:
+    """(subprocesso) 1º run do app.py já logado, abrindo `menu`."""
+    sys.path.insert(0, str(RAIZ))
+    os.chdir(RAIZ)
+    from streamlit.testing.v1 import AppTest
+    import db
+    from services import usuarios
+    db.bootstrap()
+    u = usuarios.get_user_by_login("bench_admin")
+    uid = u.id if u else usuarios.create_user("bench_admin", "Bench", "bench-import", role="admin",
+                                                   email="bench_admin@frota.local")
+    token = usuarios.create_session(uid)
+
+    carregados = set(sys.modules)
+    at = AppTest.from_file(str(RAIZ / "app.py"), default_timeout=300)
+    at.session_state["auth_token"] = token
+    at.session_state["menu"] = menu
+    t0 = time.perf_counter()
+    at.run()
+    ms = (time.perf_counter() - t0) * 1000
+    novos = set(sys.modules) - carregados
+    return {
+        "ms": round(ms, 1),
+        "modulos_importados": len(novos),
+        "pandas": "pandas" in novos,
+        "altair": "altair" in novos,
+        "erros": [str(e.value)[:120] for e in at.exception],
+    }
+
+def medir_pintura(menus=MENUS, db_path=None) -> dict:
+    if not db_path:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench_import_"), "bench.db")
+    env = dict(os.environ, FROTA_DB_PATH=str(db_path))
+    res = {}
+    for menu in menus:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_import", "--_pintura", menu],
+            cwd=RAIZ, env=env, capture_output=True, text=True, check=True,
+        )
+        res[menu] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return res
+
+def run(menus=MENUS, db_path=None) -> dict:
+    return {"imports": medir_imports(), "pintura": medir_pintura(menus, db_path)}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--menus", nargs="*", default=MENUS)
+    ap.add_argument("--db", help="banco para a pintura (padrão: FROTA_DB_PATH ou um banco vazio temporário)")
+    ap.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    ap.add_argument("--_pintura", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args._pintura:
+        print(json.dumps(_pintura(args._pintura)))
+        sys.exit(0)
+
+    res = run(args.menus, args.db or os.environ.get("FROTA_DB_PATH"))
+    if args.json:
+        print(json.dumps(res, indent=2, ensure_ascii=False))
+        sys.exit(0)
+    print("imports (após streamlit)")
+    for mod, r in res["imports"].items():
+        pesados = ", ".join(f"{p['modulo']} {p['ms']:.0f}" for p in r["pesados"][:3])
+        print(f"  {mod:<32} {r['ms']:>8.1f} ms  {r['modulos']:>4} módulos   [{pesados}]")
+    print("1ª pintura (processo novo, logado)")
+    for menu, r in res["pintura"].items():
+        libs = "+".join(k for k in ("pandas", "altair") if r[k]) or "-"
+        erro = f"  erro: {r['erros'][0]}" if r["erros"] else ""
+        print(f"  {menu:<20} {r['ms']:>8.1f} ms  {r['modulos_importados']:>4} módulos  {libs}{erro}")
@@ -0,0 +1,101 @@
+# benchmarks/bench_login.py
+"""
+Benchmark do lookup de login (usuarios.get_user_by_login) com N usuários.
+
+Compara a consulta antiga (LOWER(TRIM(col)) = LOWER(TRIM(?)), 2 full scans) com a
+atual (igualdade sobre valores normalizados, busca por índice).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_login --usuarios 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks import percentil
+
+LEGACY_SQL = """
+    SELECT id, username, email, nome AS name, role
+    FROM usuarios
+    WHERE LOWER(TRIM({col})) = LOWER(TRIM(?))
+    LIMIT 1
+"""
+
+def _popular(db_path: str, n: int) -> None:
+    con = sqlite3.connect(db_path)
+    con.executemany(
+        "INSERT INTO usuarios (username, email, nome, senha_hash, role, active) VALUES (?, ?, ?, ?, 'user', 1)",
+        ((f"user{i:06d}", f"user{i:06d}@frota.local", f"Usuário {i}", "x" * 64) for i in range(n)),
+    )
+    con.commit()
+    con.close()
+
+def _legacy_lookup(con, login):
+    row = con.execute(LEGACY_SQL.format(col="username"), (login,)).fetchone()
+    if row:
+        return row
+    return con.execute(LEGACY_SQL.format(col="email"), (login,)).fetchone()
+
+def _medir(fn, logins):
+    tempos = []
+    for login in logins:
+        t0 = time.perf_counter()
+        fn(login)
+        tempos.append((time.perf_counter() - t0) * 1000)
+    tempos.sort()
+    return {
+        "n": len(tempos),
+        "p50_ms": round(statistics.median(tempos), 4),
+        "p95_ms": round(percentil(tempos, 0.95), 4),
+        "max_ms": round(tempos[-1], 4),
+    }
+
+def run(n_usuarios: int = 100_000, n_lookups: int = 500, seed: int = 42) -> dict:
+    """Cria um banco temporário com n_usuarios e mede os dois lookups."""
+    tmp = tempfile.mkdtemp(prefix="bench_login_")
+    db_path = os.path.join(tmp, "bench.db")
+    os.environ["FROTA_DB_PATH"] = db_path
+
+    from services import usuarios  # importa depois de FROTA_DB_PATH
+    usuarios.ensure_schema()
+    _popular(db_path, n_usuarios)
+
+    rnd = random.Random(seed)
+    logins = []
+    for _ in range(n_lookups):
+        i = rnd.randrange(n_usuarios)
+        logins.append(rnd.choice([f"user{i:06d}", f"  USER{i:06d}@Frota.Local ", "nao.existe"]))
+
+    con = sqlite3.connect(db_path)
+    plano_antigo = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + LEGACY_SQL.format(col="username"), ("x",))]
+    plano_novo = [r[3] for r in con.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM usuarios WHERE username = ? OR email = ? ORDER BY username = ? DESC LIMIT 1",
+        ("x", "x", "x"),
+    )]
+    antigo = _medir(lambda login: _legacy_lookup(con, login), logins[: max(1, n_lookups // 10)])
+    con.close()
+    novo = _medir(usuarios.get_user_by_login, logins)
+
+    return {
+        "usuarios": n_usuarios,
+        "antigo": {**antigo, "plano": plano_antigo},
+        "novo": {**novo, "plano": plano_novo},
+    }
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--usuarios", type=int, default=100_000)
+    ap.add_argument("--lookups", type=int, default=500)
+    args = ap.parse_args()
+
+    res = run(args.usuarios, args.lookups)
+    print(f"usuários: {res['usuarios']:,}")
+    for k in ("antigo", "novo"):
+        r = res[k]
+        print(f"[{k}] n={r['n']} p50={r['p50_ms']}ms p95={r['p95_ms']}ms max={r['max_ms']}ms")
+        for linha in r["plano"]:
+            print(f"    plano: {linha}")
@@ -0,0 +1,194 @@
+# benchmarks/carga_api.py
+"""
+Teste de carga da API HTTP (api.py): N clientes em threads, cada um com uma conexão
+keep-alive, repetindo uma mistura de requisições por alguns segundos. Mostra req/s e
+latência (p50/p95/máx) por rota e o total.
+
+Com --subir, gera um banco sintético (seed_data) e sobe a API num subprocesso; sem ele,
+usa uma instância já rodando em --url (com --login/--senha de um usuário existente).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.carga_api --subir --escala 0.1 --clientes 8 --segundos 10
+    python -m benchmarks.carga_api --url http://127.0.0.1:8502 --login admin --senha ...
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from benchmarks import percentil
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+class _Cliente:
+    """Uma conexão HTTP/1.1 reaproveitada entre requisições (reabre se o servidor fechar)."""
+    def __init__(self, host: str, port: int, token: str = None):
+        self.host, self.port, self.token = host, port, token
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def pedir(self, metodo: str, caminho: str, corpo=None):
+        dados = json.dumps(corpo).encode("utf-8") if corpo is not None else None
+        cab = {"Content-Type": "application/json"}
+        if self.token:
+            cab["Authorization"] = f"Bearer {self.token}"
+        for tentativa in (1, 2):
+            try:
+                self.conn.request(metodo, caminho, body=dados, headers=cab)
+                resp = self.conn.getresponse()
+                return resp.status, resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                if tentativa == 2:
+                    raise
+
+def _mistura(placas: list, escrita: float):
+    """Sorteia a próxima requisição: listagens com filtros e, numa fração, gravação em lote."""
+    r = random.random()
+    placa = random.choice(placas) if placas else ""
+    if r < escrita:
+        itens = [{"placa": placa, "data": "2025-12-01", "tipo": "Peça", "cod_peca": "CARGA-1",
+                  "qtd": 1, "vlr_unitario": 10.0, "fornecedor": "CARGA", "nf": "0"} for _ in range(10)]
+        return "manutencoes.lote", "POST", "/manutencoes", itens
+    if r < 0.40:
+        return "veiculos", "GET", f"/veiculos?page={random.randint(1, 5)}&per_page=50", None
+    if r < 0.70:
+        return "os", "GET", f"/os?status=aberta&page={random.randint(1, 3)}", None
+    return "manutencoes", "GET", f"/manutencoes?placa={placa}&per_page=100", None
+
+def carga(url: str, token: str, clientes: int, segundos: float, escrita: float) -> dict:
+    alvo = urlsplit(url)
+    base = _Cliente(alvo.hostname, alvo.port, token)
+    st, corpo = base.pedir("GET", "/veiculos?per_page=200")
+    placas = [v["placa"] for v in json.loads(corpo)["dados"] if v.get("placa")] if st == 200 else []
+
+    tempos, erros, lock = {}, {}, threading.Lock()
+    fim = time.perf_counter() + segundos
+
+    def _worker(semente: int):
+        random.seed(semente)
+        cli = _Cliente(alvo.hostname, alvo.port, token)
+        locais, errs = {}, {}
+        while time.perf_counter() < fim:
+            nome, metodo, caminho, corpo = _mistura(placas, escrita)
+            t0 = time.perf_counter()
+            try:
+                status, _ = cli.pedir(metodo, caminho, corpo)
+            except Exception as e:
+                status = type(e).__name__
+            locais.setdefault(nome, []).append((time.perf_counter() - t0) * 1000)
+            if status not in (200, 201):
+                errs[f"{nome}:{status}"] = errs.get(f"{nome}:{status}", 0) + 1
+        with lock:
+            for k, v in locais.items():
+                tempos.setdefault(k, []).extend(v)
+            for k, v in errs.items():
+                erros[k] = erros.get(k, 0) + v
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - t0
+
+    def _resumo(ts):
+        ts = sorted(ts)
+        return {"n": len(ts), "rps": round(len(ts) / duracao, 1), "p50_ms": round(statistics.median(ts), 2),
+                "p95_ms": round(percentil(ts, 0.95), 2), "max_ms": round(ts[-1], 2)}
+
+    todos = [t for ts in tempos.values() for t in ts]
+    return {
+        "clientes": clientes, "segundos": round(duracao, 2),
+        "total": _resumo(todos) if todos else {"n": 0},
+        "rotas": {k: _resumo(v) for k, v in sorted(tempos.items())},
+        "erros": erros,
+    }
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _subir(escala: float, pasta: Path):
+    """Gera o banco (se preciso), cria um usuário de carga e sobe `python -m api`."""
+    sys.path.insert(0, str(RAIZ))
+    db_path = pasta / f"frota_api_e{escala:g}.db"
+    if not db_path.exists():
+        import seed_data
+        seed_data.gerar_escala(str(db_path), escala, seed=42)
+    porta = _porta_livre()
+    env = dict(os.environ, FROTA_DB_PATH=str(db_path), FROTA_API_PORT=str(porta))
+    # usuário próprio da carga (o bootstrap do subprocesso roda as migrações antes)
+    subprocess.run([sys.executable, "-c", (
+        "import db; db.bootstrap()\n"
+        "from services import usuarios\n"
+        "try:\n    usuarios.create_user('carga', 'Carga', 'carga123', role='admin', email='carga@local')\n"
+        "except Exception:\n    pass\n"
+    )], cwd=RAIZ, env=env, check=True)
+    proc = subprocess.Popen([sys.executable, "-m", "api", "--port", str(porta)], cwd=RAIZ, env=env,
+                            stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{porta}"
+    for _ in range(100):
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", porta, timeout=1)
+            c.request("GET", "/saude")
+            c.getresponse().read()
+            c.close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return proc, url, "carga", "carga123"
+
+def _token(url: str, login: str, senha: str) -> str:
+    alvo = urlsplit(url)
+    status, corpo = _Cliente(alvo.hostname, alvo.port).pedir("POST", "/sessao", {"login": login, "senha": senha})
+    if status != 201:
+        raise SystemExit(f"login falhou ({status}): {corpo.decode('utf-8', 'replace')}")
+    return json.loads(corpo)["token"]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://127.0.0.1:8502")
+    ap.add_argument("--login", default="admin")
+    ap.add_argument("--senha", default="")
+    ap.add_argument("--subir", action="store_true", help="gera banco sintético e sobe a API localmente")
+    ap.add_argument("--escala", type=float, default=0.1)
+    ap.add_argument("--pasta", help="onde guardar o banco gerado (padrão: tmp do sistema)")
+    ap.add_argument("--clientes", type=int, default=8)
+    ap.add_argument("--segundos", type=float, default=10)
+    ap.add_argument("--escrita", type=float, default=0.05, help="fração de requisições de gravação em lote")
+    ap.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = ap.parse_args()
+
+    proc = None
+    url, login, senha = args.url, args.login, args.senha
+    if args.subir:
+        proc, url, login, senha = _subir(args.escala, Path(args.pasta or tempfile.gettempdir()))
+    try:
+        res = carga(url, _token(url, login, senha), args.clientes, args.segundos, args.escrita)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        print(json.dumps(res, indent=2))
+    else:
+        print(f"{res['clientes']} clientes, {res['segundos']} s")
+        for nome, m in [("TOTAL", res["total"]), *res["rotas"].items()]:
+            print(f"  {nome:<18} {m['n']:>7} req  {m.get('rps', 0):>8.1f} req/s  "
+                  f"p50 {m.get('p50_ms', 0):>7.2f} ms  p95 {m.get('p95_ms', 0):>7.2f} ms")
+        if res["erros"]:
+            print("  erros:", res["erros"])
@@ -0,0 +1,162 @@
+# benchmarks/run.py
+"""
+Benchmarks ponta a ponta sobre a frota sintética do seed_data.
+
+Para cada escala gera (ou reaproveita) um banco determinístico e mede, em um
+subprocesso próprio (o db fixa DB_PATH no import), os caminhos quentes do app:
+carga dos relatórios, listagens de manutenção/OS, lookup de login e exportação CSV.
+O resultado vai em JSON para benchmarks/results/; com --comparar, as métricas que
+pioraram além da tolerância em relação a um resultado anterior são apontadas
+(e o processo sai com código 1).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run --escalas 1 10
+    python -m benchmarks.run --escalas 1 --comparar benchmarks/results/base.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks import percentil
+
+RAIZ = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+def _medir(fn, repeticoes: int) -> dict:
+    fn()  # aquecimento (cache de páginas do SQLite, imports tardios)
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    tempos.sort()
+    return {
+        "n": len(tempos),
+        "p50_ms": round(statistics.median(tempos), 3),
+        "p95_ms": round(percentil(tempos, 0.95), 3),
+        "max_ms": round(tempos[-1], 3),
+    }
+
+def _cenario(repeticoes: int) -> dict:
+    """Roda dentro do subprocesso, com FROTA_DB_PATH já apontando para o banco."""
+    sys.path.insert(0, str(RAIZ))
+    import db
+    db.bootstrap()
+    from services import manutencoes, ordens_servico, relatorios, usuarios  # sem Streamlit
+
+    df_os, df_man, df_frota = relatorios.carregar()
+    logins = [r["username"] for r in usuarios.list_users().to_dict("records")][:50] or ["admin"]
+
+    def _login():
+        for login in logins:
+            usuarios.get_user_by_login(login)
+
+    def _csv(tabela):
+        def _f():
+            fmt, idx, _ = relatorios.EXPORTS[tabela]
+            relatorios.write_csv(fmt((df_os, df_man, df_frota)[idx]), io.BytesIO())
+        return _f
+
+    casos = {
+        "relatorios.load_data": relatorios.carregar,
+        "manutencao.listar": manutencoes.listar_manutencoes,
+        "abertura_os.listar": ordens_servico.listar_os,
+        "auth.login_lookup": _login,
+        "csv.manutencoes": _csv("manutencoes"),
+        "csv.os": _csv("os"),
+        "csv.manutencoes.stream": lambda: relatorios.write_csv_stream("manutencoes", {}, io.BytesIO()),
+        "relatorios.ranking_placa": lambda: relatorios.custos_por("placa", {}),
+    }
+    return {
+        "linhas": {"veiculos": len(df_frota), "ordens_servico": len(df_os), "manutencoes": len(df_man)},
+        "medidas": {nome: _medir(fn, repeticoes) for nome, fn in casos.items()},
+    }
+
+def _banco(escala: float, seed: int, pasta: Path) -> Path:
+    path = pasta / f"frota_e{escala:g}_s{seed}.db"
+    if not path.exists():
+        sys.path.insert(0, str(RAIZ))
+        import seed_data
+        t0 = time.perf_counter()
+        seed_data.gerar_escala(str(path), escala, seed=seed)
+        print(f"  banco gerado em {time.perf_counter() - t0:.1f}s: {path}")
+    return path
+
+def run(escalas, seed: int = 42, repeticoes: int = 5, pasta=None) -> dict:
+    pasta = Path(pasta or tempfile.gettempdir())
+    resultado = {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "seed": seed,
+        "repeticoes": repeticoes,
+        "escalas": {},
+    }
+    for escala in escalas:
+        print(f"escala {escala:g}")
+        env = dict(os.environ, FROTA_DB_PATH=str(_banco(escala, seed, pasta)))
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--_cenario", "--repeticoes", str(repeticoes)],
+            cwd=RAIZ, env=env, capture_output=True, text=True, check=True,
+        )
+        resultado["escalas"][f"{escala:g}"] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return resultado
+
+def comparar(atual: dict, base: dict, tolerancia: float = 0.20) -> list:
+    """Métricas (p50) que pioraram mais que `tolerancia` em relação à base."""
+    regressoes = []
+    for escala, dados in atual["escalas"].items():
+        anteriores = base.get("escalas", {}).get(escala, {}).get("medidas", {})
+        for nome, m in dados["medidas"].items():
+            antes = anteriores.get(nome)
+            if antes and antes["p50_ms"] > 0 and m["p50_ms"] > antes["p50_ms"] * (1 + tolerancia):
+                regressoes.append((escala, nome, antes["p50_ms"], m["p50_ms"]))
+    return regressoes
+
+def _imprimir(resultado: dict) -> None:
+    for escala, dados in resultado["escalas"].items():
+        linhas = ", ".join(f"{k}={v:,}" for k, v in dados["linhas"].items())
+        print(f"\nescala {escala} ({linhas})")
+        for nome, m in dados["medidas"].items():
+            print(f"  {nome:<24} p50 {m['p50_ms']:>10.2f} ms   p95 {m['p95_ms']:>10.2f} ms")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--escalas", type=float, nargs="+", default=[1.0])
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeticoes", type=int, default=5)
+    ap.add_argument("--pasta", help="onde guardar os bancos gerados (padrão: tmp do sistema)")
+    ap.add_argument("--saida", help="arquivo JSON (padrão: benchmarks/results/<data>.json)")
+    ap.add_argument("--comparar", help="JSON anterior para detectar regressões")
+    ap.add_argument("--tolerancia", type=float, default=0.20)
+    ap.add_argument("--_cenario", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args._cenario:
+        print(json.dumps(_cenario(args.repeticoes)))
+        sys.exit(0)
+
+    resultado = run(args.escalas, seed=args.seed, repeticoes=args.repeticoes, pasta=args.pasta)
+    _imprimir(resultado)
+
+    saida = Path(args.saida) if args.saida else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\nresultado: {saida}")
+
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        regressoes = comparar(resultado, base, args.tolerancia)
+        for escala, nome, antes, depois in regressoes:
+            print(f"REGRESSÃO escala {escala} {nome}: {antes:.2f} -> {depois:.2f} ms")
+        if regressoes:
+            sys.exit(1)
+        print("sem regressões")
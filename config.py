@@ -1,16 +1,70 @@
 # config.py
-import streamlit as st
+import os
 from pathlib import Path
 
-# data.db na raiz do projeto
+# data.db na raiz do projeto (FROTA_DB_PATH permite apontar outro arquivo, ex.: benchmarks)
 BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "data.db"
+DB_PATH = Path(os.getenv("FROTA_DB_PATH") or BASE_DIR / "data.db")
+
+# jobs em segundo plano (exportações/relatórios pesados): pasta dos arquivos gerados,
+# nº de workers do pool e por quanto tempo o resultado fica disponível p/ download
+JOBS_DIR = Path(os.getenv("FROTA_JOBS_DIR") or BASE_DIR / "jobs_out")
+JOBS_WORKERS = int(os.getenv("FROTA_JOBS_WORKERS", "2"))
+JOBS_RESULT_TTL_HOURS = int(os.getenv("FROTA_JOBS_TTL_HOURS", "24"))
+
+# leituras de relatórios/listagens:
+#   "off"      -> mesma conexão de escrita (comportamento antigo)
+#   "readonly" -> banco em WAL + conexão mode=ro/query_only (leitor não bloqueia escritor)
+#   "snapshot" -> cópia periódica do banco (backup API) em REPORTING_SNAPSHOT_PATH
+REPORTING_MODE = os.getenv("FROTA_REPORTING_MODE", "readonly").strip().lower()
+REPORTING_SNAPSHOT_PATH = Path(os.getenv("FROTA_REPORTING_SNAPSHOT") or DB_PATH.with_name(f"{DB_PATH.stem}_relatorios.db"))
+REPORTING_SNAPSHOT_SECONDS = int(os.getenv("FROTA_REPORTING_SNAPSHOT_SECONDS", "300"))
+
+# escritas (db.run_write): espera por lock em cada tentativa (busy_timeout) e
+# retentativas com backoff exponencial quando o banco está ocupado
+WRITE_BUSY_TIMEOUT_S = float(os.getenv("FROTA_WRITE_BUSY_TIMEOUT_S", "2"))
+WRITE_RETRIES = int(os.getenv("FROTA_WRITE_RETRIES", "4"))
+WRITE_BACKOFF_S = float(os.getenv("FROTA_WRITE_BACKOFF_S", "0.05"))
+WRITE_BACKOFF_MAX_S = float(os.getenv("FROTA_WRITE_BACKOFF_MAX_S", "1.0"))
+
+# instrumentação por rerun (fases + SQL) vista na página "Desempenho" (admin);
+# INSTRUMENTATION_JSONL grava cada rerun como uma linha JSON p/ análise offline
+INSTRUMENTATION = os.getenv("FROTA_INSTRUMENTATION", "1").strip().lower() not in ("0", "false", "off", "")
+INSTRUMENTATION_RERUNS = int(os.getenv("FROTA_INSTRUMENTATION_RERUNS", "50"))
+INSTRUMENTATION_JSONL = os.getenv("FROTA_INSTRUMENTATION_JSONL", "")
+
+# consultas acima de SLOW_QUERY_MS (ms; negativo desliga) entram no log de lentas com o
+# EXPLAIN QUERY PLAN; os agregados por fingerprint guardam as últimas N durações p/ p50/p95
+SLOW_QUERY_MS = float(os.getenv("FROTA_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_KEEP = int(os.getenv("FROTA_SLOW_QUERY_KEEP", "200"))
+SLOW_QUERY_LOG = os.getenv("FROTA_SLOW_QUERY_LOG", "")
+QUERY_STATS_SAMPLES = int(os.getenv("FROTA_QUERY_STATS_SAMPLES", "256"))
+
+# detecção de anomalias (anomalias.py): preço unitário acima de ANOMALIA_FATOR_PRECO x a
+# mediana das últimas ANOMALIA_JANELA_PRECO compras da mesma peça; gasto mensal do veículo
+# acima de ANOMALIA_FATOR_GASTO x a mediana dos ANOMALIA_JANELA_MESES meses anteriores
+# (e pelo menos ANOMALIA_GASTO_MIN acima dela)
+ANOMALIA_JANELA_PRECO = int(os.getenv("FROTA_ANOMALIA_JANELA_PRECO", "30"))
+ANOMALIA_MIN_HIST = int(os.getenv("FROTA_ANOMALIA_MIN_HIST", "5"))
+ANOMALIA_FATOR_PRECO = float(os.getenv("FROTA_ANOMALIA_FATOR_PRECO", "2.5"))
+ANOMALIA_JANELA_MESES = int(os.getenv("FROTA_ANOMALIA_JANELA_MESES", "6"))
+ANOMALIA_FATOR_GASTO = float(os.getenv("FROTA_ANOMALIA_FATOR_GASTO", "4"))
+ANOMALIA_GASTO_MIN = float(os.getenv("FROTA_ANOMALIA_GASTO_MIN", "5000"))
+
+# API HTTP (api.py) para integrações: endereço, conexões guardadas no pool e teto de
+# itens por página / por lote de gravação
+API_HOST = os.getenv("FROTA_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("FROTA_API_PORT", "8502"))
+API_POOL_SIZE = int(os.getenv("FROTA_API_POOL_SIZE", "8"))
+API_MAX_PAGE = int(os.getenv("FROTA_API_MAX_PAGE", "500"))
+API_MAX_LOTE = int(os.getenv("FROTA_API_MAX_LOTE", "5000"))
 
 def apply_config() -> None:
     """
     Só configura a página. Nada de CSS, nada de st.sidebar, nada de markdown aqui.
     Deixe todo o CSS no app.py.
     """
+    import streamlit as st  # só aqui: config é importado também fora do Streamlit (API, jobs, benchmarks)
     st.set_page_config(
         page_title="Controle de Frota",
         page_icon="🚚",
@@ -0,0 +1,194 @@
+# cubo_custos.py
+"""
+Cubo de custos de manutenção: mês × classe mecânica × classe operacional × marca ×
+fornecedor, pré-agregado na tabela `cubo_custos`.
+
+- triggers em `manutencoes` (e em `veiculos`, quando muda classe/marca) anotam os meses
+  afetados em `cubo_custos_pendentes`; `atualizar()` recalcula só esses meses;
+- `consultar()` faz slice/dice (filtros por dimensão e faixa de meses) e roll-up
+  (agrupa só pelas dimensões pedidas); `pivot()` devolve a tabela larga p/ a tela.
+
+O mês vem de `manutencoes.data` (aaaa-mm) e, sem data válida, de `manutencoes.mes`.
+
+Uso:
+    cubo_custos.pivot(linhas=["classe_mecanica"], coluna="mes", de="2025-01", ate="2025-06")
+    cubo_custos.consultar(["fornecedor"], filtros={"marca": ["VOLVO", "SCANIA"]})
+"""
+import time
+from typing import Dict, Optional, Sequence
+
+import pandas as pd
+
+import metrics
+from config import DB_PATH
+from db import get_conn, run_write
+
+TABLE = "cubo_custos"
+PENDENTES = "cubo_custos_pendentes"
+DIMENSOES = ("mes", "classe_mecanica", "classe_operacional", "marca", "fornecedor")
+MEDIDAS = ("custo", "itens", "linhas")
+
+# mesma regra no build, nos triggers (NEW./OLD. trocam o prefixo) e no índice de expressão
+# ix_manutencoes_cubo_mes — o texto precisa bater exatamente para o SQLite usar o índice
+_MES = "COALESCE(strftime('%Y-%m', {p}data), {p}mes, '')"
+# meses por comando no _rebuild (cada um vira um parâmetro do IN)
+_LOTE_MESES = 500
+
+_schema_ready: set = set()
+
+def _ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        novo = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (TABLE,)
+        ).fetchone() is None
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            mes TEXT NOT NULL,
+            classe_mecanica TEXT NOT NULL,
+            classe_operacional TEXT NOT NULL,
+            marca TEXT NOT NULL,
+            fornecedor TEXT NOT NULL,
+            custo REAL NOT NULL,
+            itens REAL NOT NULL,        -- soma de qtd
+            linhas INTEGER NOT NULL,    -- nº de lançamentos
+            PRIMARY KEY (mes, classe_mecanica, classe_operacional, marca, fornecedor)
+        ) WITHOUT ROWID;
+        """)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {PENDENTES} (mes TEXT PRIMARY KEY) WITHOUT ROWID;")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_manutencoes_cubo_mes ON manutencoes({_MES.format(p='')});")
+        novo_m, velho_m = _MES.format(p="NEW."), _MES.format(p="OLD.")
+        conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cubo_man_ins AFTER INSERT ON manutencoes BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} (mes) VALUES ({novo_m});
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_cubo_man_del AFTER DELETE ON manutencoes BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} (mes) VALUES ({velho_m});
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_cubo_man_upd AFTER UPDATE ON manutencoes BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} (mes) VALUES ({velho_m});
+            INSERT OR IGNORE INTO {PENDENTES} (mes) VALUES ({novo_m});
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_cubo_veic_upd
+        AFTER UPDATE OF classe_mecanica, classe_operacional, marca ON veiculos BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} (mes)
+            SELECT DISTINCT {_MES.format(p="")} FROM manutencoes WHERE veiculo_id = NEW.id;
+        END;
+        """)
+        if novo:
+            # primeira vez neste banco: todos os meses entram no próximo atualizar()
+            conn.execute(f"INSERT OR IGNORE INTO {PENDENTES} (mes) SELECT DISTINCT {_MES.format(p='')} FROM manutencoes;")
+    _schema_ready.add(str(DB_PATH))
+
+def _rebuild(conn) -> int:
+    meses = [r[0] for r in conn.execute(f"SELECT mes FROM {PENDENTES};").fetchall()]
+    if not meses:
+        return 0
+    conn.execute(f"DELETE FROM {TABLE} WHERE mes IN (SELECT mes FROM {PENDENTES});")
+    # meses como parâmetros (e não IN (SELECT ...)): assim o plano é SEARCH no
+    # ix_manutencoes_cubo_mes; com a subconsulta o SQLite varre o índice inteiro p/ o GROUP BY
+    for i in range(0, len(meses), _LOTE_MESES):
+        lote = meses[i:i + _LOTE_MESES]
+        conn.execute(f"""
+            INSERT INTO {TABLE} (mes, classe_mecanica, classe_operacional, marca, fornecedor, custo, itens, linhas)
+            SELECT {_MES.format(p="m.")} AS mes,
+                   COALESCE(v.classe_mecanica, ''), COALESCE(v.classe_operacional, ''),
+                   COALESCE(v.marca, ''), COALESCE(m.fornecedor, ''),
+                   SUM(COALESCE(m.vlr_peca, m.qtd * m.vlr_unitario, 0)), SUM(COALESCE(m.qtd, 0)), COUNT(*)
+            FROM manutencoes m
+            LEFT JOIN veiculos v ON v.id = m.veiculo_id
+            WHERE {_MES.format(p="m.")} IN ({", ".join("?" * len(lote))})
+            GROUP BY 1, 2, 3, 4, 5;
+        """, lote)
+    conn.execute(f"DELETE FROM {PENDENTES};")
+    return len(meses)
+
+def atualizar() -> int:
+    """Recalcula os meses pendentes. Retorna quantos meses foram refeitos (0 = cubo em dia)."""
+    _ensure_schema()
+    with get_conn() as conn:
+        if conn.execute(f"SELECT 1 FROM {PENDENTES} LIMIT 1;").fetchone() is None:
+            return 0
+    t0 = time.perf_counter()
+    n = run_write(_rebuild)
+    metrics.observe("cubo.refresh_ms", (time.perf_counter() - t0) * 1000)
+    metrics.incr("cubo.meses_refeitos", n)
+    return n
+
+def reconstruir() -> int:
+    """Marca todos os meses como pendentes e recalcula o cubo inteiro."""
+    _ensure_schema()
+    def _tudo(conn):
+        conn.execute(f"DELETE FROM {TABLE};")
+        conn.execute(f"INSERT OR IGNORE INTO {PENDENTES} (mes) SELECT DISTINCT {_MES.format(p='')} FROM manutencoes;")
+        return _rebuild(conn)
+    return run_write(_tudo)
+
+def _where(filtros: Optional[Dict[str, object]], de: Optional[str], ate: Optional[str]):
+    conds, params = [], []
+    for dim, valor in (filtros or {}).items():
+        if dim not in DIMENSOES:
+            raise ValueError(f"Dimensão desconhecida: {dim}")
+        if valor is None or valor == [] or valor == "":
+            continue
+        valores = [valor] if isinstance(valor, str) else list(valor)
+        conds.append(f"{dim} IN ({', '.join('?' * len(valores))})")
+        params += valores
+    if de:
+        conds.append("mes >= ?"); params.append(de[:7])
+    if ate:
+        conds.append("mes <= ?"); params.append(ate[:7])
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+def consultar(dimensoes: Sequence[str] = ("mes",), filtros: Optional[Dict[str, object]] = None,
+              de: Optional[str] = None, ate: Optional[str] = None, atualizar_antes: bool = True) -> pd.DataFrame:
+    """
+    Roll-up pelas `dimensoes` pedidas (as demais são somadas), com slice/dice por
+    `filtros` ({dimensão: valor ou lista}) e faixa de meses `de`/`ate` (aaaa-mm).
+    Colunas: dimensões + custo, itens, linhas.
+    """
+    for dim in dimensoes:
+        if dim not in DIMENSOES:
+            raise ValueError(f"Dimensão desconhecida: {dim}")
+    if atualizar_antes:
+        atualizar()
+    else:
+        _ensure_schema()
+    where, params = _where(filtros, de, ate)
+    dims = ", ".join(dimensoes)
+    sql = (f"SELECT {dims + ', ' if dims else ''}SUM(custo) AS custo, SUM(itens) AS itens, SUM(linhas) AS linhas "
+           f"FROM {TABLE}{where}")
+    if dims:
+        sql += f" GROUP BY {dims} ORDER BY {dims}"
+    # lê do banco principal (não do snapshot): o cubo é pequeno e acabou de ser atualizado
+    with metrics.timed("cubo.consulta_ms"), get_conn() as conn:
+        df = pd.read_sql(sql, conn, params=params)
+    return df
+
+def pivot(linhas: Sequence[str], coluna: Optional[str] = "mes", medida: str = "custo",
+          filtros: Optional[Dict[str, object]] = None, de: Optional[str] = None, ate: Optional[str] = None,
+          totais: bool = True) -> pd.DataFrame:
+    """Tabela larga: `linhas` no índice, valores de `coluna` nas colunas, `medida` nas células."""
+    if medida not in MEDIDAS:
+        raise ValueError(f"Medida desconhecida: {medida}")
+    dims = list(dict.fromkeys([*linhas, *([coluna] if coluna else [])]))
+    df = consultar(dims, filtros, de, ate)
+    if df.empty:
+        return df
+    if not coluna or coluna in linhas:
+        return df.groupby(list(linhas))[[medida]].sum().sort_values(medida, ascending=False)
+    tabela = df.pivot_table(index=list(linhas), columns=coluna, values=medida, aggfunc="sum", fill_value=0)
+    tabela.columns = [str(c) for c in tabela.columns]
+    if totais:
+        tabela["Total"] = tabela.sum(axis=1)
+        tabela = tabela.sort_values("Total", ascending=False)
+    return tabela
+
+def valores(dimensao: str) -> list:
+    """Valores distintos de uma dimensão (opções dos filtros na tela)."""
+    if dimensao not in DIMENSOES:
+        raise ValueError(f"Dimensão desconhecida: {dimensao}")
+    _ensure_schema()
+    with get_conn() as conn:
+        return [r[0] for r in conn.execute(f"SELECT DISTINCT {dimensao} FROM {TABLE} ORDER BY 1;").fetchall()]
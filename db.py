@@ -1,20 +1,479 @@
 # db.py
+import json
+import logging
+import os
+import queue
+import random
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from config import DB_PATH
+from pathlib import Path
+
+import metrics
+from instrumentation import CONNECTION_FACTORY
+from config import (
+    DB_PATH, REPORTING_MODE, REPORTING_SNAPSHOT_PATH, REPORTING_SNAPSHOT_SECONDS,
+    WRITE_BUSY_TIMEOUT_S, WRITE_RETRIES, WRITE_BACKOFF_S, WRITE_BACKOFF_MAX_S,
+)
+
+log = logging.getLogger(__name__)
+
+def _is_locked(e: Exception) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
 
 @contextmanager
-def get_conn():
-    # Se usar threads no Streamlit, pode usar check_same_thread=False
-    conn = sqlite3.connect(DB_PATH)
+def _measured(papel: str):
+    """Duração de uso da conexão e nº de 'database is locked' por papel (métricas de contenção)."""
+    t0 = time.perf_counter()
     try:
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON;")
-        yield conn
-        conn.commit()
+        yield
+    except sqlite3.OperationalError as e:
+        if _is_locked(e):
+            metrics.incr(f"db.{papel}.locked")
+        raise
+    finally:
+        metrics.observe(f"db.{papel}.ms", (time.perf_counter() - t0) * 1000)
+
+# ==================== Conexões ====================
+# Único ponto que abre conexões do app: instrumentação (instrumentation.py), row factory
+# e PRAGMAs ficam aqui; telas e serviços usam get_conn/get_read_conn/run_write e os
+# helpers abaixo, nunca sqlite3.connect direto.
+DEFAULT_CHUNK = 5000
+
+def dict_factory(cursor, row) -> dict:
+    return {d[0]: v for d, v in zip(cursor.description, row)}
+
+# "row" = sqlite3.Row (acesso por nome e índice), "dict", "tuple" (mais barato p/ volume)
+ROW_FACTORIES = {"row": sqlite3.Row, "dict": dict_factory, "tuple": None}
+
+def connect(path=None, *, readonly: bool = False, timeout: float = 5.0, row_factory: str = "row",
+            check_same_thread: bool = True):
+    """
+    Abre uma conexão (sem context manager). `readonly` abre com mode=ro + query_only;
+    caso contrário liga foreign_keys. Prefira get_conn/get_read_conn.
+    """
+    path = path or DB_PATH
+    if readonly:
+        conn = sqlite3.connect(_ro_uri(path), uri=True, timeout=timeout, factory=CONNECTION_FACTORY,
+                               check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(path, timeout=timeout, factory=CONNECTION_FACTORY,
+                               check_same_thread=check_same_thread)
+    conn.row_factory = ROW_FACTORIES[row_factory]
+    conn.execute("PRAGMA query_only = ON;" if readonly else "PRAGMA foreign_keys = ON;")
+    return conn
+
+@contextmanager
+def get_conn(row_factory: str = "row"):
+    """Conexão de leitura/escrita; commit ao sair sem erro."""
+    conn = connect(row_factory=row_factory)
+    try:
+        with _measured("rw"):
+            yield conn
+            conn.commit()
+    finally:
+        conn.close()
+
+# ==================== Escritas (BEGIN IMMEDIATE + retry) ====================
+def run_write(fn, conn=None, *, retries: int = WRITE_RETRIES):
+    """
+    Executa fn(conn) numa transação BEGIN IMMEDIATE e faz commit. Se o banco estiver
+    ocupado (SQLITE_BUSY / 'database is locked'), desfaz e tenta de novo com backoff
+    exponencial (com jitter) até `retries` vezes; fn precisa poder ser repetida.
+
+    Sem `conn`, abre uma conexão própria por tentativa (busy_timeout = WRITE_BUSY_TIMEOUT_S).
+    Com `conn`, usa a conexão do chamador, que não pode ter transação aberta.
+
+    Métricas: db.write.lock_wait_ms (espera até obter o lock de escrita),
+    db.write.tx_ms, db.write.retries, db.write.failed.
+    """
+    attempt = 0
+    while True:
+        own = conn is None
+        c = connect(timeout=WRITE_BUSY_TIMEOUT_S) if own else conn
+        try:
+            t0 = time.perf_counter()
+            c.execute("BEGIN IMMEDIATE;")
+            t1 = time.perf_counter()
+            metrics.observe("db.write.lock_wait_ms", (t1 - t0) * 1000)
+            result = fn(c)
+            c.commit()
+            metrics.observe("db.write.tx_ms", (time.perf_counter() - t1) * 1000)
+            return result
+        except sqlite3.OperationalError as e:
+            if c.in_transaction:
+                c.rollback()
+            if not _is_locked(e) or attempt >= retries:
+                if _is_locked(e):
+                    metrics.incr("db.write.failed")
+                raise
+            metrics.incr("db.write.retries")
+            time.sleep(min(WRITE_BACKOFF_MAX_S, WRITE_BACKOFF_S * 2 ** attempt) * random.uniform(0.5, 1.0))
+            attempt += 1
+        except BaseException:
+            if c.in_transaction:
+                c.rollback()
+            raise
+        finally:
+            if own:
+                c.close()
+
+def execute_write(sql: str, params=()):
+    """Um único comando de escrita via run_write. Retorna o cursor (lastrowid/rowcount)."""
+    return run_write(lambda c: c.execute(sql, params))
+
+# ==================== Leituras de relatório (REPORTING_MODE) ====================
+_snapshot_lock = threading.Lock()
+
+def refresh_reporting_snapshot(force: bool = False) -> bool:
+    """
+    Atualiza a cópia de relatórios (backup API) se estiver mais velha que
+    REPORTING_SNAPSHOT_SECONDS. Retorna True se copiou.
+    """
+    with _snapshot_lock:
+        dst_path = Path(REPORTING_SNAPSHOT_PATH)
+        if (not force and dst_path.exists()
+                and time.time() - dst_path.stat().st_mtime < REPORTING_SNAPSHOT_SECONDS):
+            return False
+        tmp_path = dst_path.with_name(dst_path.name + ".tmp")
+        t0 = time.perf_counter()
+        src = sqlite3.connect(_ro_uri(DB_PATH), uri=True)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst)   # em WAL a cópia não bloqueia os escritores
+            dst.execute("PRAGMA journal_mode = DELETE;")  # cópia é só leitura: sem -wal/-shm
+        finally:
+            dst.close()
+            src.close()
+        try:
+            os.replace(tmp_path, dst_path)
+        except OSError:
+            # Windows: snapshot antigo ainda aberto por algum leitor; tenta no próximo ciclo
+            tmp_path.unlink(missing_ok=True)
+            return False
+        metrics.incr("db.snapshot.refresh")
+        metrics.observe("db.snapshot.ms", (time.perf_counter() - t0) * 1000)
+        return True
+
+def _ro_uri(path) -> str:
+    return f"{Path(path).resolve().as_uri()}?mode=ro"
+
+@contextmanager
+def get_read_conn(row_factory: str = "row"):
+    """
+    Conexão só de leitura para relatórios/listagens, conforme REPORTING_MODE:
+    "off" usa uma conexão normal; "readonly" abre o data.db (WAL) com mode=ro e
+    query_only; "snapshot" lê da cópia periódica em REPORTING_SNAPSHOT_PATH.
+    """
+    mode = REPORTING_MODE if REPORTING_MODE in ("off", "readonly", "snapshot") else "off"
+    if mode == "off":
+        conn = connect(row_factory=row_factory)
+        conn.execute("PRAGMA query_only = ON;")
+    else:
+        path = DB_PATH
+        if mode == "snapshot":
+            refresh_reporting_snapshot()
+            path = REPORTING_SNAPSHOT_PATH
+        conn = connect(path, readonly=True, row_factory=row_factory)
+    try:
+        with _measured(f"leitura.{mode}"):
+            yield conn
     finally:
         conn.close()
 
+# ==================== Pool (processos de longa duração) ====================
+class ConnectionPool:
+    """
+    Conexões reaproveitadas entre requisições (API HTTP): abrir conexão + PRAGMAs a cada
+    chamada custa mais que a própria consulta pequena. Até `size` conexões ficam guardadas;
+    acima disso a conexão extra é fechada ao devolver (o pool nunca bloqueia).
+    `readonly` lê sempre o banco principal (mode=ro), não o snapshot de relatórios.
+
+        pool = ConnectionPool(8)
+        with pool.conexao("dict") as conn: ...
+        pool.run_write(lambda conn: ...)
+    """
+    def __init__(self, size: int = 8, *, readonly: bool = False, path=None):
+        self.size = size
+        self.readonly = readonly
+        self.path = path
+        self._livres = queue.LifoQueue(maxsize=size)
+
+    def _abrir(self):
+        metrics.incr("db.pool.aberta")
+        timeout = 5.0 if self.readonly else WRITE_BUSY_TIMEOUT_S
+        return connect(self.path, readonly=self.readonly, timeout=timeout, check_same_thread=False)
+
+    @contextmanager
+    def conexao(self, row_factory: str = "row"):
+        try:
+            conn = self._livres.get_nowait()
+        except queue.Empty:
+            conn = self._abrir()
+        conn.row_factory = ROW_FACTORIES[row_factory]
+        ok = False
+        try:
+            with _measured("pool"):
+                yield conn
+            if conn.in_transaction:
+                conn.commit()
+            ok = True
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if ok:
+                try:
+                    self._livres.put_nowait(conn)
+                    conn = None
+                except queue.Full:
+                    pass
+            if conn is not None:
+                conn.close()  # pool cheio ou erro no meio do uso (estado incerto)
+
+    def run_write(self, fn, *, retries: int = WRITE_RETRIES):
+        """run_write() numa conexão do pool."""
+        with self.conexao() as conn:
+            return run_write(fn, conn, retries=retries)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                return
+
+# ==================== Consultas prontas ====================
+def _conn_for(read: bool, row_factory: str):
+    return get_read_conn(row_factory) if read else get_conn(row_factory)
+
+def fetchall(sql: str, params=(), *, row_factory: str = "dict", read: bool = False) -> list:
+    with _conn_for(read, row_factory) as conn:
+        return conn.execute(sql, params).fetchall()
+
+def fetchone(sql: str, params=(), *, row_factory: str = "dict", read: bool = False):
+    with _conn_for(read, row_factory) as conn:
+        return conn.execute(sql, params).fetchone()
+
+def table_columns(conn, table: str) -> list:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def select_page(table: str, columns, *, contains: dict = None, equals: dict = None,
+                order_by: str = "id", page: int = 1, per_page: int = 50, read: bool = True, conn=None):
+    """
+    Listagem paginada só com as colunas pedidas (as que não existem na tabela são
+    ignoradas). `contains` filtra com LIKE %valor% (sem caixa p/ ASCII), `equals` por
+    igualdade sem caixa; valores vazios não filtram. Retorna (colunas, linhas, total).
+    `per_page=None` traz todas as linhas do filtro (exportação). Com `conn` (ex.: do
+    ConnectionPool, row_factory "tuple" ou "row") usa a conexão do chamador.
+    """
+    if conn is None:
+        with _conn_for(read, "tuple") as conn:
+            return select_page(table, columns, contains=contains, equals=equals, order_by=order_by,
+                               page=page, per_page=per_page, conn=conn)
+    existentes = set(table_columns(conn, table))
+    cols = [c for c in columns if c in existentes]
+    conds, params = [], []
+    for col, val in (contains or {}).items():
+        if col in existentes and val:
+            conds.append(f"{col} LIKE ?"); params.append(f"%{val.strip()}%")
+    for col, val in (equals or {}).items():
+        if col in existentes and val:
+            conds.append(f"LOWER({col}) = ?"); params.append(val.strip().lower())
+    where = (" WHERE " + " AND ".join(conds)) if conds else ""
+    total = conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+    sql = f"SELECT {', '.join(cols) or 'rowid'} FROM {table}{where} ORDER BY {order_by}"
+    if per_page:
+        sql += " LIMIT ? OFFSET ?"
+        params = params + [per_page, (max(page, 1) - 1) * per_page]
+    return cols, conn.execute(sql, params).fetchall(), total
+
+def iter_chunks(sql: str, params=(), *, size: int = DEFAULT_CHUNK, read: bool = True,
+                row_factory: str = "tuple"):
+    """
+    Lê o resultado em blocos de `size` linhas (fetchmany), com a conexão aberta só
+    enquanto o gerador é consumido. Gera (colunas, linhas) por bloco.
+    """
+    with _conn_for(read, row_factory) as conn:
+        cur = conn.execute(sql, params)
+        cols = [d[0] for d in cur.description]
+        try:
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows:
+                    break
+                yield cols, rows
+        finally:
+            cur.close()
+
+def iter_frames(sql: str, params=(), *, size: int = DEFAULT_CHUNK, read: bool = True):
+    """Como iter_chunks, mas gera um DataFrame por bloco (memória limitada a `size` linhas)."""
+    import pandas as pd
+    for cols, rows in iter_chunks(sql, params, size=size, read=read):
+        yield pd.DataFrame.from_records(rows, columns=cols)
+
+# blocos guardados no máximo enquanto alguma coluna só tem NULL (tipo ainda indefinido)
+ARROW_PEEK_CHUNKS = 4
+
+def _arrow_col(pa, values, tipo=None):
+    try:
+        return pa.array(values, type=tipo)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if tipo is None or pa.types.is_string(tipo):
+            # coluna com tipos misturados (SQLite não impõe tipo): cai para texto
+            return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        try:
+            return pa.array(values).cast(tipo)  # ex.: int numa coluna float64
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"valor incompatível com o tipo {tipo} já definido para a coluna "
+                             f"(use CAST na consulta): {e}") from e
+
+def iter_arrow(sql: str, params=(), *, size: int = DEFAULT_CHUNK, read: bool = True):
+    """
+    Gera pyarrow.RecordBatch por bloco, todos com o mesmo schema (dá para juntar com
+    pa.Table.from_batches). O tipo de cada coluna vem do primeiro bloco em que ela tem
+    valor; tipos misturados ou coluna só com NULL nos ARROW_PEEK_CHUNKS primeiros blocos
+    viram texto. O pyarrow é opcional (vem junto com o streamlit).
+    """
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("db.iter_arrow precisa do pyarrow instalado (pip install pyarrow).") from e
+    schema, tipos, pendentes = None, None, []
+    for cols, rows in iter_chunks(sql, params, size=size, read=read):
+        colunas = [list(v) for v in zip(*rows)]
+        if schema is None:
+            tipos = tipos or [None] * len(cols)
+            for i, v in enumerate(colunas):
+                t = tipos[i]
+                novo = _arrow_col(pa, v).type
+                if pa.types.is_null(novo):
+                    continue
+                if t is None:
+                    tipos[i] = novo
+                elif t != novo:
+                    numeros = all(pa.types.is_integer(x) or pa.types.is_floating(x) for x in (t, novo))
+                    tipos[i] = pa.float64() if numeros else pa.string()
+            pendentes.append((cols, colunas))
+            if None in tipos and len(pendentes) < ARROW_PEEK_CHUNKS:
+                continue
+            schema = pa.schema([(c, t or pa.string()) for c, t in zip(cols, tipos)])
+            for _, cs in pendentes:
+                yield _arrow_batch(pa, schema, cs)
+            pendentes = []
+            continue
+        yield _arrow_batch(pa, schema, colunas)
+    if pendentes:  # terminou antes de fechar o schema
+        schema = pa.schema([(c, t or pa.string()) for c, t in zip(pendentes[0][0], tipos)])
+        for _, cs in pendentes:
+            yield _arrow_batch(pa, schema, cs)
+
+def _arrow_batch(pa, schema, colunas):
+    return pa.RecordBatch.from_arrays([_arrow_col(pa, v, f.type) for v, f in zip(colunas, schema)], schema=schema)
+
+def execute_many(sql: str, rows, *, size: int = DEFAULT_CHUNK) -> int:
+    """
+    Escrita em massa: executemany em lotes de `size`, cada lote numa transação
+    run_write (o lote é materializado para poder ser repetido em caso de lock).
+    Retorna o nº de linhas enviadas.
+    """
+    total, lote = 0, []
+    def _flush(lote):
+        run_write(lambda c: c.executemany(sql, lote))
+        return len(lote)
+    for row in rows:
+        lote.append(row)
+        if len(lote) >= size:
+            total += _flush(lote)
+            lote = []
+    if lote:
+        total += _flush(lote)
+    return total
+
+# ==================== Change log (CDC) ====================
+# Toda alteração em veiculos/manutencoes/ordens_servico vira uma linha em change_log
+# (via triggers), com `seq` crescente e nunca reutilizado (AUTOINCREMENT). Quem mantém
+# cache/agregado/exportação guarda o último seq processado e pede changes_since(seq).
+CHANGE_LOG_TABLE = "change_log"
+CHANGE_LOG_TABLES = ("veiculos", "manutencoes", "ordens_servico")
+
+def _create_change_log(c) -> None:
+    c.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabela TEXT NOT NULL,
+        op TEXT NOT NULL,              -- I / U / D
+        row_id INTEGER NOT NULL,
+        em TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),  -- UTC
+        antes TEXT,                    -- JSON da linha antes (U/D)
+        depois TEXT                    -- JSON da linha depois (I/U)
+    );
+    """)
+    c.execute(f"CREATE INDEX IF NOT EXISTS ix_change_log_tabela ON {CHANGE_LOG_TABLE}(tabela, seq);")
+
+def _change_log_triggers(conn) -> dict:
+    """nome -> CREATE TRIGGER (como o sqlite_master guarda) com as colunas atuais de cada tabela."""
+    triggers = {}
+    for tabela in CHANGE_LOG_TABLES:
+        cols = table_columns(conn, tabela)
+        if not cols:
+            continue
+        _json = lambda p: "json_object(" + ", ".join(f"'{c}', {p}.{c}" for c in cols) + ")"
+        mudou = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in cols)
+        ins = f"INSERT INTO {CHANGE_LOG_TABLE} (tabela, op, row_id, antes, depois)"
+        triggers[f"trg_cdc_{tabela}_ins"] = (
+            f"CREATE TRIGGER trg_cdc_{tabela}_ins AFTER INSERT ON {tabela} BEGIN\n"
+            f"    {ins} VALUES ('{tabela}', 'I', NEW.id, NULL, {_json('NEW')});\nEND")
+        triggers[f"trg_cdc_{tabela}_upd"] = (
+            f"CREATE TRIGGER trg_cdc_{tabela}_upd AFTER UPDATE ON {tabela} WHEN {mudou} BEGIN\n"
+            f"    {ins} VALUES ('{tabela}', 'U', NEW.id, {_json('OLD')}, {_json('NEW')});\nEND")
+        triggers[f"trg_cdc_{tabela}_del"] = (
+            f"CREATE TRIGGER trg_cdc_{tabela}_del AFTER DELETE ON {tabela} BEGIN\n"
+            f"    {ins} VALUES ('{tabela}', 'D', OLD.id, {_json('OLD')}, NULL);\nEND")
+    return triggers
+
+def install_change_log(conn) -> None:
+    """
+    Cria os triggers de CDC com as colunas atuais de cada tabela. Roda no bootstrap,
+    depois das migrações (que podem recriar tabelas e levar os triggers junto).
+    Só recria o trigger que falta ou cuja definição mudou (coluna nova/removida): DDL
+    sem necessidade trava a escrita e invalida os statements preparados das conexões.
+    UPDATE que não muda nenhum valor não é registrado.
+    """
+    _create_change_log(conn)
+    atuais = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_cdc_%'"))
+    for nome, sql in _change_log_triggers(conn).items():
+        if " ".join((atuais.get(nome) or "").split()) == " ".join(sql.split()):
+            continue
+        conn.execute(f"DROP TRIGGER IF EXISTS {nome};")
+        conn.execute(sql + ";")
+
+def last_change_seq() -> int:
+    """Maior seq já registrado (0 se o log está vazio)."""
+    with get_conn("tuple") as conn:
+        return conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {CHANGE_LOG_TABLE};").fetchone()[0]
+
+def changes_since(seq: int = 0, tabelas=None, *, limit: int = DEFAULT_CHUNK) -> list:
+    """
+    Alterações com seq > `seq` (em ordem), no máximo `limit`. Cada item é um dict com
+    seq, tabela, op, row_id, em, antes e depois (estes já decodificados do JSON).
+    Para consumir tudo, repita passando o seq do último item até vir vazio.
+    """
+    sql = f"SELECT seq, tabela, op, row_id, em, antes, depois FROM {CHANGE_LOG_TABLE} WHERE seq > ?"
+    params = [seq]
+    if tabelas:
+        tabelas = [tabelas] if isinstance(tabelas, str) else list(tabelas)
+        sql += f" AND tabela IN ({', '.join('?' * len(tabelas))})"
+        params += tabelas
+    sql += " ORDER BY seq LIMIT ?"
+    params.append(limit)
+    mudancas = fetchall(sql, params)
+    for m in mudancas:
+        m["antes"] = json.loads(m["antes"]) if m["antes"] else None
+        m["depois"] = json.loads(m["depois"]) if m["depois"] else None
+    return mudancas
+
 
 def init_db():
     """Cria as tabelas alvo, se não existirem."""
@@ -25,7 +484,7 @@ def init_db():
         c.execute("""
         CREATE TABLE IF NOT EXISTS usuarios (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
+            email TEXT,                -- opcional; único entre os preenchidos (services.usuarios)
             senha_hash TEXT NOT NULL,
             nome TEXT
         );
@@ -88,7 +547,47 @@ def init_db():
             FOREIGN KEY (veiculo_id) REFERENCES veiculos(id) ON DELETE SET NULL
         );
         """)
+        # num_os único: base do UPSERT (ON CONFLICT(num_os)) em abertura_os
+        ensure_num_os_unique(c)
+
+        # Log de alterações (triggers instalados no bootstrap, após as migrações)
+        _create_change_log(c)
+
 
+def ensure_num_os_unique(conn) -> int:
+    """
+    Cria ux_ordens_servico_num_os. Se já houver num_os repetido, a OS mais antiga (menor id)
+    fica com o número e as demais são renumeradas para <num_os>-DUP<n> (log de aviso com
+    os ids), para o admin conferir. Retorna quantas OS foram renumeradas; se ainda assim o
+    índice não puder ser criado, a exceção sobe (o app não deve rodar sem ele).
+    """
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_ordens_servico_num_os';"
+    ).fetchone():
+        return 0
+    grupos = conn.execute("""
+        SELECT num_os FROM ordens_servico
+        WHERE num_os IS NOT NULL
+        GROUP BY num_os HAVING COUNT(*) > 1;
+    """).fetchall()
+    renumeradas = 0
+    for (num,) in grupos:
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM ordens_servico WHERE num_os = ? ORDER BY id;", (num,)
+        )]
+        n = 1
+        for os_id in ids[1:]:
+            while True:
+                n += 1
+                novo = f"{num}-DUP{n}"
+                if not conn.execute("SELECT 1 FROM ordens_servico WHERE num_os = ?;", (novo,)).fetchone():
+                    break
+            conn.execute("UPDATE ordens_servico SET num_os = ? WHERE id = ?;", (novo, os_id))
+            log.warning("ordens_servico id=%s: num_os %r duplicado (mantido na id=%s) -> %r",
+                        os_id, num, ids[0], novo)
+            renumeradas += 1
+    conn.execute("CREATE UNIQUE INDEX ux_ordens_servico_num_os ON ordens_servico(num_os);")
+    return renumeradas
 
 def migrate_legacy():
     """Migra dados de tabelas antigas para o novo padrão (idempotente)."""
@@ -223,15 +722,61 @@ def migrate_legacy():
                 cur.execute("DROP TABLE ordens_servico;")
                 cur.execute("ALTER TABLE ordens_servico_new RENAME TO ordens_servico;")
 
-                # índice único opcional para num_os (evita duplicidades)
-                cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_ordens_servico_num_os ON ordens_servico(num_os);")
+                # o DROP TABLE levou o índice junto
+                ensure_num_os_unique(cur)
 
         conn.commit()
 
+def normalize_user_logins():
+    """
+    Normaliza username/e-mail já gravados (minúsculas + trim, vazio -> NULL), mesma
+    ideia do teste_fix_admin.py. Com isso o login compara por igualdade e usa os
+    índices únicos ux_usuarios_username/ux_usuarios_email. Idempotente.
+    Se o valor normalizado já for de outro usuário, grava <valor>#<id> (único e ainda
+    utilizável no login) e registra um aviso no log para o admin renomear/avisar.
+    """
+    with get_conn() as conn:
+        info = {r["name"]: r["notnull"] for r in conn.execute("PRAGMA table_info(usuarios);")}
+        for col in ("username", "email"):
+            if col not in info:
+                continue
+            rows = conn.execute(f"""
+                SELECT id, {col} AS v FROM usuarios
+                WHERE {col} IS NOT NULL AND {col} <> LOWER(TRIM({col}))
+                ORDER BY id
+            """).fetchall()
+            for r in rows:
+                norm = r["v"].strip().lower() or None
+                if norm is None and info[col]:
+                    continue  # em branco numa coluna NOT NULL: não serve de login de qualquer jeito
+                novo, n = norm, 0
+                while novo is not None and conn.execute(
+                    f"SELECT 1 FROM usuarios WHERE {col} = ? AND id <> ?;", (novo, r["id"])
+                ).fetchone():
+                    n += 1
+                    novo = f"{norm}#{r['id']}" + (f"-{n}" if n > 1 else "")
+                if novo != norm:
+                    log.warning("usuarios id=%s: %s %r já pertence a outro usuário após normalizar; "
+                                "gravado como %r", r["id"], col, r["v"], novo)
+                conn.execute(f"UPDATE usuarios SET {col} = ? WHERE id = ?;", (novo, r["id"]))
+
+_bootstrapped: set = set()
+
 def bootstrap():
+    """Schema, migrações e triggers de CDC; uma vez por processo/banco (o app chama a cada rerun)."""
+    if str(DB_PATH) in _bootstrapped:
+        return
     init_db()
     with get_conn() as conn:
+        if REPORTING_MODE != "off":
+            # WAL: leitores (relatórios) e escritor (formulários) não se bloqueiam
+            conn.execute("PRAGMA journal_mode = WAL;")
         ver = conn.execute("PRAGMA user_version;").fetchone()[0]
         if ver < 1:
             migrate_legacy()
             conn.execute("PRAGMA user_version = 1;")
+        if ver < 2:
+            normalize_user_logins()
+            conn.execute("PRAGMA user_version = 2;")
+        install_change_log(conn)
+    _bootstrapped.add(str(DB_PATH))
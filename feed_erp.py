@@ -0,0 +1,204 @@
+# feed_erp.py
+"""
+Feed incremental de `manutencoes` / `ordens_servico` para o ERP, lido do change_log (db.py).
+
+O cliente guarda o cursor devolvido a cada página e o manda de volta na próxima:
+
+- sem cursor: carga inicial, as linhas atuais das tabelas em ordem de id (op "I"), e depois
+  segue pelo change_log a partir do seq em que a carga começou;
+- "<seq>@<em>": alterações com seq maior, em ordem de seq (ordem estável e total; a mesma
+  página pedida de novo devolve os mesmos registros). O `em` do último registro lido
+  confere que o log é o mesmo (banco restaurado/trocado -> CursorInvalido, refazer a carga).
+
+Cada registro: {"seq", "tabela", "op" (I/U/D), "id", "em", "dados"} (dados = linha depois da
+alteração; None em D). Linhas alteradas durante a carga inicial podem vir de novo pelo
+log: o ERP deve aplicar como upsert por (tabela, id).
+
+Uso (linha de comando):
+    python -m feed_erp --cursor-arquivo erp.cursor > lote.ndjson
+    python -m feed_erp --tabelas manutencoes --formato csv --cursor "1234@2025-06-01T10:00:00.000"
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+import db
+from db import CHANGE_LOG_TABLE, DEFAULT_CHUNK, fetchall, fetchone, get_read_conn, table_columns
+
+TABELAS = ("manutencoes", "ordens_servico")
+_META = ["seq", "tabela", "op", "id", "em"]
+
+class CursorInvalido(ValueError):
+    """Cursor malformado ou de outro change_log."""
+
+# ---------- cursor ----------
+def _cursor_log(seq: int, em: str) -> str:
+    return f"{seq}@{em}"
+
+def _cursor_carga(tabela: str, ultimo_id: int, seq0: int) -> str:
+    return f"carga:{tabela}:{ultimo_id}:{seq0}"
+
+def _ler_cursor(cursor: Optional[str]) -> Tuple[str, tuple]:
+    if not cursor:
+        return "inicio", ()
+    try:
+        if cursor.startswith("carga:"):
+            _, tabela, ultimo_id, seq0 = cursor.split(":")
+            if tabela not in TABELAS:
+                raise ValueError(tabela)
+            return "carga", (tabela, int(ultimo_id), int(seq0))
+        seq, em = cursor.split("@", 1)
+        return "log", (int(seq), em)
+    except ValueError:
+        raise CursorInvalido(f"Cursor inválido: {cursor!r}") from None
+
+def _conferir(seq: int, em: str) -> None:
+    if seq == 0:
+        return
+    row = fetchone(f"SELECT em FROM {CHANGE_LOG_TABLE} WHERE seq = ?", (seq,), read=True)
+    if row is None or row["em"] != em:
+        raise CursorInvalido(f"Cursor {seq}@{em} não corresponde a este change_log; refaça a carga inicial.")
+
+# ---------- páginas ----------
+def _pagina_carga(tabelas: Sequence[str], tabela: str, ultimo_id: int, seq0: int, limite: int):
+    rows = fetchall(f"SELECT * FROM {tabela} WHERE id > ? ORDER BY id LIMIT ?", (ultimo_id, limite), read=True)
+    registros = [
+        {"seq": seq0, "tabela": tabela, "op": "I", "id": r["id"], "em": None, "dados": r} for r in rows
+    ]
+    if len(rows) == limite:
+        return registros, _cursor_carga(tabela, rows[-1]["id"], seq0), False
+    seguinte = tabelas.index(tabela) + 1
+    if seguinte < len(tabelas):
+        return registros, _cursor_carga(tabelas[seguinte], 0, seq0), False
+    # fim da carga: o log a partir de seq0 cobre o que mudou durante ela
+    em0 = fetchone(f"SELECT em FROM {CHANGE_LOG_TABLE} WHERE seq = ?", (seq0,), read=True) if seq0 else None
+    return registros, _cursor_log(seq0, em0["em"] if em0 else ""), False
+
+def _pagina_log(tabelas: Sequence[str], seq: int, em: str, limite: int):
+    _conferir(seq, em)
+    rows = fetchall(
+        f"SELECT seq, tabela, op, row_id, em, depois FROM {CHANGE_LOG_TABLE} "
+        f"WHERE seq > ? AND tabela IN ({', '.join('?' * len(tabelas))}) ORDER BY seq LIMIT ?",
+        (seq, *tabelas, limite), read=True,
+    )
+    registros = [
+        {"seq": r["seq"], "tabela": r["tabela"], "op": r["op"], "id": r["row_id"], "em": r["em"],
+         "dados": json.loads(r["depois"]) if r["depois"] else None}
+        for r in rows
+    ]
+    if not rows:
+        return registros, _cursor_log(seq, em), True
+    return registros, _cursor_log(rows[-1]["seq"], rows[-1]["em"]), len(rows) < limite
+
+def pagina(cursor: Optional[str] = None, tabelas: Sequence[str] = TABELAS,
+           limite: int = DEFAULT_CHUNK) -> Tuple[list, str, bool]:
+    """
+    Uma página do feed a partir de `cursor`. Retorna (registros, próximo cursor, fim), onde
+    fim=True quer dizer que o cliente está em dia (pode voltar mais tarde com o mesmo cursor).
+    `limite` < 1 -> ValueError (0 quebraria a paginação e negativo viraria LIMIT sem teto).
+    """
+    if limite < 1:
+        raise ValueError(f"limite deve ser >= 1 (recebido {limite})")
+    tabelas = [t for t in TABELAS if t in tabelas]
+    if not tabelas:
+        raise ValueError(f"Tabelas do feed: {', '.join(TABELAS)}")
+    modo, args = _ler_cursor(cursor)
+    if modo == "inicio":
+        row = fetchone(f"SELECT COALESCE(MAX(seq), 0) AS seq FROM {CHANGE_LOG_TABLE}", read=True)
+        return _pagina_carga(tabelas, tabelas[0], 0, row["seq"], limite)
+    if modo == "carga":
+        tabela, ultimo_id, seq0 = args
+        if tabela not in tabelas:
+            raise CursorInvalido(f"Cursor de carga de {tabela}, fora das tabelas pedidas.")
+        return _pagina_carga(tabelas, tabela, ultimo_id, seq0, limite)
+    return _pagina_log(tabelas, *args, limite)
+
+def paginas(cursor: Optional[str] = None, tabelas: Sequence[str] = TABELAS,
+            limite: int = DEFAULT_CHUNK) -> Iterator[Tuple[list, str]]:
+    """Gera (registros, cursor após a página) até o cliente ficar em dia."""
+    while True:
+        registros, cursor, fim = pagina(cursor, tabelas, limite)
+        yield registros, cursor
+        if fim:
+            return
+
+# ---------- formatos ----------
+def ndjson(registros: Iterable[dict]) -> str:
+    return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in registros)
+
+def colunas_csv(tabela: str) -> list:
+    with get_read_conn() as conn:
+        return _META + table_columns(conn, tabela)
+
+def csv_bloco(registros: Iterable[dict], colunas: Sequence[str], cabecalho: bool = False) -> str:
+    """CSV (uma tabela por vez): metadados do registro + colunas da linha."""
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=";", lineterminator="\n")
+    if cabecalho:
+        w.writerow(colunas)
+    for r in registros:
+        linha = {**(r["dados"] or {}), **{k: r[k] for k in _META}}
+        w.writerow([linha.get(c) for c in colunas])
+    return buf.getvalue()
+
+# ---------- linha de comando ----------
+def _positivo(v: str) -> int:
+    try:
+        n = int(v)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"inteiro >= 1 esperado: {v!r}")
+    return n
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--cursor", help="cursor devolvido na execução anterior (vazio = carga inicial)")
+    ap.add_argument("--cursor-arquivo", help="lê o cursor deste arquivo e grava o novo após cada página")
+    ap.add_argument("--tabelas", nargs="+", choices=TABELAS, default=list(TABELAS))
+    ap.add_argument("--formato", choices=("ndjson", "csv"), default="ndjson")
+    ap.add_argument("--limite", type=_positivo, default=DEFAULT_CHUNK, help="registros por página")
+    ap.add_argument("--saida", help="arquivo de saída (padrão: stdout); com --cursor-arquivo, acrescenta")
+    args = ap.parse_args(argv)
+
+    if args.formato == "csv" and len(args.tabelas) != 1:
+        ap.error("CSV é por tabela: use --tabelas manutencoes ou --tabelas ordens_servico")
+    db.bootstrap()  # garante change_log e triggers
+    cursor = args.cursor
+    if args.cursor_arquivo and cursor is None:
+        try:
+            with open(args.cursor_arquivo, encoding="utf-8") as f:
+                cursor = f.read().strip() or None
+        except FileNotFoundError:
+            cursor = None
+
+    out = open(args.saida, "a" if args.cursor_arquivo else "w", encoding="utf-8", newline="") if args.saida else sys.stdout
+    colunas = colunas_csv(args.tabelas[0]) if args.formato == "csv" else None
+    total = 0
+    try:
+        for registros, cursor in paginas(cursor, args.tabelas, args.limite):
+            if args.formato == "csv":
+                cabecalho = total == 0 and (out is sys.stdout or out.tell() == 0)
+                out.write(csv_bloco(registros, colunas, cabecalho))
+            else:
+                out.write(ndjson(registros))
+            out.flush()
+            total += len(registros)
+            # o cursor só avança depois que a página foi escrita: interrompido, retoma daqui
+            if args.cursor_arquivo:
+                with open(args.cursor_arquivo, "w", encoding="utf-8") as f:
+                    f.write(cursor)
+    except CursorInvalido as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{total} registros; cursor: {cursor}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# graficos.py
+"""
+Specs Vega-Lite dos gráficos dos relatórios, memoizadas por processo.
+
+Montar o gráfico no Altair (validação do schema + dados embutidos no JSON) custa mais que
+desenhá-lo; como o Streamlit reexecuta a página a cada clique, a spec pronta fica em cache
+pela impressão digital dos dados agregados + parâmetros do gráfico. Dados iguais -> mesma
+spec, sem tocar no Altair.
+
+O tema (cores de eixo, grade e título) é um dict único, `TEMA`, aplicado em toda spec
+gerada aqui em vez de `.configure_*` por gráfico.
+
+Uso:
+    st.vega_lite_chart(graficos.barras(df, "Status", "Qtd"), use_container_width=True)
+    st.vega_lite_chart(graficos.linha(df, "Período", "Custo"), use_container_width=True)
+"""
+import hashlib
+
+import pandas as pd
+
+from cache import TTLCache
+
+TEMA = {
+    "axis": {"labelColor": "#fff", "titleColor": "#fff", "gridColor": "#295429"},
+    "view": {"strokeOpacity": 0},
+    "title": {"color": "#fff", "anchor": "start"},
+}
+
+# chave: (tipo, impressão digital, parâmetros); as specs são pequenas (dados já agregados)
+_specs = TTLCache(maxsize=128, ttl=3600)
+
+def impressao_digital(df: pd.DataFrame) -> str:
+    """Hash do conteúdo (colunas, tipos e valores) do DataFrame; ignora o índice."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def barras(df: pd.DataFrame, x: str, y: str, title: str = "", height: int = 260) -> dict:
+    """Barras de `y` por `x`, ordenadas por `y` decrescente. A spec devolvida é compartilhada: não altere."""
+    chave = ("barras", impressao_digital(df), x, y, title, height)
+
+    def _montar():
+        import altair as alt  # ~200 ms; só na 1ª spec montada no processo
+        chart = (
+            alt.Chart(df)
+            .mark_bar()
+            .encode(x=alt.X(x, sort="-y", title=None), y=alt.Y(y, title=None), tooltip=list(df.columns))
+            .properties(height=height, title=title)
+        )
+        spec = chart.to_dict()
+        spec["config"] = TEMA
+        return spec
+
+    return _specs.get_or_set(chave, _montar)
+
+def linha(df: pd.DataFrame, x: str, y: str, title: str = "", height: int = 260, formato: str = ",.2f") -> dict:
+    """Linha de `y` no tempo (`x` = data aaaa-mm-dd), com pontos e tooltip. Spec compartilhada: não altere."""
+    chave = ("linha", impressao_digital(df), x, y, title, height, formato)
+
+    def _montar():
+        import altair as alt
+        chart = (
+            alt.Chart(df)
+            .mark_line(point=alt.OverlayMarkDef(size=18), color="#7fd47f")
+            .encode(x=alt.X(f"{x}:T", title=None), y=alt.Y(f"{y}:Q", title=None),
+                    tooltip=[alt.Tooltip(f"{x}:T", format="%d/%m/%Y"), alt.Tooltip(f"{y}:Q", format=formato)])
+            .properties(height=height, title=title)
+        )
+        spec = chart.to_dict()
+        spec["config"] = TEMA
+        return spec
+
+    return _specs.get_or_set(chave, _montar)
@@ -0,0 +1,423 @@
+# instrumentation.py
+"""
+Onde um rerun do app.py gasta o tempo: fases (bootstrap, login, página, gráficos...)
+e as consultas SQL feitas em cada uma.
+
+- `begin_rerun()` / `end_rerun()` abrem e fecham o trace do rerun (um por sessão,
+  na thread do script); os últimos INSTRUMENTATION_RERUNS ficam em memória e, se
+  INSTRUMENTATION_JSONL estiver definido, cada rerun vira uma linha JSON no arquivo.
+- `phase(nome)` mede um trecho; funciona como `with` e como decorador.
+- `TracedConnection` (factory do sqlite3.connect, usada pelo db.py) mede duração e
+  nº de linhas de cada statement; o `set_trace_callback` conta tudo que o SQLite
+  executou, inclusive BEGIN/COMMIT e executescript.
+- Toda consulta (com ou sem rerun: jobs, scripts) é agregada pelo fingerprint do SQL
+  (`query_stats()`); as que passam de SLOW_QUERY_MS vão para o log de lentas
+  (`slow_queries()`, e SLOW_QUERY_LOG em JSONL) com o EXPLAIN QUERY PLAN.
+
+Sem trace aberto as consultas não aparecem em reruns, só nos agregados.
+"""
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+from datetime import datetime
+from functools import lru_cache
+from itertools import count
+from typing import Optional
+
+import metrics
+from config import (
+    INSTRUMENTATION, INSTRUMENTATION_JSONL, INSTRUMENTATION_RERUNS,
+    QUERY_STATS_SAMPLES, SLOW_QUERY_KEEP, SLOW_QUERY_LOG, SLOW_QUERY_MS,
+)
+
+MAX_SQL_POR_RERUN = 500
+
+_local = threading.local()
+_lock = threading.Lock()
+_reruns = deque(maxlen=INSTRUMENTATION_RERUNS)
+_abertos = {}   # sessão -> trace ainda aberto
+_ids = count(1)
+
+def _agora_ms() -> float:
+    return time.perf_counter() * 1000
+
+def _atual() -> Optional[dict]:
+    return getattr(_local, "trace", None)
+
+# ===================== Reruns =====================
+def begin_rerun(sessao: Optional[str] = None, pagina: str = "", usuario: str = "") -> None:
+    """
+    Abre o trace do rerun. `sessao` identifica a sessão do navegador: cada rerun pode
+    rodar numa thread nova, e um trace que a sessão deixou aberto (st.stop, st.rerun,
+    exceção) é fechado aqui como "interrompido".
+    """
+    if not INSTRUMENTATION:
+        return
+    sessao = sessao or str(threading.get_ident())
+    with _lock:
+        anterior = _abertos.pop(sessao, None)
+    if anterior is not None and anterior.get("_t0") is not None:
+        # saiu do script sem passar pelo end_rerun: fecha no último evento visto
+        _fechar(anterior, "interrompido", anterior["_fim"])
+    agora = _agora_ms()
+    t = _local.trace = {
+        "id": next(_ids),
+        "inicio": datetime.now().isoformat(timespec="milliseconds"),
+        "pagina": pagina,
+        "usuario": usuario,
+        "status": "executando",
+        "total_ms": 0.0,
+        "fases": [],
+        "sql": [],
+        "sql_ms": 0.0,
+        "statements": 0,
+        "_sessao": sessao,
+        "_t0": agora,
+        "_fim": agora,
+        "_pilha": [],
+    }
+    with _lock:
+        _abertos[sessao] = t
+
+def annotate(**campos) -> None:
+    """Completa o trace atual (ex.: página e usuário só são conhecidos depois do login)."""
+    t = _atual()
+    if t is not None:
+        t.update(campos)
+
+def end_rerun(status: str = "ok") -> Optional[dict]:
+    t = _atual()
+    _local.trace = None
+    if t is None:
+        return None
+    with _lock:
+        _abertos.pop(t["_sessao"], None)
+    return _fechar(t, status, _agora_ms())
+
+def _fechar(t: dict, status: str, fim: float) -> dict:
+    t.pop("_sessao")
+    t.pop("_fim")
+    for f in t.pop("_pilha"):   # fases ainda abertas quando o script foi interrompido
+        f["ms"] = round(fim - f.pop("_t0"), 3)
+        f["sql_ms"] = round(f["sql_ms"], 3)
+    t["total_ms"] = round(fim - t.pop("_t0"), 3)
+    t["sql_ms"] = round(t["sql_ms"], 3)
+    t["status"] = status
+    with _lock:
+        _reruns.append(t)
+        if INSTRUMENTATION_JSONL:
+            try:
+                with open(INSTRUMENTATION_JSONL, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(t, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                print(f"[instrumentation] falha ao gravar {INSTRUMENTATION_JSONL}: {e}")
+    return t
+
+def recent_reruns(n: Optional[int] = None) -> list:
+    """Últimos reruns concluídos, do mais recente para o mais antigo."""
+    with _lock:
+        itens = list(_reruns)
+    itens.reverse()
+    return itens[:n] if n else itens
+
+def clear() -> None:
+    with _lock:
+        _reruns.clear()
+
+# ===================== Fases =====================
+class phase(ContextDecorator):
+    """
+    Mede um trecho do rerun:
+
+        with phase("graficos"): ...
+
+        @phase("relatorios.carga")
+        def _load_data(): ...
+    """
+    def __init__(self, nome: str):
+        self.nome = nome
+
+    def _recreate_cm(self):
+        # como decorador, cada chamada precisa do próprio estado (reentrância/threads)
+        return phase(self.nome)
+
+    def __enter__(self):
+        t = _atual()
+        if t is None:
+            self._fase = None
+            return self
+        self._fase = {"nome": self.nome, "nivel": len(t["_pilha"]), "ms": 0.0, "sql": 0, "sql_ms": 0.0,
+                      "_t0": _agora_ms()}
+        t["fases"].append(self._fase)
+        t["_pilha"].append(self._fase)
+        return self
+
+    def __exit__(self, *exc):
+        f, t = self._fase, _atual()
+        if f is not None and t is not None and f in t["_pilha"]:
+            t["_pilha"].remove(f)
+            t["_fim"] = _agora_ms()
+            f["ms"] = round(t["_fim"] - f.pop("_t0"), 3)
+            f["sql_ms"] = round(f["sql_ms"], 3)
+        return False
+
+def _fase_atual(t: dict) -> Optional[dict]:
+    return t["_pilha"][-1] if t["_pilha"] else None
+
+# ===================== SQL =====================
+def _params_shape(params) -> str:
+    if params is None or params == ():
+        return ""
+    if isinstance(params, str):   # rótulo já pronto (ex.: "lote" do executemany)
+        return params
+    if isinstance(params, dict):
+        return "{" + ",".join(sorted(params)) + "}"
+    try:
+        return f"({len(params)})"
+    except TypeError:
+        return "iter"
+
+def _registrar(q: dict) -> None:
+    """Anexa a consulta ao trace do rerun atual (se houver) e soma o tempo nas fases abertas."""
+    t = _atual()
+    if t is None:
+        return
+    f = _fase_atual(t)
+    t["_fim"] = _agora_ms()
+    t["sql_ms"] += q["ms"]
+    for fase in t["_pilha"]:
+        fase["sql_ms"] += q["ms"]
+    if len(t["sql"]) < MAX_SQL_POR_RERUN:
+        q["fase"] = f["nome"] if f else ""
+        t["sql"].append(q)
+
+def _somar_fetch(ms: float) -> None:
+    t = _atual()
+    if t is not None:
+        t["sql_ms"] += ms
+        for fase in t["_pilha"]:
+            fase["sql_ms"] += ms
+
+def _on_statement(_stmt: str) -> None:
+    # só conta: o texto expandido traz os valores dos parâmetros (senhas, dados pessoais)
+    t = _atual()
+    if t is None:
+        return
+    t["statements"] += 1
+    for fase in t["_pilha"]:
+        fase["sql"] += 1
+
+# ===================== Consultas lentas / agregação por fingerprint =====================
+_RE_STR = re.compile(r"'(?:[^']|'')*'")
+_RE_NUM = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_EXPLICAVEL = re.compile(r"^\s*(select|with|insert|update|delete|replace)\b", re.I)
+MAX_FINGERPRINTS = 2000
+
+_lock_q = threading.Lock()
+_stats = {}   # fingerprint -> agregados
+_lentas = deque(maxlen=SLOW_QUERY_KEEP)
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """SQL normalizado: literais viram ?, listas IN (?, ?, ...) viram (?+), espaços colapsados."""
+    s = " ".join(sql.split())
+    s = _RE_STR.sub("?", s)
+    s = _RE_NUM.sub("?", s)
+    s = _RE_LISTA.sub("(?+)", s)
+    return s.rstrip("; ")
+
+def _explain(conn, sql: str, params) -> Optional[list]:
+    if params is None or not _RE_EXPLICAVEL.match(sql):
+        return None
+    try:
+        # cursor comum: o EXPLAIN não entra nas estatísticas
+        cur = sqlite3.Connection.cursor(conn)
+        try:
+            return [r[3] for r in cur.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+        finally:
+            cur.close()
+    except sqlite3.Error:
+        return None
+
+def _full_scan(plano: Optional[list]) -> bool:
+    return any(d.startswith("SCAN ") and "USING" not in d and d != "SCAN CONSTANT ROW" for d in plano or ())
+
+def _observar(conn, sql: str, params, q: dict) -> None:
+    """Fecha a consulta: agrega por fingerprint e, se passou de SLOW_QUERY_MS, registra com o plano."""
+    fp = fingerprint(sql)
+    ms = q["ms"]
+    lenta = SLOW_QUERY_MS >= 0 and ms >= SLOW_QUERY_MS
+    with _lock_q:
+        st = _stats.get(fp)
+        if st is None and len(_stats) < MAX_FINGERPRINTS:
+            st = _stats[fp] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "linhas": 0, "lentas": 0,
+                               "amostras": deque(maxlen=QUERY_STATS_SAMPLES), "plano": None}
+        if st is not None:
+            st["count"] += 1
+            st["total_ms"] += ms
+            st["max_ms"] = max(st["max_ms"], ms)
+            st["linhas"] += q["linhas"] or 0
+            st["amostras"].append(ms)
+            st["lentas"] += lenta
+        plano = st["plano"] if st is not None else None
+    if not lenta:
+        return
+    if plano is None:
+        plano = _explain(conn, sql, params)
+        if st is not None and plano is not None:
+            with _lock_q:
+                st["plano"] = plano
+    registro = {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "fingerprint": fp, "params": q["params"], "ms": ms, "linhas": q["linhas"],
+        "full_scan": _full_scan(plano), "plano": plano,
+        "fase": q.get("fase", ""), "pagina": (_atual() or {}).get("pagina", ""),
+    }
+    metrics.incr("db.slow_queries")
+    with _lock_q:
+        _lentas.append(registro)
+        if SLOW_QUERY_LOG:
+            try:
+                with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"[instrumentation] falha ao gravar {SLOW_QUERY_LOG}: {e}")
+
+def _percentil(valores: list, q: float) -> float:
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, max(0, math.ceil(q * len(valores)) - 1))]
+
+def query_stats() -> list:
+    """Agregados por fingerprint (p50/p95 sobre as últimas QUERY_STATS_SAMPLES execuções), mais custosos primeiro."""
+    with _lock_q:
+        itens = [(fp, dict(st, amostras=sorted(st["amostras"]))) for fp, st in _stats.items()]
+    out = []
+    for fp, st in itens:
+        out.append({
+            "fingerprint": fp, "count": st["count"], "total_ms": round(st["total_ms"], 3),
+            "p50_ms": round(_percentil(st["amostras"], 0.50), 3),
+            "p95_ms": round(_percentil(st["amostras"], 0.95), 3),
+            "max_ms": round(st["max_ms"], 3), "linhas": st["linhas"], "lentas": st["lentas"],
+            "full_scan": _full_scan(st["plano"]) if st["plano"] is not None else None,
+            "plano": st["plano"],
+        })
+    out.sort(key=lambda r: r["total_ms"], reverse=True)
+    return out
+
+def slow_queries(n: Optional[int] = None) -> list:
+    """Consultas acima de SLOW_QUERY_MS, da mais recente para a mais antiga."""
+    with _lock_q:
+        itens = list(_lentas)
+    itens.reverse()
+    return itens[:n] if n else itens
+
+def reset_query_stats() -> None:
+    with _lock_q:
+        _stats.clear()
+        _lentas.clear()
+
+# ===================== Conexão / cursor =====================
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor que mede execute + fetch e conta as linhas lidas (ou afetadas). A consulta
+    é fechada (agregada/avaliada como lenta) quando o resultado acaba, no próximo
+    execute, no close() ou quando o cursor é descartado.
+    """
+    _q = None
+
+    def _iniciar(self, sql, params, shape, ms):
+        q = {"sql": " ".join(sql.split())[:500], "params": shape, "ms": round(ms, 3),
+             "linhas": self.rowcount if self.rowcount >= 0 else None, "fase": ""}
+        self._q, self._sql, self._params = q, sql, params
+        _registrar(q)
+        if self.description is None:   # sem resultado (DML/DDL/PRAGMA de escrita): já terminou
+            self._finalizar()
+
+    def _finalizar(self):
+        q, self._q = self._q, None
+        if q is not None:
+            _observar(self.connection, self._sql, self._params, q)
+
+    def execute(self, sql, params=()):
+        self._finalizar()
+        t0 = _agora_ms()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._iniciar(sql, params, _params_shape(params), _agora_ms() - t0)
+
+    def executemany(self, sql, seq):
+        self._finalizar()
+        t0 = _agora_ms()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            self._iniciar(sql, None, "lote", _agora_ms() - t0)
+
+    def _fetch(self, fn, *args):
+        t0 = _agora_ms()
+        rows = fn(*args)
+        q = self._q
+        if q is not None:
+            ms = _agora_ms() - t0
+            n = 0 if rows is None else (len(rows) if isinstance(rows, list) else 1)
+            q["ms"] = round(q["ms"] + ms, 3)
+            q["linhas"] = (q["linhas"] or 0) + n
+            _somar_fetch(ms)
+        return rows
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self._finalizar()
+        return row
+
+    def fetchmany(self, size=None):
+        size = size if size is not None else self.arraysize
+        rows = self._fetch(super().fetchmany, size)
+        if len(rows) < size:
+            self._finalizar()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._finalizar()
+        return rows
+
+    def close(self):
+        self._finalizar()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finalizar()
+        except Exception:
+            pass
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Gateway de acesso ao banco: factory p/ sqlite3.connect usada pelo db.py. Todos os
+    cursores (inclusive pandas.read_sql) passam pelo TracedCursor.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_on_statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+# factory usada pelo db.py em todo sqlite3.connect
+CONNECTION_FACTORY = TracedConnection if INSTRUMENTATION else sqlite3.Connection
@@ -0,0 +1,202 @@
+# jobs.py
+"""
+Fila local de jobs (exportações/relatórios pesados) fora da thread do Streamlit.
+
+- estado em SQLite (tabela `jobs`), para a página consultar progresso a cada rerun;
+- execução num ThreadPoolExecutor do processo (JOBS_WORKERS);
+- resultado gravado em JOBS_DIR e disponível até expirar (JOBS_RESULT_TTL_HOURS).
+
+Uso:
+    @jobs.register("meu_tipo")
+    def _meu_job(params, out, progresso):
+        progresso(0.5, "metade…"); out.write(b"...")
+        return "arquivo.csv", "text/csv"
+
+    job_id = jobs.submit("meu_tipo", {"x": 1}, owner="joao")
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from config import JOBS_DIR, JOBS_WORKERS, JOBS_RESULT_TTL_HOURS, DB_PATH
+from db import get_conn
+
+TABLE = "jobs"
+
+_handlers: Dict[str, Callable] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_schema_ready: set = set()
+_TTL = f"+{JOBS_RESULT_TTL_HOURS} hours"
+
+# identifica o processo que executa o job (para detectar jobs órfãos após restart)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def _ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT,
+            owner TEXT,
+            worker TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',   -- pendente | executando | concluido | erro
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result_name TEXT,
+            result_mime TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            started_at TEXT,
+            finished_at TEXT,
+            expires_at TEXT
+        );
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_jobs_owner ON {TABLE}(owner, created_at);")
+        # jobs de um processo desta máquina que morreu (redeploy/restart) não voltam mais
+        host = socket.gethostname()
+        for r in conn.execute(f"SELECT id, worker FROM {TABLE} WHERE status IN ('pendente', 'executando');").fetchall():
+            w_host, _, w_pid = (r["worker"] or "").rpartition(":")
+            if w_host == host and w_pid.isdigit() and not _pid_alive(int(w_pid)):
+                conn.execute(f"""
+                    UPDATE {TABLE} SET status = 'erro', message = 'Interrompido (reinício do servidor).',
+                           finished_at = datetime('now'), expires_at = datetime('now', ?)
+                    WHERE id = ?;
+                """, (_TTL, r["id"]))
+        # jobs com erro gravados antes de ganharem validade: expiram a partir de quando terminaram
+        conn.execute(f"""
+            UPDATE {TABLE} SET expires_at = datetime(COALESCE(finished_at, created_at), ?)
+            WHERE status = 'erro' AND expires_at IS NULL;
+        """, (_TTL,))
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    _schema_ready.add(str(DB_PATH))
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        return True  # no Windows os.kill(pid, 0) encerra o processo; não arrisca
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # existe, mas sem permissão para sinalizar
+    return True
+
+def register(kind: str):
+    """Decorator: registra a função que executa jobs do tipo `kind`."""
+    def deco(fn):
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix="frota-job")
+        return _executor
+
+def _update(job_id: str, **fields) -> None:
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    with get_conn() as conn:
+        conn.execute(f"UPDATE {TABLE} SET {sets} WHERE id = ?;", [*fields.values(), job_id])
+
+def _result_path(job_id: str):
+    return JOBS_DIR / f"{job_id}.bin"
+
+def _run(job_id: str, kind: str, params: dict) -> None:
+    _update(job_id, status="executando", started_at=time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()))
+    last = [0.0]
+
+    def progresso(frac: float, msg: Optional[str] = None) -> None:
+        # no máx. ~4 gravações/s para não disputar o banco com a UI
+        now = time.monotonic()
+        if now - last[0] < 0.25 and frac < 1:
+            return
+        last[0] = now
+        _update(job_id, progress=max(0.0, min(float(frac), 1.0)), message=msg)
+
+    try:
+        with open(_result_path(job_id), "wb") as out:
+            name, mime = _handlers[kind](params, out, progresso)
+        with get_conn() as conn:
+            conn.execute(f"""
+                UPDATE {TABLE}
+                SET status = 'concluido', progress = 1, message = NULL,
+                    result_name = ?, result_mime = ?, finished_at = datetime('now'),
+                    expires_at = datetime('now', ?)
+                WHERE id = ?;
+            """, (name, mime, _TTL, job_id))
+    except Exception as e:
+        traceback.print_exc()
+        _result_path(job_id).unlink(missing_ok=True)
+        # com validade também: senão o purge_expired nunca remove os que falharam
+        with get_conn() as conn:
+            conn.execute(f"""
+                UPDATE {TABLE}
+                SET status = 'erro', message = ?, finished_at = datetime('now'), expires_at = datetime('now', ?)
+                WHERE id = ?;
+            """, (str(e)[:500], _TTL, job_id))
+
+def submit(kind: str, params: Optional[dict] = None, owner: Optional[str] = None) -> str:
+    """Enfileira o job e retorna o id imediatamente."""
+    if kind not in _handlers:
+        raise KeyError(f"Tipo de job não registrado: {kind}")
+    _ensure_schema()
+    purge_expired()
+    params = params or {}
+    job_id = uuid.uuid4().hex
+    with get_conn() as conn:
+        conn.execute(
+            f"INSERT INTO {TABLE} (id, kind, params, owner, worker) VALUES (?, ?, ?, ?, ?);",
+            (job_id, kind, json.dumps(params, default=str, ensure_ascii=False), owner, WORKER_ID)
+        )
+    _pool().submit(_run, job_id, kind, params)
+    return job_id
+
+def get(job_id: str) -> Optional[dict]:
+    _ensure_schema()
+    with get_conn() as conn:
+        row = conn.execute(f"SELECT * FROM {TABLE} WHERE id = ?;", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def list_jobs(owner: Optional[str] = None, limit: int = 20) -> List[dict]:
+    """Jobs mais recentes (do usuário, se informado), sem os já expirados."""
+    _ensure_schema()
+    where, params = "WHERE (expires_at IS NULL OR expires_at > datetime('now'))", []
+    if owner is not None:
+        where += " AND owner = ?"; params.append(owner)
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM {TABLE} {where} ORDER BY created_at DESC LIMIT ?;", [*params, limit]
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+def result_bytes(job_id: str) -> Optional[bytes]:
+    """Conteúdo do resultado de um job concluído e ainda não expirado."""
+    job = get(job_id)
+    if not job or job["status"] != "concluido":
+        return None
+    path = _result_path(job_id)
+    return path.read_bytes() if path.exists() else None
+
+def purge_expired() -> int:
+    """Apaga arquivos e registros de jobs expirados. Retorna quantos foram removidos."""
+    _ensure_schema()
+    with get_conn() as conn:
+        ids = [r["id"] for r in conn.execute(
+            f"SELECT id FROM {TABLE} WHERE expires_at IS NOT NULL AND expires_at <= datetime('now');"
+        )]
+        for job_id in ids:
+            _result_path(job_id).unlink(missing_ok=True)
+        if ids:
+            conn.executemany(f"DELETE FROM {TABLE} WHERE id = ?;", [(i,) for i in ids])
+    return len(ids)
@@ -0,0 +1,85 @@
+# metrics.py
+"""
+Métricas em memória do processo (contadores e histogramas com buckets fixos, em ms).
+Sem dependências: serve para comparar cenários (ex.: contenção leitura x escrita) e
+alimentar telas de diagnóstico.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable
+
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_hists: Dict[str, "Histogram"] = {}
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # último = acima do maior bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Aproximação pelo limite superior do bucket onde o quantil cai."""
+        if not self.count:
+            return 0.0
+        alvo, acc = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            acc += n
+            if acc >= alvo:
+                return round(min(self.buckets[i], self.max), 3) if i < len(self.buckets) else round(self.max, 3)
+        return self.max
+
+    def as_dict(self) -> dict:
+        labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+def incr(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def observe(name: str, value_ms: float, buckets: Iterable[float] = DEFAULT_BUCKETS_MS) -> None:
+    with _lock:
+        h = _hists.get(name)
+        if h is None:
+            h = _hists[name] = Histogram(buckets)
+        h.observe(value_ms)
+
+@contextmanager
+def timed(name: str):
+    """Mede o bloco e registra a duração (ms) no histograma `name`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - t0) * 1000)
+
+def snapshot(prefix: str = "") -> dict:
+    with _lock:
+        return {
+            "counters": {k: v for k, v in sorted(_counters.items()) if k.startswith(prefix)},
+            "histograms": {k: h.as_dict() for k, h in sorted(_hists.items()) if k.startswith(prefix)},
+        }
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _hists.clear()
@@ -0,0 +1,6 @@
+# modules/__init__.py
+import streamlit as st
+
+# download_button aceita função em `data` (gera o arquivo só no clique) a partir do Streamlit 1.50;
+# antes disso as telas passam os bytes já prontos
+DOWNLOAD_LAZY = tuple(int(p) for p in st.__version__.split(".")[:2]) >= (1, 50)
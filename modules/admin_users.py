@@ -1,5 +1,6 @@
 import streamlit as st
 from modules import auth
+from services import usuarios
 import pandas as pd
 
 def _inject_css():
@@ -21,8 +22,9 @@ def _inject_css():
     </style>
     """, unsafe_allow_html=True)
 
-def show():
-    user = auth.require_login()
+def show(user: dict | None = None):
+    # app.py já validou a sessão neste rerun e repassa o usuário
+    user = user or auth.require_login()
     if user.get("role") != "admin":
         st.error("Acesso restrito aos administradores.")
         st.stop()
@@ -32,9 +34,12 @@ def show():
 
     tab_list, tab_create, tab_update = st.tabs(["📋 Lista", "➕ Criar usuário", "🛠️ Alterar / (Des)ativar"])
 
+    # uma leitura por render (cacheada em services.usuarios), compartilhada pelas abas
+    df_users = usuarios.list_users()
+
     # ===== Lista
     with tab_list:
-        df = auth.list_users()
+        df = df_users.copy()
         # Deixa mais amigável
         if not df.empty:
             df = df.rename(columns={"username":"Usuário","name":"Nome","role":"Papel","active":"Ativo","created_at":"Criado em"})
@@ -60,7 +65,7 @@ def show():
                 st.error("As senhas não coincidem.")
             else:
                 try:
-                    auth.create_user(username, name, pwd, role, active)
+                    usuarios.create_user(username, name, pwd, role, active)
                 except Exception as e:
                     st.error(f"Erro ao criar usuário: {e}")
                 else:
@@ -71,7 +76,6 @@ def show():
     # ===== Alterar / (Des)ativar
     with tab_update:
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        df_users = auth.list_users()
         users = df_users["username"].tolist() if not df_users.empty else []
         if not users:
             st.info("Nenhum usuário cadastrado ainda.")
@@ -91,21 +95,21 @@ def show():
                 elif new_pwd != new_pwd2:
                     st.error("As senhas não coincidem.")
                 else:
-                    auth.set_password(sel, new_pwd)
+                    usuarios.set_password(sel, new_pwd)
                     st.success("Senha alterada com sucesso.")
 
             st.markdown("---")
             st.markdown("### 🔁 (Des)ativar usuário")
             new_active = st.selectbox("Status", ["Ativo", "Inativo"], index=0 if urow["active"]==1 else 1)
             if st.button("Aplicar status"):
-                auth.set_active(sel, new_active == "Ativo")
+                usuarios.set_active(sel, new_active == "Ativo")
                 st.success("Status atualizado.")
 
             st.markdown("---")
             st.markdown("### 🧭 Mudar papel (role)")
             new_role = st.selectbox("Papel", ["user", "admin"], index=0 if urow["role"]=="user" else 1)
             if st.button("Aplicar papel"):
-                auth.set_role(sel, new_role)
+                usuarios.set_role(sel, new_role)
                 st.success("Papel atualizado.")
 
         st.markdown('</div>', unsafe_allow_html=True)
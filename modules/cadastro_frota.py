@@ -1,13 +1,13 @@
 # modules/cadastro_frota.py
-import os
-import re
 import pandas as pd
 import streamlit as st
 from datetime import date, datetime
 
-from db import get_conn  # ✅ usa data.db via DB_PATH central
-TABLE     = "veiculos"   # ✅ nome novo
-FOTOS_DIR = "fotos_frota"
+from instrumentation import phase
+from modules import DOWNLOAD_LAZY
+from services import ErroValidacao
+from services.veiculos import listar_veiculos, salvar_veiculo  # cadastro/validação/listagem da frota
+PAGE_SIZES = [25, 50, 100, 200]
 
 def _fmt_date(d):
     if isinstance(d, date): return d.strftime("%Y-%m-%d")
@@ -37,40 +37,8 @@ def _inject_css():
     </style>
     """, unsafe_allow_html=True)
 
-# ========= Validações =========
-import re
-_PLACA_LEGADO   = re.compile(r"^[A-Z]{3}\d{4}$")         # AAA1234
-_PLACA_MERCOSUL = re.compile(r"^[A-Z]{3}\d[A-Z]\d{2}$")  # ABC1D23
-_CHASSI_RE      = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")   # sem I,O,Q
-
-def _validar_placa(placa: str) -> bool:
-    if not placa or len(placa) != 7: 
-        return False
-    placa = placa.upper()
-    return bool(_PLACA_LEGADO.match(placa) or _PLACA_MERCOSUL.match(placa))
-
-def _validar_chassi(chassi: str) -> bool:
-    if not chassi:
-        return True  # opcional
-    c = chassi.replace(" ", "").upper()
-    return bool(_CHASSI_RE.match(c))
-
-def _coerce_ano(v) -> int | None:
-    try:
-        iv = int(v)
-    except Exception:
-        return None
-    return iv if 1980 <= iv <= 2100 else None
-
-def _normalize_str(s: str, upper=False) -> str:
-    if s is None: 
-        return ""
-    s = str(s).strip()
-    return s.upper() if upper else s
-
 def show(com_expansor: bool = False):
     _inject_css()
-    os.makedirs(FOTOS_DIR, exist_ok=True)
 
     st.subheader("🚛 Cadastro de Frota")
 
@@ -100,60 +68,22 @@ def show(com_expansor: bool = False):
             submitted = st.form_submit_button("Salvar")
 
         if submitted:
-            payload = {
-                "num_frota": _normalize_str(num_frota, upper=True),
-                "classe_mecanica": _normalize_str(classe_mec),
-                "classe_operacional": _normalize_str(classe_op),
-                "placa": _normalize_str(placa, upper=True),
-                "modelo": _normalize_str(modelo),
-                "marca": _normalize_str(marca, upper=True),
-                "ano_fabricacao": _coerce_ano(ano),
-                "chassi": _normalize_str(chassi, upper=True).replace(" ", ""),
-                "status": status_opt.strip().lower(),  # ✅ casa com default 'ativo'
+            dados = {
+                "num_frota": num_frota, "classe_mecanica": classe_mec, "classe_operacional": classe_op,
+                "placa": placa, "modelo": modelo, "marca": marca, "ano_fabricacao": ano,
+                "chassi": chassi, "status": status_opt,
             }
-
-            erros = []
-            if not payload["num_frota"] and not payload["placa"]:
-                erros.append("Informe pelo menos **Nº da Frota** ou **Placa**.")
-            if payload["placa"] and not _validar_placa(payload["placa"]):
-                erros.append("**Placa** inválida. Use formato AAA1234 (antigo) ou ABC1D23 (Mercosul).")
-            if payload["chassi"] and not _validar_chassi(payload["chassi"]):
-                erros.append("**Chassi** inválido. Deve ter 17 caracteres alfanuméricos (sem I, O, Q).")
-            if ano and payload["ano_fabricacao"] is None:
-                erros.append("**Ano de Fabricação** fora do intervalo permitido (1980–2100).")
-
-            if erros:
-                for e in erros:
-                    st.error(e)
-            else:
-                upsert_key = "num_frota" if payload["num_frota"] else "placa"
-                cols = ", ".join(payload.keys())
-                qs   = ", ".join(["?"] * len(payload))
-                set_clause = ", ".join([f"{k}=excluded.{k}" for k in payload.keys() if k != upsert_key])
-
-                sql = f"""
-                    INSERT INTO {TABLE} ({cols}) VALUES ({qs})
-                    ON CONFLICT({upsert_key}) DO UPDATE SET {set_clause};
-                """
-                try:
-                    with get_conn() as conn:
-                        conn.execute(sql, list(payload.values()))
-                    if foto and payload["placa"]:
-                        with open(os.path.join(FOTOS_DIR, f"{payload['placa']}.jpg"), "wb") as f:
-                            f.write(foto.read())
-                    st.success("Frota salva/atualizada com sucesso!")
-                except Exception as e:
-                    st.error(f"Erro ao salvar: {e}")
+            try:
+                salvar_veiculo(dados, foto.read() if foto else None)
+                st.success("Frota salva/atualizada com sucesso!")
+            except ErroValidacao as e:
+                for erro in e.erros:
+                    st.error(erro)
+            except Exception as e:
+                st.error(f"Erro ao salvar: {e}")
 
     # --- Aba 2: Frotas Cadastradas ---
     with aba_lista:
-        try:
-            with get_conn() as conn:
-                df = pd.read_sql(f"SELECT * FROM {TABLE}", conn)
-        except Exception as e:
-            st.error(f"Erro ao carregar frota: {e}")
-            df = pd.DataFrame()
-
         colf1, colf2, colf3, colf4 = st.columns(4)
         with colf1:
             f_num_frota = st.text_input("Filtro: Nº da Frota")
@@ -163,42 +93,30 @@ def show(com_expansor: bool = False):
             f_op = st.text_input("Filtro: Classe Operacional")
         with colf4:
             f_marca = st.text_input("Filtro: Marca")
-        colf5, colf6 = st.columns(2)
+        colf5, colf6, colf7, colf8 = st.columns([1, 1, .5, .5])
         with colf5:
             f_status = st.selectbox("Filtro: Status", ["", "Ativo", "Inativo"], index=0)
         with colf6:
             f_placa = st.text_input("Filtro: Placa")
+        with colf7:
+            per_page = st.selectbox("Por página", PAGE_SIZES, index=1, key="frota_por_pagina")
+        with colf8:
+            page = st.number_input("Página", min_value=1, value=1, step=1, key="frota_pagina")
+
+        filtros = {
+            "num_frota": f_num_frota, "classe_mecanica": f_mec, "classe_operacional": f_op,
+            "marca": f_marca, "status": f_status, "placa": f_placa,
+        }
+        try:
+            df, total = listar_veiculos(filtros, page=int(page), per_page=per_page)
+        except Exception as e:
+            st.error(f"Erro ao carregar frota: {e}")
+            df, total = pd.DataFrame(), 0
 
         if not df.empty:
-            if f_num_frota: df = df[df["num_frota"].astype(str).str.contains(f_num_frota, case=False, na=False)]
-            if f_mec:       df = df[df["classe_mecanica"].astype(str).str.contains(f_mec, case=False, na=False)]
-            if f_op:        df = df[df["classe_operacional"].astype(str).str.contains(f_op, case=False, na=False)]
-            if f_marca:     df = df[df["marca"].astype(str).str.contains(f_marca, case=False, na=False)]
-            if f_status:    df = df[df["status"].astype(str).str.lower() == f_status.strip().lower()]
-            if f_placa:     df = df[df["placa"].astype(str).str.contains(f_placa.strip(), case=False, na=False)]
-
-            if "id" in df.columns: df = df.drop(columns=["id"])
-
-            friendly = {
-                "num_frota": "Nº da Frota",
-                "classe_mecanica": "Classe Mecânica",
-                "classe_operacional": "Classe Operacional",
-                "placa": "Placa",
-                "modelo": "Modelo",
-                "marca": "Marca",
-                "ano_fabricacao": "Ano de Fabricação",
-                "chassi": "Chassi (VIN)",
-                "status": "Status",
-            }
-            df = df.rename(columns={k: v for k, v in friendly.items() if k in df.columns})
-
-            order = [
-                "Nº da Frota","Placa","Modelo","Marca","Ano de Fabricação",
-                "Classe Mecânica","Classe Operacional","Chassi (VIN)","Status"
-            ]
-            existing = [c for c in order if c in df.columns]
-            other    = [c for c in df.columns if c not in existing]
-            df = df[existing + other]
+            inicio = (int(page) - 1) * per_page
+            st.caption(f"{inicio + 1}–{inicio + len(df)} de {total} veículo(s) · "
+                       f"{(total + per_page - 1) // per_page} página(s)")
 
             def pill_placa(val: str):
                 if isinstance(val, str) and val.strip():
@@ -216,12 +134,18 @@ def show(com_expansor: bool = False):
             if "Placa" in df.columns:  styled = styled.applymap(pill_placa, subset=["Placa"])
             if "Status" in df.columns: styled = styled.applymap(chip_status, subset=["Status"])
 
-            csv_bytes = df.to_csv(index=False).encode("utf-8-sig")
-            st.download_button("⬇️ Exportar CSV (frota filtrada)", data=csv_bytes,
+            def _csv_filtrado():
+                # todas as páginas do filtro, mesmas colunas da tela
+                df_all, _ = listar_veiculos(filtros, per_page=None)
+                return df_all.to_csv(index=False).encode("utf-8-sig")
+            st.download_button("⬇️ Exportar CSV (frota filtrada)",
+                               data=_csv_filtrado if DOWNLOAD_LAZY else _csv_filtrado(),
                                file_name="frota_filtrada.csv", mime="text/csv", use_container_width=True)
 
             container = st.expander("📋 Ver Frotas Cadastradas") if com_expansor else st.container()
-            with container:
+            with container, phase("cadastro_frota.styler"):
                 st.dataframe(styled, use_container_width=True)
+        elif total:
+            st.info(f"Página {int(page)} vazia: o filtro tem {total} veículo(s).")
         else:
             st.info("Nenhuma frota encontrada.")
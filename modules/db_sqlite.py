@@ -1,35 +1,12 @@
-import os, sqlite3
-from contextlib import contextmanager
-
-# .../SEU_PROJETO (sobe uma pasta a partir de /modules)
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH  = os.path.join(BASE_DIR, "data.db")  # data.db NA RAIZ do projeto
-
-@contextmanager
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+# Compatibilidade: a API antiga deste modulo agora passa pelo db.py (mesmo data.db,
+# PRAGMAs, instrumentacao e retry de escrita). Codigo novo deve importar de db.
+from db import DB_PATH, get_conn, fetchall as _fetchall, fetchone as _fetchone, execute_write
 
 def fetchall(sql, params=()):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        return [dict(r) for r in cur.fetchall()]
+    return _fetchall(sql, params)
 
 def fetchone(sql, params=()):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        r = cur.fetchone()
-        return dict(r) if r else None
+    return _fetchone(sql, params)
 
 def execute(sql, params=()):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        conn.commit()
-        return cur.lastrowid
+    return execute_write(sql, params).lastrowid
@@ -0,0 +1,152 @@
+# modules/desempenho.py
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+import metrics
+from config import INSTRUMENTATION, INSTRUMENTATION_JSONL, SLOW_QUERY_LOG, SLOW_QUERY_MS
+from modules import auth
+
+def _inject_css():
+    st.markdown("""
+    <style>
+      .stTabs [data-baseweb="tab"] {
+        background-color:#006400 !important; color:#ffffff !important;
+        font-weight:700; font-size:16px;
+      }
+      .stButton>button {
+        background:#ffffff !important; color:#004d00 !important; font-weight:700;
+        border:0; border-radius:8px;
+      }
+      .stDataFrame thead tr th { background:#d9f2d9 !important; color:#000 !important; }
+      .stDataFrame tbody tr td { background:#eaf8ea !important; color:#000 !important; }
+    </style>
+    """, unsafe_allow_html=True)
+
+def _resumo_reruns(reruns: list) -> pd.DataFrame:
+    """Uma linha por rerun, com o tempo das fases de primeiro nível em colunas."""
+    linhas = []
+    for r in reruns:
+        linha = {
+            "ID": r["id"], "Início": r["inicio"], "Página": r["pagina"], "Usuário": r["usuario"],
+            "Status": r["status"], "Total (ms)": r["total_ms"], "SQL (ms)": r["sql_ms"],
+            "Statements": r["statements"],
+        }
+        for f in r["fases"]:
+            if f["nivel"] == 0:
+                nome = "página" if f["nome"].startswith("pagina:") else f["nome"]
+                linha[f"{nome} (ms)"] = f["ms"]
+        linhas.append(linha)
+    return pd.DataFrame(linhas)
+
+def _consultas_panel():
+    """Agregado por fingerprint (todas as conexões do db.py) e log de consultas lentas."""
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        st.caption(
+            f"Consultas acima de {SLOW_QUERY_MS:.0f} ms entram no log com o EXPLAIN QUERY PLAN"
+            + (f" (também em `{SLOW_QUERY_LOG}`)." if SLOW_QUERY_LOG else ".")
+        )
+    with c2:
+        if st.button("Zerar", use_container_width=True, key="zerar_consultas"):
+            instrumentation.reset_query_stats()
+            st.rerun()
+
+    stats = instrumentation.query_stats()
+    if not stats:
+        st.info("Nenhuma consulta registrada ainda.")
+        return
+
+    st.markdown("**Por fingerprint** (ordenado pelo tempo total)")
+    df = pd.DataFrame(stats).drop(columns=["plano"])
+    df["full_scan"] = df["full_scan"].map({True: "⚠️ sim", False: "não"}).fillna("-")
+    df = df.rename(columns={
+        "fingerprint": "SQL", "count": "Execuções", "total_ms": "Total (ms)", "p50_ms": "p50 (ms)",
+        "p95_ms": "p95 (ms)", "max_ms": "Máx (ms)", "linhas": "Linhas", "lentas": "Lentas",
+        "full_scan": "Full scan",
+    })
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    lentas = instrumentation.slow_queries()
+    st.markdown(f"**Consultas lentas** ({len(lentas)})")
+    if not lentas:
+        st.info("Nenhuma consulta passou do limite.")
+        return
+    df_l = pd.DataFrame(lentas)
+    df_l["plano"] = df_l["plano"].map(lambda p: " | ".join(p) if p else "-")
+    df_l["full_scan"] = df_l["full_scan"].map({True: "⚠️ sim", False: "não"})
+    df_l = df_l.rename(columns={
+        "quando": "Quando", "fingerprint": "SQL", "params": "Parâmetros", "ms": "Tempo (ms)",
+        "linhas": "Linhas", "full_scan": "Full scan", "plano": "Plano", "fase": "Fase", "pagina": "Página",
+    })
+    st.dataframe(df_l, use_container_width=True, hide_index=True)
+
+def show(user: dict | None = None):
+    user = user or auth.require_login()
+    if user.get("role") != "admin":
+        st.error("Acesso restrito aos administradores.")
+        st.stop()
+
+    _inject_css()
+    st.subheader("⏱️ Desempenho")
+    if not INSTRUMENTATION:
+        st.info("Instrumentação desligada (FROTA_INSTRUMENTATION=0).")
+        return
+    if INSTRUMENTATION_JSONL:
+        st.caption(f"Reruns também gravados em `{INSTRUMENTATION_JSONL}`.")
+
+    reruns = instrumentation.recent_reruns()
+    tab_reruns, tab_sql, tab_metricas = st.tabs(["🔁 Reruns", "🐢 Consultas", "📈 Métricas"])
+
+    with tab_reruns:
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            st.caption(f"Últimos {len(reruns)} reruns deste processo (todas as sessões).")
+        with c2:
+            if st.button("Limpar", use_container_width=True):
+                instrumentation.clear()
+                st.rerun()
+        if not reruns:
+            st.info("Nenhum rerun registrado ainda. Navegue pelo app e volte aqui.")
+        else:
+            st.dataframe(_resumo_reruns(reruns), use_container_width=True, hide_index=True)
+
+            por_id = {r["id"]: r for r in reruns}
+            escolhido = st.selectbox(
+                "Detalhar rerun", list(por_id),
+                format_func=lambda i: f"#{i} · {por_id[i]['pagina'] or '-'} · {por_id[i]['total_ms']:.0f} ms",
+            )
+            r = por_id[escolhido]
+
+            st.markdown("**Fases**")
+            fases = pd.DataFrame(r["fases"])
+            if not fases.empty:
+                fases["nome"] = fases.apply(lambda f: "  " * int(f["nivel"]) + f["nome"], axis=1)
+                fases = fases.rename(columns={"nome": "Fase", "ms": "Tempo (ms)", "sql": "Statements",
+                                              "sql_ms": "SQL (ms)"}).drop(columns=["nivel"])
+                st.dataframe(fases, use_container_width=True, hide_index=True)
+
+            st.markdown(f"**SQL** ({len(r['sql'])} consultas, {r['sql_ms']:.1f} ms)")
+            if r["sql"]:
+                sql = pd.DataFrame(r["sql"]).rename(columns={
+                    "sql": "SQL", "params": "Parâmetros", "ms": "Tempo (ms)", "linhas": "Linhas", "fase": "Fase",
+                })
+                st.dataframe(sql.sort_values("Tempo (ms)", ascending=False), use_container_width=True, hide_index=True)
+
+    with tab_sql:
+        _consultas_panel()
+
+    with tab_metricas:
+        snap = metrics.snapshot()
+        if snap["histograms"]:
+            hist = pd.DataFrame([
+                {"Métrica": nome, "Qtd": h["count"], "Média (ms)": h["mean"], "p50 (ms)": h["p50"],
+                 "p95 (ms)": h["p95"], "Máx (ms)": h["max"]}
+                for nome, h in snap["histograms"].items()
+            ])
+            st.dataframe(hist, use_container_width=True, hide_index=True)
+        if snap["counters"]:
+            st.dataframe(pd.DataFrame(list(snap["counters"].items()), columns=["Contador", "Valor"]),
+                         use_container_width=True, hide_index=True)
+        if not snap["histograms"] and not snap["counters"]:
+            st.info("Sem métricas registradas neste processo.")
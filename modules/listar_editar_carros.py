@@ -1,35 +1,10 @@
 # modules/listar_editar_carros.py
-import sqlite3, io, csv
+import sqlite3
+from datetime import date, datetime
 import streamlit as st
-
-TABLE = "veiculos"
-
-# ---------- conexão ----------
-def _fallback_conn():
-    return sqlite3.connect("data.db", check_same_thread=False)
-
-try:
-    from db import get_connection as _get_connection
-    def get_connection():
-        return _get_connection()
-except Exception:
-    def get_connection():
-        return _fallback_conn()
-
-# ---------- colunas ----------
-COLS_REQUIRED = ["id", "placa", "modelo", "ano", "marca", "status", "criado_em"]
-COLS_OPTIONAL = ["num_frota", "ano_fabricacao", "chassi", "classe_mecanica", "classe_operacional"]
-COLS = COLS_REQUIRED + COLS_OPTIONAL
-
-def _get_existing_cols(conn):
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({TABLE})")
-    return [row[1] for row in cur.fetchall()]
-
-def _ensure_required(existing_cols):
-    miss = [c for c in COLS_REQUIRED if c not in existing_cols]
-    if miss:
-        raise RuntimeError(f"Tabela `{TABLE}` não tem as colunas obrigatórias: {', '.join(miss)}")
+from services import ErroValidacao, leituras
+from services import veiculos  # listagem/edição/exclusão e colunas presentes na tabela
+from modules import DOWNLOAD_LAZY
 
 # ---------- utils ----------
 def _to_int_or_none(v: str):
@@ -64,47 +39,8 @@ def _confirm_delete_ui(vid):
     return c1.button("Sim, excluir", type="primary", key=_row_key("conf_del", vid)), \
            c2.button("Cancelar", key=_row_key("cancel_del", vid))
 
-def _csv_bytes_from_rows(cols, rows):
-    wanted = [c for c in ["placa","modelo","marca","ano","status","num_frota","chassi"] if c in cols]
-    buf = io.StringIO(); w = csv.writer(buf); w.writerow(wanted)
-    for r in rows:
-        d = dict(zip(cols, r)); w.writerow([d.get(c, "") for c in wanted])
-    return buf.getvalue().encode("utf-8-sig")
-
-# ---------- queries ----------
-def listar(conn, filtro=""):
-    cur = conn.cursor()
-    base = f"SELECT id, placa, modelo, ano, marca, status FROM {TABLE}"
-    if filtro:
-        like = f"%{filtro}%"
-        cur.execute(base + " WHERE placa LIKE ? OR modelo LIKE ? ORDER BY placa", (like, like))
-    else:
-        cur.execute(base + " ORDER BY placa")
-    cols = [d[0] for d in cur.description]
-    return cols, cur.fetchall()
-
-def buscar(conn, vid: int, cols_present):
-    sel_cols = ", ".join(cols_present)
-    cur = conn.cursor()
-    cur.execute(f"SELECT {sel_cols} FROM {TABLE} WHERE id = ?", (vid,))
-    row = cur.fetchone()
-    return dict(zip(cols_present, row)) if row else None
-
-def atualizar(conn, vid: int, data: dict, cols_present):
-    settable = [c for c in cols_present if c not in ("id","criado_em")]
-    parts, params = [], []
-    for c in settable:
-        if c in data: parts.append(f"{c} = ?"); params.append(data[c])
-    if not parts: return
-    sql = f"UPDATE {TABLE} SET {', '.join(parts)} WHERE id = ?"
-    params.append(vid)
-    cur = conn.cursor(); cur.execute(sql, params); conn.commit()
-
-def excluir(conn, vid: int):
-    cur = conn.cursor(); cur.execute(f"DELETE FROM {TABLE} WHERE id = ?", (vid,)); conn.commit()
-
 # ---------- editor (reuso) ----------
-def _render_edit_form(current: dict, cols_present, conn, vid):
+def _render_edit_form(current: dict, cols_present, vid):
     with st.form(_row_key("form", vid)):
         f1, f2 = st.columns(2)
         with f1:
@@ -139,7 +75,7 @@ def _render_edit_form(current: dict, cols_present, conn, vid):
                 if "chassi" in cols_present: payload["chassi"] = chassi
                 if "classe_mecanica" in cols_present: payload["classe_mecanica"] = classe_mecanica
                 if "classe_operacional" in cols_present: payload["classe_operacional"] = classe_operacional
-                atualizar(conn, vid, payload, cols_present)
+                veiculos.atualizar(vid, payload, cols_present)
                 st.success("Atualizado com sucesso!")
                 st.session_state.edit_id = None
                 st.rerun()
@@ -152,14 +88,49 @@ def _render_edit_form(current: dict, cols_present, conn, vid):
         st.session_state.edit_id = None
         st.rerun()
 
-def _open_editor(conn, vid, cols_present):
-    current = buscar(conn, vid, cols_present)
+def _milhar(v) -> str:
+    return f"{v:,.0f}".replace(",", ".")
+
+def _leituras_ui(vid):
+    """Registro de leitura de hodômetro/horímetro + última leitura e uso médio do veículo."""
+    st.markdown("**Hodômetro / horímetro**")
+    with st.form(_row_key("form_leitura", vid), clear_on_submit=True):
+        l1, l2, l3 = st.columns(3)
+        km = l1.number_input("Km", min_value=0.0, step=1.0, value=None, format="%.0f")
+        horas = l2.number_input("Horas", min_value=0.0, step=0.1, value=None, format="%.1f")
+        quando = l3.date_input("Data da leitura", value=date.today(), format="DD/MM/YYYY")
+        registrar = st.form_submit_button("📏 Registrar leitura")
+    if registrar:
+        try:
+            leituras.registrar(vid, km=km, horas=horas, ts=datetime.now() if quando == date.today() else quando)
+            st.success("Leitura registrada.")
+        except ErroValidacao as e:
+            for msg in e.erros: st.error(msg)
+
+    ult = leituras.ultima(vid)
+    if not ult:
+        st.caption("Sem leituras.")
+        return
+    uso, partes = leituras.uso_medio(vid), []
+    if ult["km"] is not None:
+        partes.append(f"{_milhar(ult['km'])} km em {datetime.fromisoformat(ult['km_em']):%d/%m/%Y %H:%M}")
+    if ult["horas"] is not None:
+        partes.append(f"{ult['horas']:.1f}".replace(".", ",") + f" h em {datetime.fromisoformat(ult['horas_em']):%d/%m/%Y %H:%M}")
+    if uso["km_dia"]:
+        partes.append(f"~{_milhar(uso['km_dia'])} km/dia")
+    if uso["horas_dia"]:
+        partes.append(f"~{uso['horas_dia']:.1f} h/dia".replace(".", ","))
+    st.caption("Última leitura: " + " · ".join(partes))
+
+def _open_editor(vid, cols_present):
+    current = veiculos.buscar(vid, cols_present)
     title = f"Editar veículo — {(current.get('placa') or '').upper()}" if current else "Editar veículo"
     # Se tiver suporte a modal (st.dialog), abre janelinha; senão, cai no inline
     if hasattr(st, "dialog"):
         @st.dialog(title)
         def _dlg():
-            _render_edit_form(current, cols_present, conn, vid)
+            _render_edit_form(current, cols_present, vid)
+            _leituras_ui(vid)
         _dlg()
     else:
         st.session_state.edit_id = vid
@@ -186,112 +157,116 @@ def page():
     if "edit_id" not in st.session_state: st.session_state.edit_id = None
     if "confirm_del" not in st.session_state: st.session_state.confirm_del = None
 
-    with get_connection() as conn:
-        existing_cols = _get_existing_cols(conn)
-        _ensure_required(existing_cols)
-        cols_present = [c for c in COLS if c in existing_cols]
-
-        # ---- Controles (autocomplete + filtro + limpar)
-        st.caption("Busque digitando a placa/modelo (autocomplete) ou filtre por placa.")
-        cols_all, rows_all = listar(conn, "")
-        choices, id_by_label = [], {}
-        for row in rows_all:
-            d = dict(zip(cols_all, row))
-            placa = (d.get("placa") or "").upper()
-            modelo = d.get("modelo") or ""
-            marca  = d.get("marca")  or ""
-            label = f"{placa} — {modelo}{(' · ' + marca) if marca else ''}"
-            choices.append(label); id_by_label[label] = d["id"]
-
-        c1, c2, c3 = st.columns([3,2,1])
-        sel = c1.selectbox("Selecionar veículo (autocomplete)", [""] + choices, index=0, placeholder="Digite placa ou modelo…")
-        filtro_placa = c2.text_input("Filtro por placa (contém)", "")
-        if c3.button("Limpar filtros"):
-            st.session_state.edit_id = None
-            st.rerun()
-
-        # dataset filtrado (antes da paginação)
-        if sel:
-            sel_id = id_by_label[sel]
-            row_sel = next((r for r in rows_all if dict(zip(cols_all, r))["id"] == sel_id), None)
-            cols_f, rows_f = cols_all, ([row_sel] if row_sel else [])
-        else:
-            cols_f, rows_f = listar(conn, filtro_placa.strip())
-
-        if not rows_f:
-            st.info("Nenhum veículo encontrado."); return
-
-        # barra superior: +Novo / Exportar CSV
-        topL, topS, topR = st.columns([1,6,1])
-        if topL.button("➕ Novo", help="Ir para a aba Cadastrar"):
-            st.session_state["frota_tab"] = "Cadastrar"; st.rerun()
-        csv_bytes = _csv_bytes_from_rows(cols_f, rows_f)
-        topR.download_button("⬇️ Exportar CSV", data=csv_bytes, file_name="frota_filtrada.csv", mime="text/csv")
-
-        # --- paginação (select Por página + página atual)
-        total = len(rows_f)
-        p1, p2, p3 = st.columns([1,1,2])
-        page_size = p1.selectbox("Por página", [10,25,50], index=1)  # 25 default
-        n_pages = (total + page_size - 1) // page_size if total else 1
-        page_idx = p2.number_input("Página", 1, max(n_pages,1), 1, step=1)
-        start = (page_idx-1)*page_size; end = min(start + page_size, total)
-        p3.markdown(f"<div style='text-align:right;opacity:.85'>Mostrando <b>{start+1}-{end}</b> de <b>{total}</b></div>", unsafe_allow_html=True)
-        rows = rows_f[start:end]; cols = cols_f
-
-        # Cabeçalho
-        header = st.columns([0.8, 2.2, 3.2, 1.1, 2.2, 1.4])
-        header[0].markdown("**#**")
-        header[1].markdown("**Placa**")
-        header[2].markdown("**Modelo / Status**")
-        header[3].markdown("**Ano**")
-        header[4].markdown("**Marca**")
-        header[5].markdown("**Ações**")
-
-        # Linhas
-        for i, r in enumerate(rows, start=start+1):
-            d = dict(zip(cols, r)); vid = d["id"]
-            row_cls = "row-strip row-active" if st.session_state.edit_id == vid else "row-strip"
-            st.markdown(f'<div class="{row_cls}">', unsafe_allow_html=True)
-
-            c = st.columns([0.8, 2.2, 3.2, 1.1, 2.2, 1.4])
-            c[0].markdown(_chip(str(i)), unsafe_allow_html=True)
-
-            # Placa clicável (abre modal se disponível)
-            with c[1]:
-                st.markdown('<div class="placa-btn">', unsafe_allow_html=True)
-                if st.button((d.get("placa") or "").upper(), key=_row_key("plk", vid), help="Abrir editor"):
-                    _open_editor(conn, vid, cols_present)
-                st.markdown('</div>', unsafe_allow_html=True)
-
-            modelo = d.get("modelo") or ""
-            c[2].markdown(f"{modelo}<br>{_status_badge(d.get('status') or '')}", unsafe_allow_html=True)
-            c[3].markdown(_chip(d.get("ano") or ""), unsafe_allow_html=True)
-            c[4].write(d.get("marca") or "")
-
-            b_edit, b_del = c[5].columns(2)
-            if b_edit.button("✏️", key=_row_key("edit", vid), help="Editar"):
-                _open_editor(conn, vid, cols_present)
-            if b_del.button("🗑️", key=_row_key("del", vid), help="Excluir"):
-                st.session_state.confirm_del = vid; st.session_state.edit_id = None
-
-            if st.session_state.confirm_del == vid:
-                ok, cancel = _confirm_delete_ui(vid)
-                if ok:
-                    try:
-                        excluir(conn, vid); st.success("Veículo excluído.")
-                        st.session_state.confirm_del = None; st.rerun()
-                    except Exception as e:
-                        st.error(f"Falha ao excluir: {e}")
-                if cancel:
-                    st.session_state.confirm_del = None; st.rerun()
+    cols_present = veiculos.colunas_presentes()
 
-            # Fallback inline (se não houver st.dialog)
-            if (st.session_state.edit_id == vid) and (not hasattr(st, "dialog")):
-                st.subheader(f"Editar veículo — {(d.get('placa') or '').upper()}")
-                current = buscar(conn, vid, cols_present)
-                if not current:
-                    st.error("Registro não encontrado.")
-                else:
-                    _render_edit_form(current, cols_present, conn, vid)
+    # ---- Controles (autocomplete + filtro + limpar)
+    st.caption("Busque digitando a placa/modelo (autocomplete) ou filtre por placa.")
+    placa_by_label = {label: placa for placa, label in veiculos.rotulos_placa()}
 
-            st.markdown("</div>", unsafe_allow_html=True)
+    c1, c2, c3 = st.columns([3,2,1])
+    sel = c1.selectbox("Selecionar veículo (autocomplete)", [""] + list(placa_by_label), index=0, placeholder="Digite placa ou modelo…")
+    filtro_placa = c2.text_input("Filtro por placa (contém)", "")
+    if c3.button("Limpar filtros"):
+        st.session_state.edit_id = None
+        st.rerun()
+    placa_sel = placa_by_label.get(sel, "")
+    filtro = "" if placa_sel else filtro_placa.strip()
+
+    # barra superior: +Novo / Exportar CSV
+    topL, topS, topR = st.columns([1,6,1])
+    if topL.button("➕ Novo", help="Ir para a aba Cadastrar"):
+        st.session_state["frota_tab"] = "Cadastrar"; st.rerun()
+    def _csv_filtrado():
+        # todas as páginas do filtro, com resumo/km
+        return veiculos.csv_resumo(*veiculos.listar_resumo(filtro, placa_sel))
+    topR.download_button("⬇️ Exportar CSV", data=_csv_filtrado if DOWNLOAD_LAZY else _csv_filtrado(),
+                         file_name="frota_filtrada.csv", mime="text/csv")
+
+    with st.expander("📥 Importar leituras de hodômetro/horímetro (CSV / telemetria)"):
+        st.caption("Colunas: placa (ou veiculo_id), data_hora, km e/ou horas; separador ; , ou tab. "
+                   "A mesma leitura (veículo + data/hora) enviada de novo é atualizada; linhas inválidas são puladas.")
+        arq = st.file_uploader("Arquivo CSV", type=["csv", "txt"], key="leituras_csv")
+        if arq is not None and st.button("Importar leituras", key="leituras_btn"):
+            try:
+                with st.spinner("Importando leituras…"):
+                    res = leituras.importar_csv(arq, origem="csv")
+                st.success(f"{_milhar(res['gravadas'])} leitura(s) gravada(s)"
+                           + (f", {_milhar(res['rejeitadas'])} rejeitada(s)." if res["rejeitadas"] else "."))
+                for erro in res["erros"]: st.caption(erro)
+            except ErroValidacao as e:
+                for msg in e.erros: st.error(msg)
+
+    # --- paginação no SQL (select Por página + página atual); só a página vem do banco
+    p1, p2, p3 = st.columns([1,1,2])
+    page_size = p1.selectbox("Por página", [10,25,50], index=1)  # 25 default
+    page_idx = p2.number_input("Página", min_value=1, value=1, step=1)
+    cols, rows, total = veiculos.pagina_resumo(filtro, placa_sel, int(page_idx), page_size)
+    n_pages = (total + page_size - 1) // page_size if total else 1
+
+    if not total:
+        st.info("Nenhum veículo encontrado."); return
+    if not rows:
+        st.info(f"Página {int(page_idx)} vazia: o filtro tem {total} veículo(s) em {n_pages} página(s)."); return
+    start = (int(page_idx)-1)*page_size; end = start + len(rows)
+    p3.markdown(f"<div style='text-align:right;opacity:.85'>Mostrando <b>{start+1}-{end}</b> de <b>{total}</b></div>", unsafe_allow_html=True)
+
+    # Cabeçalho
+    header = st.columns([0.8, 2.0, 2.8, 1.0, 1.8, 2.6, 1.4])
+    header[0].markdown("**#**")
+    header[1].markdown("**Placa**")
+    header[2].markdown("**Modelo / Status**")
+    header[3].markdown("**Ano**")
+    header[4].markdown("**Marca**")
+    header[5].markdown("**Manutenção / OS / Km**")
+    header[6].markdown("**Ações**")
+
+    # Linhas
+    for i, r in enumerate(rows, start=start+1):
+        d = dict(zip(cols, r)); vid = d["id"]
+        row_cls = "row-strip row-active" if st.session_state.edit_id == vid else "row-strip"
+        st.markdown(f'<div class="{row_cls}">', unsafe_allow_html=True)
+
+        c = st.columns([0.8, 2.0, 2.8, 1.0, 1.8, 2.6, 1.4])
+        c[0].markdown(_chip(str(i)), unsafe_allow_html=True)
+
+        # Placa clicável (abre modal se disponível)
+        with c[1]:
+            st.markdown('<div class="placa-btn">', unsafe_allow_html=True)
+            if st.button((d.get("placa") or "").upper(), key=_row_key("plk", vid), help="Abrir editor"):
+                _open_editor(vid, cols_present)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+        modelo = d.get("modelo") or ""
+        c[2].markdown(f"{modelo}<br>{_status_badge(d.get('status') or '')}", unsafe_allow_html=True)
+        c[3].markdown(_chip(d.get("ano") or ""), unsafe_allow_html=True)
+        c[4].write(d.get("marca") or "")
+        c[5].caption(veiculos.resumo_label(d) or "sem lançamentos")
+
+        b_edit, b_del = c[6].columns(2)
+        if b_edit.button("✏️", key=_row_key("edit", vid), help="Editar"):
+            _open_editor(vid, cols_present)
+        if b_del.button("🗑️", key=_row_key("del", vid), help="Excluir"):
+            st.session_state.confirm_del = vid; st.session_state.edit_id = None
+
+        if st.session_state.confirm_del == vid:
+            ok, cancel = _confirm_delete_ui(vid)
+            if ok:
+                try:
+                    veiculos.excluir(vid); st.success("Veículo excluído.")
+                    st.session_state.confirm_del = None; st.rerun()
+                except Exception as e:
+                    st.error(f"Falha ao excluir: {e}")
+            if cancel:
+                st.session_state.confirm_del = None; st.rerun()
+
+        # Fallback inline (se não houver st.dialog)
+        if (st.session_state.edit_id == vid) and (not hasattr(st, "dialog")):
+            st.subheader(f"Editar veículo — {(d.get('placa') or '').upper()}")
+            current = veiculos.buscar(vid, cols_present)
+            if not current:
+                st.error("Registro não encontrado.")
+            else:
+                _render_edit_form(current, cols_present, vid)
+                _leituras_ui(vid)
+
+        st.markdown("</div>", unsafe_allow_html=True)
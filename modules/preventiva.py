@@ -0,0 +1,131 @@
+# modules/preventiva.py
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from instrumentation import phase
+from services import ErroValidacao, leituras, preventiva, veiculos
+from services.manutencoes import TIPOS
+
+_HORIZONTES = {"Vencidos": 0, "Próximos 7 dias": 7, "Próximos 30 dias": 30, "Próximos 90 dias": 90}
+
+# =============== CSS ===============
+def _inject_css():
+    st.markdown("""
+    <style>
+      .stApp { background-color: #004d00 !important; color: #ffffff !important; }
+      header[data-testid="stHeader"] { background-color: #004d00 !important; }
+      .stTabs [data-baseweb="tab"] {
+        background-color: #006400 !important; color: #ffffff !important;
+        font-weight: 700; font-size: 16px;
+      }
+      .stTextInput input, .stNumberInput input, .stSelectbox div[data-baseweb="select"],
+      .stDateInput input, textarea {
+        background-color: #ffffff !important; color: #000000 !important;
+      }
+      .stButton>button {
+        background-color: #ffffff !important; color: #004d00 !important; font-weight: 700;
+        border: 0; border-radius: 8px;
+      }
+      .stDataFrame thead tr th { background-color: #d9f2d9 !important; color: #000000 !important; }
+      .stDataFrame tbody tr td { background-color: #eaf8ea !important; color: #000000 !important; }
+    </style>
+    """, unsafe_allow_html=True)
+
+def _br(s: pd.Series) -> pd.Series:
+    return pd.to_datetime(s, errors="coerce").dt.strftime("%d/%m/%Y").fillna("—")
+
+def _km(s: pd.Series) -> pd.Series:
+    return s.map(lambda v: "" if pd.isna(v) else f"{v:,.0f}".replace(",", "."))
+
+# =============== Vencimentos ===============
+def _vencimentos_tab():
+    c1, c2, c3 = st.columns([1.2, 1.2, 1])
+    horizonte = c1.selectbox("Vencendo", list(_HORIZONTES), index=1, key="prev_horizonte")
+    placa = c2.text_input("Placa (contém)", key="prev_placa")
+    with c3:
+        st.write("")
+        if st.button("📝 Gerar OS rascunho", help="Para os itens sem OS que vencem dentro da antecedência do plano"):
+            criadas = preventiva.gerar_rascunhos()
+            st.toast(f"{len(criadas)} OS rascunho criada(s)." if criadas else "Nada a gerar.")
+
+    with phase("preventiva.vencimentos"):
+        df = preventiva.vencimentos(date.today() + timedelta(days=_HORIZONTES[horizonte]), placa=placa)
+    if df.empty:
+        st.info("Nada vencendo neste horizonte.")
+        return
+
+    atrasados = int((df["dias_atraso"] > 0).sum())
+    st.caption(f"{len(df)} item(ns), {atrasados} em atraso. Lançar a manutenção ou liberar a OS do plano reagenda o item.")
+    tabela = pd.DataFrame({
+        "Plano": df["plano"], "Nº da Frota": df["num_frota"], "Placa": df["placa"], "Modelo": df["modelo"],
+        "Última execução": _br(df["ultima_execucao"]), "Vence em": _br(df["vence_em"]),
+        "Dias de atraso": df["dias_atraso"], "Km atual": _km(df["km_atual"]), "Vence aos (km)": _km(df["vence_km"]),
+        "OS": df["num_os"].fillna(""), "Status OS": df["status_os"].fillna(""),
+    })
+    if df["vence_km"].isna().all():
+        tabela = tabela.drop(columns=["Km atual", "Vence aos (km)"])
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
+
+# =============== Planos ===============
+def _planos_tab():
+    with st.form("form_plano", clear_on_submit=True):
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            nome = st.text_input("Nome do plano", placeholder="Ex: Troca de óleo")
+            classe = st.selectbox("Classe mecânica", ["(todas)", *veiculos.valores("classe_mecanica")])
+            modelo = st.selectbox("Modelo", ["(todos)", *veiculos.valores("modelo")])
+        with c2:
+            dias = st.number_input("A cada (dias)", min_value=0, step=15, value=90)
+            km = st.number_input("A cada (km)", min_value=0, step=1000, value=0)
+            antecedencia = st.number_input("Antecedência da OS (dias)", min_value=0, step=1, value=7)
+        with c3:
+            tipo = st.selectbox("Cumprido por lançamento do tipo", ["(qualquer)", *TIPOS])
+            termo = st.text_input("…com descrição contendo", placeholder="Ex: óleo")
+        enviado = st.form_submit_button("Salvar plano")
+
+    if enviado:
+        try:
+            preventiva.criar_plano({
+                "nome": nome, "intervalo_dias": dias, "intervalo_km": km, "antecedencia_dias": antecedencia,
+                "classe_mecanica": None if classe == "(todas)" else classe,
+                "modelo": None if modelo == "(todos)" else modelo,
+                "tipo": None if tipo == "(qualquer)" else tipo, "termo": termo,
+            })
+            st.success("Plano criado.")
+        except ErroValidacao as e:
+            for msg in e.erros:
+                st.error(msg)
+
+    st.caption("Planos por km usam as leituras de hodômetro (Frota → editar veículo ou importar CSV); "
+               f"a data de vencimento é estimada pelo uso médio dos últimos {leituras.USO_DIAS} dias.")
+    planos = preventiva.listar_planos()
+    if planos.empty:
+        st.info("Nenhum plano cadastrado.")
+        return
+    st.dataframe(pd.DataFrame({
+        "Plano": planos["nome"], "Classe": planos["classe_mecanica"].fillna("todas"),
+        "Modelo": planos["modelo"].fillna("todos"), "Dias": planos["intervalo_dias"], "Km": planos["intervalo_km"],
+        "Tipo": planos["tipo"].fillna(""), "Descrição": planos["termo"].fillna(""),
+        "Veículos": planos["veiculos"], "Vencidos": planos["vencidos"],
+    }), use_container_width=True, hide_index=True)
+
+    d1, d2 = st.columns([3, 1])
+    rotulos = dict(zip(planos["nome"] + " (#" + planos["id"].astype(str) + ")", planos["id"]))
+    alvo = d1.selectbox("Excluir plano", [""] + list(rotulos), key="prev_excluir")
+    with d2:
+        st.write("")
+        if st.button("🗑️ Excluir", disabled=not alvo):
+            preventiva.excluir_plano(int(rotulos[alvo]))
+            st.rerun()
+
+# =============== UI principal ===============
+def show():
+    _inject_css()
+    st.subheader("🗓️ Manutenção Preventiva")
+    aba_venc, aba_planos = st.tabs(["⏰ Vencimentos", "📐 Planos"])
+    with aba_venc:
+        _vencimentos_tab()
+    with aba_planos:
+        _planos_tab()
@@ -1,20 +1,19 @@
 # modules/relatorios.py
-from datetime import date, datetime
-from typing import Optional, Tuple
-import sqlite3
+from typing import Optional
+import json
 import pandas as pd
 import streamlit as st
-import altair as alt
 
-# ===== conexão única (usa get_conn do projeto se existir) =====
-def _fallback_conn():
-    return sqlite3.connect("data.db", check_same_thread=False)
-
-try:
-    from db import get_conn  # projeto
-except Exception:
-    def get_conn():
-        return _fallback_conn()
+import anomalias
+import cubo_custos
+import graficos
+import jobs
+import sla_os
+from instrumentation import phase
+# carga, filtros, rankings e formatação; importar registra também o job "relatorio_csv"
+from services.relatorios import (
+    aplicar_filtros, brl, carregar, custos_por, fmt_date_iso, kpis, serie_temporal, tabela_frota, tabela_man, tabela_os,
+)
 
 # ======= CSS compacto (cards + tabelas + inputs) =======
 def _inject_css():
@@ -36,120 +35,229 @@ def _inject_css():
     """, unsafe_allow_html=True)
 
 # ======= helpers =======
-def _fmt_date_iso(d):
-    if isinstance(d, date): return d.strftime("%Y-%m-%d")
-    if isinstance(d, datetime): return d.date().strftime("%Y-%m-%d")
-    return str(d) if d else None
-
-def _fmt_br_date_col(df: pd.DataFrame, cols):
-    for c in cols:
-        if c in df.columns:
-            df[c] = pd.to_datetime(df[c], errors="coerce").dt.strftime("%d/%m/%Y").fillna(df[c])
-    return df
-
 def _download_csv_button(df: pd.DataFrame, label: str, fname: str):
     csv_bytes = df.to_csv(index=False).encode("utf-8-sig")
     st.download_button(label, data=csv_bytes, file_name=fname, mime="text/csv", use_container_width=True)
 
-# ======= Carga (data.db) =======
-def _load_data():
-    with get_conn() as conn:
-        df_os = pd.read_sql("""
-            SELECT
-                os.id,
-                os.data_abertura,
-                os.num_os,
-                v.num_frota,
-                os.placa,
-                v.modelo,
-                v.marca,
-                v.ano_fabricacao,
-                v.chassi,
-                os.descricao,
-                os.prioridade,
-                os.sc,
-                os.orcamento,
-                os.previsao_saida,
-                os.data_liberacao,
-                os.responsavel,
-                os.status
-            FROM ordens_servico os
-            LEFT JOIN veiculos v ON v.id = os.veiculo_id
-        """, conn)
-
-        df_man = pd.read_sql("""
-            SELECT
-                m.id,
-                v.num_frota,
-                m.placa,
-                v.modelo,
-                v.marca,
-                v.ano_fabricacao,
-                v.chassi,
-                m.data,
-                m.mes,
-                m.sc,
-                m.tipo,
-                m.cod_peca,
-                m.desc_peca,
-                m.qtd,
-                m.vlr_unitario,
-                COALESCE(m.vlr_peca, m.qtd * m.vlr_unitario) AS custo,
-                m.fornecedor,
-                m.nf
-            FROM manutencoes m
-            LEFT JOIN veiculos v ON v.id = m.veiculo_id
-        """, conn)
-
-        df_frota = pd.read_sql("""
-            SELECT id, num_frota, placa, modelo, marca, ano_fabricacao,
-                   classe_mecanica, classe_operacional, chassi, status
-            FROM veiculos
-        """, conn)
-
-    return df_os, df_man, df_frota
-
-def _apply_global_filters(
-    df_os: pd.DataFrame,
-    df_man: pd.DataFrame,
-    df_frota: pd.DataFrame,
-    dt_range: Tuple[Optional[date], Optional[date]],
-    status_os: str,
-    placa: str,
-    num_frota: str,
-):
-    start, end = dt_range
-    if not df_os.empty:
-        if start: df_os = df_os[df_os["data_abertura"] >= _fmt_date_iso(start)]
-        if end:   df_os = df_os[df_os["data_abertura"] <= _fmt_date_iso(end)]
-        if status_os: df_os = df_os[df_os["status"].astype(str).str.lower() == status_os.strip().lower()]
-        if placa: df_os = df_os[df_os["placa"].astype(str).str.contains(placa, case=False, na=False)]
-        if num_frota: df_os = df_os[df_os["num_frota"].astype(str).str.contains(num_frota, case=False, na=False)]
-
-    if not df_man.empty:
-        if start: df_man = df_man[df_man["data"] >= _fmt_date_iso(start)]
-        if end:   df_man = df_man[df_man["data"] <= _fmt_date_iso(end)]
-        if placa: df_man = df_man[df_man["placa"].astype(str).str.contains(placa, case=False, na=False)]
-        if num_frota: df_man = df_man[df_man["num_frota"].astype(str).str.contains(num_frota, case=False, na=False)]
-
-    if not df_frota.empty:
-        if placa: df_frota = df_frota[df_frota["placa"].astype(str).str.contains(placa, case=False, na=False)]
-        if num_frota: df_frota = df_frota[df_frota["num_frota"].astype(str).str.contains(num_frota, case=False, na=False)]
-
-    return df_os, df_man, df_frota
-
-# ======= Gráficos (Altair) =======
-def _bar(df, x, y, title, height=260):
-    chart = (
-        alt.Chart(df)
-        .mark_bar()
-        .encode(x=alt.X(x, sort='-y', title=None), y=alt.Y(y, title=None), tooltip=list(df.columns))
-        .properties(height=height, title=alt.TitleParams(title, anchor='start', color='#fff'))
-        .configure_axis(labelColor='#fff', titleColor='#fff', gridColor='#295429')
-        .configure_view(strokeOpacity=0)
-        .configure_title(color='#fff')
+# ======= Exportações em segundo plano (jobs.py + services.relatorios) =======
+_EXPORT_LABELS = {"os": "OS", "manutencoes": "Manutenções", "frota": "Frota"}
+
+def _job_owner() -> Optional[str]:
+    return (st.session_state.get("auth_user") or {}).get("username")
+
+def _export_job_button(tabela: str, filtros: dict, label: str):
+    if st.button(label, key=f"job_export_{tabela}", use_container_width=True):
+        jobs.submit("relatorio_csv", {"tabela": tabela, **filtros}, owner=_job_owner())
+        st.toast("Exportação enviada. Acompanhe e baixe na aba 📦 Exportações.")
+
+def _exportacoes_panel():
+    owner = _job_owner()
+
+    def _render():
+        lista = jobs.list_jobs(owner=owner, limit=10)
+        if not lista:
+            st.caption("Nenhuma exportação recente.")
+            return
+        for j in lista:
+            try:
+                tabela = json.loads(j["params"] or "{}").get("tabela", "")
+            except ValueError:
+                tabela = ""
+            label = f"CSV {_EXPORT_LABELS.get(tabela, tabela)} · {j['created_at']}"
+            c1, c2 = st.columns([4, 1])
+            if j["status"] in ("pendente", "executando"):
+                c1.progress(float(j["progress"] or 0), text=f"{label} — {j['message'] or j['status']}")
+            elif j["status"] == "concluido":
+                c1.markdown(f"✅ {label}")
+                data = jobs.result_bytes(j["id"])
+                if data is not None:
+                    c2.download_button("⬇️ Baixar", data=data, file_name=j["result_name"],
+                                       mime=j["result_mime"], key=f"job_dl_{j['id']}")
+            else:
+                c1.error(f"{label}: {j['message'] or 'falhou'}")
+
+    ativos = any(j["status"] in ("pendente", "executando") for j in jobs.list_jobs(owner=owner, limit=10))
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if ativos and fragment:
+        # só esta área é reexecutada a cada 2s enquanto houver job rodando
+        fragment(run_every=2)(_render)()
+    else:
+        _render()
+        if ativos and st.button("🔄 Atualizar", key="job_refresh"):
+            st.rerun()
+
+# ======= Cubo de custos (pivot mês × dimensões) =======
+_DIM_LABELS = {
+    "mes": "Mês", "classe_mecanica": "Classe Mecânica", "classe_operacional": "Classe Operacional",
+    "marca": "Marca", "fornecedor": "Fornecedor",
+}
+
+@phase("relatorios.cubo")
+def _cubo_panel(dt_start, dt_end):
+    st.caption("Custos pré-agregados por mês, classe, marca e fornecedor (atualizados só nos meses alterados). "
+               "Usa o período dos filtros globais; placa/frota não se aplicam aqui.")
+    dims = list(_DIM_LABELS)
+    c1, c2, c3 = st.columns([1.4, 1, 1])
+    with c1:
+        linhas = st.multiselect("Linhas", dims[1:], default=["classe_mecanica"],
+                                format_func=_DIM_LABELS.get, key="cubo_linhas")
+    with c2:
+        coluna = st.selectbox("Colunas", ["mes", "classe_mecanica", "classe_operacional", "marca", ""],
+                              format_func=lambda d: _DIM_LABELS.get(d, "(nenhuma)"), key="cubo_coluna")
+    with c3:
+        medida = st.selectbox("Medida", ["custo", "itens", "linhas"],
+                              format_func={"custo": "Custo (R$)", "itens": "Itens (qtd)", "linhas": "Lançamentos"}.get,
+                              key="cubo_medida")
+
+    filtros = {}
+    with st.expander("Filtrar dimensões (slice/dice)"):
+        cols = st.columns(4)
+        for col, dim in zip(cols, dims[1:]):
+            with col:
+                filtros[dim] = st.multiselect(_DIM_LABELS[dim], cubo_custos.valores(dim), key=f"cubo_f_{dim}")
+
+    if not linhas:
+        st.info("Escolha ao menos uma dimensão para as linhas.")
+        return
+    tabela = cubo_custos.pivot(
+        linhas, coluna or None, medida, filtros,
+        de=fmt_date_iso(dt_start), ate=fmt_date_iso(dt_end),
     )
-    return chart
+    if tabela.empty:
+        st.info("Sem custos neste recorte.")
+        return
+    tabela = tabela.rename_axis(index=[_DIM_LABELS[d] for d in linhas])
+    st.dataframe(tabela, use_container_width=True)
+    _download_csv_button(tabela.reset_index(), "⬇️ Exportar CSV (cubo)", "cubo_custos.csv")
+
+_ANOMALIA_COLS = {
+    "tipo": "Tipo", "mes": "Mês", "placa": "Placa", "cod_peca": "Cód. Peça", "fornecedor": "Fornecedor",
+    "valor": "Valor (R$)", "referencia": "Referência", "razao": "Razão", "manutencao_id": "Lançamento",
+}
+
+@phase("relatorios.anomalias")
+def _anomalias_panel(dt_start, dt_end):
+    st.caption("Preço unitário muito acima da mediana recente da peça, saltos no gasto mensal do veículo "
+               "e itens lançados em duplicidade na mesma NF/SC. Só os lançamentos novos são analisados a cada "
+               "abertura; placa/frota dos filtros globais não se aplicam aqui.")
+    with st.spinner("Analisando lançamentos novos..."):
+        novos = anomalias.detectar()
+    if novos["linhas"]:
+        st.caption(f"{novos['linhas']:,} lançamentos novos analisados em {novos['ms']:.0f} ms.".replace(",", "."))
+
+    de, ate = fmt_date_iso(dt_start), fmt_date_iso(dt_end)
+    contagem = anomalias.resumo(de, ate)
+    for col, (tipo, rotulo) in zip(st.columns(len(anomalias.TIPOS)), anomalias.TIPOS.items()):
+        col.metric(rotulo, f"{contagem[tipo]:,}".replace(",", "."))
+
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        tipo = st.selectbox("Tipo", ["", *anomalias.TIPOS],
+                            format_func=lambda t: anomalias.TIPOS.get(t, "Todos"), key="anomalia_tipo")
+    with c2:
+        st.write("")
+        if st.button("Reprocessar tudo", use_container_width=True, key="anomalia_reprocessar"):
+            with st.spinner("Reprocessando todo o histórico..."):
+                anomalias.reprocessar()
+            st.rerun()
+
+    df = anomalias.listar(tipo or None, de, ate)
+    if df.empty:
+        st.info("Nenhuma anomalia neste período.")
+        return
+    df["tipo"] = df["tipo"].map(anomalias.TIPOS)
+    df = df[list(_ANOMALIA_COLS)].rename(columns=_ANOMALIA_COLS)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    _download_csv_button(df, "⬇️ Exportar CSV (anomalias)", "anomalias.csv")
+
+def _card(rotulo: str, valor) -> str:
+    return f'<div class="metric-card"><div class="metric-lbl">{rotulo}</div><div class="metric-val">{valor}</div></div>'
+
+@phase("relatorios.sla")
+def _sla_cards(filtros: dict):
+    """KPIs de SLA (sla_os, mantido por triggers) + aging das OS abertas por prioridade."""
+    kpi = sla_os.resumo(filtros["de"], filtros["ate"], filtros["placa"])
+    _num = lambda v, suf="": "-" if v is None else f"{v:.1f}{suf}".replace(".", ",")
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.markdown(_card("Tempo médio em oficina", _num(kpi["dias_medios"], " d")), unsafe_allow_html=True)
+    with c2:
+        st.markdown(_card("OS liberadas após a previsão", _num(kpi["pct_atraso"], "%")), unsafe_allow_html=True)
+    with c3:
+        st.markdown(_card("Atraso médio", _num(kpi["atraso_medio"], " d")), unsafe_allow_html=True)
+    with c4:
+        st.markdown(_card("OS abertas (há > 15 dias)", f'{kpi["abertas"]} ({kpi["abertas_15d"]})'), unsafe_allow_html=True)
+
+    idade = sla_os.aging(placa=filtros["placa"])
+    if not idade.empty:
+        with st.expander("Aging das OS abertas por prioridade"):
+            st.dataframe(idade.rename_axis("Prioridade"), use_container_width=True)
+    st.markdown("---")
+
+@phase("relatorios.grafico")
+def _bar(df, x, y, height=260):
+    # spec em cache pela impressão digital de df (graficos.py); rerun sem mudança não refaz o Altair
+    st.vega_lite_chart(graficos.barras(df, x, y, height=height), use_container_width=True)
+
+_RESOLUCOES = {"Automática": "auto", "Semanal": "semana", "Mensal": "mes"}
+_NOME_RESOLUCAO = {"dia": "Diária", "semana": "Semanal", "mes": "Mensal"}
+
+def _serie(serie: str, rotulo: str, filtros: dict, resolucao: str, formato: str):
+    # agregado no SQL; no máximo MAX_PONTOS pontos chegam ao navegador (LTTB acima disso)
+    df, usada, total = serie_temporal(serie, filtros, resolucao)
+    if df.empty:
+        st.info("Sem dados no período.")
+        return
+    df = df.rename(columns={"periodo": "Período", "valor": rotulo})
+    st.vega_lite_chart(graficos.linha(df, "Período", rotulo, formato=formato), use_container_width=True)
+    nota = f"{_NOME_RESOLUCAO[usada]} · {total} períodos"
+    if len(df) < total:
+        nota += f", reduzidos a {len(df)} pontos (LTTB)"
+    st.caption(nota)
+
+def _series_panel(filtros: dict):
+    st.markdown("**Evolução no período**")
+    resolucao = st.radio("Resolução", list(_RESOLUCOES), horizontal=True, key="serie_resolucao")
+    s1, s2 = st.columns(2)
+    with s1:
+        st.markdown("Custo de manutenção (R$)")
+        _serie("custo", "Custo", filtros, _RESOLUCOES[resolucao], ",.2f")
+    with s2:
+        st.markdown("Volume de OS abertas")
+        _serie("os", "OS", filtros, _RESOLUCOES[resolucao], "d")
+
+def _graficos_panel(df_os, df_man, filtros: dict):
+    g1, g2 = st.columns(2)
+    with g1:
+        st.markdown("**OS por Status**")
+        if not df_os.empty and "status" in df_os.columns:
+            os_status = df_os["status"].astype(str).str.title().value_counts().rename_axis("Status").reset_index(name="Qtd")
+            _bar(os_status, "Status", "Qtd", height=260)
+        else:
+            st.info("Sem dados de OS para este gráfico.")
+    with g2:
+        st.markdown("**Manutenções por Tipo**")
+        if not df_man.empty and "tipo" in df_man.columns:
+            man_tipo = df_man["tipo"].astype(str).value_counts().rename_axis("Tipo").reset_index(name="Qtd")
+            _bar(man_tipo, "Tipo", "Qtd", height=260)
+        else:
+            st.info("Sem dados de Manutenções para este gráfico.")
+
+    st.markdown("---")
+    st.markdown("**Top 10 Placas por Custo de Manutenção**")
+    top = custos_por("placa", filtros, top=10, df_man=df_man).rename(columns={"placa": "Placa", "custo": "Custo Total"})
+    if not top.empty:
+        _bar(top, "Placa", "Custo Total", height=280)
+
+        # CSV com valores formatados em R$
+        top_fmt = top.copy()
+        top_fmt["Custo Total"] = top_fmt["Custo Total"].map(brl)
+        _download_csv_button(top_fmt, "⬇️ Exportar CSV (Top Placas por Custo)", "top_placas_custo.csv")
+    else:
+        st.info("Sem dados para ranking de custo.")
+
+    st.markdown("---")
+    _series_panel(filtros)
 
 # ======= UI principal =======
 def show(graphs_only: bool = False):
@@ -166,205 +274,89 @@ def show(graphs_only: bool = False):
     with f4: num_frota = st.text_input("Nº da Frota (contém)", value="")
     with f5: status_os = st.selectbox("Status OS", ["", "aberta", "em execução", "fechada"], index=0)
 
+    # filtros serializáveis (rankings em blocos e jobs de exportação aplicam no SQL)
+    filtros = {
+        "de": fmt_date_iso(dt_start), "ate": fmt_date_iso(dt_end),
+        "status_os": status_os, "placa": placa, "num_frota": num_frota,
+    }
+
     # --- Carrega + filtros ---
-    df_os, df_man, df_frota = _load_data()
-    df_os, df_man, df_frota = _apply_global_filters(
+    df_os, df_man, df_frota = carregar()
+    df_os, df_man, df_frota = aplicar_filtros(
         df_os, df_man, df_frota,
         (dt_start if dt_start else None, dt_end if dt_end else None),
         status_os, placa, num_frota
     )
 
     # --- KPIs (compactos) ---
+    k = kpis(df_os, df_man, df_frota)
     c1, c2, c3, c4 = st.columns(4)
-    total_os = len(df_os) if not df_os.empty else 0
-    abertas  = int((df_os.get("status","").astype(str).str.lower() == "aberta").sum()) if not df_os.empty else 0
-    execucao = int(df_os.get("status","").astype(str).str.lower().isin(["em execução", "em execucao"]).sum()) if not df_os.empty else 0
-    fechadas = int((df_os.get("status","").astype(str).str.lower() == "fechada").sum()) if not df_os.empty else 0
-    total_man = len(df_man) if not df_man.empty else 0
-    custo_total = float(pd.to_numeric(df_man.get("custo", pd.Series(dtype=float)), errors="coerce").fillna(0).sum()) if not df_man.empty else 0.0
-    frota_total = len(df_frota) if not df_frota.empty else 0
-    ativos = int((df_frota.get("status","").astype(str).str.lower() == "ativo").sum()) if not df_frota.empty else 0
-
     with c1:
-        st.markdown(f'<div class="metric-card"><div class="metric-lbl">OS (total)</div><div class="metric-val">{total_os}</div></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-card"><div class="metric-lbl">OS (total)</div><div class="metric-val">{k["total_os"]}</div></div>', unsafe_allow_html=True)
     with c2:
-        st.markdown(f'<div class="metric-card"><div class="metric-lbl">OS (abertas / exec / fech)</div><div class="metric-val">{abertas} / {execucao} / {fechadas}</div></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-card"><div class="metric-lbl">OS (abertas / exec / fech)</div><div class="metric-val">{k["abertas"]} / {k["execucao"]} / {k["fechadas"]}</div></div>', unsafe_allow_html=True)
     with c3:
-        st.markdown(f'<div class="metric-card"><div class="metric-lbl">Manutenções (total)</div><div class="metric-val">{total_man}</div></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-card"><div class="metric-lbl">Manutenções (total)</div><div class="metric-val">{k["total_man"]}</div></div>', unsafe_allow_html=True)
     with c4:
         st.markdown(
             f'<div class="metric-card"><div class="metric-lbl">Custo total</div>'
-            f'<div class="metric-val">R$ {custo_total:,.2f}</div></div>'.replace(",", "X").replace(".", ",").replace("X","."),
+            f'<div class="metric-val">R$ {k["custo_total"]:,.2f}</div></div>'.replace(",", "X").replace(".", ",").replace("X","."),
             unsafe_allow_html=True
         )
     c5, c6 = st.columns(2)
     with c5:
-        st.markdown(f'<div class="metric-card"><div class="metric-lbl">Frota (total)</div><div class="metric-val">{frota_total}</div></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-card"><div class="metric-lbl">Frota (total)</div><div class="metric-val">{k["frota_total"]}</div></div>', unsafe_allow_html=True)
     with c6:
-        st.markdown(f'<div class="metric-card"><div class="metric-lbl">Veículos ativos</div><div class="metric-val">{ativos}</div></div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-card"><div class="metric-lbl">Veículos ativos</div><div class="metric-val">{k["ativos"]}</div></div>', unsafe_allow_html=True)
 
     st.markdown("---")
 
     # ================== SOMENTE GRÁFICOS (home) ==================
     if graphs_only:
-        g1, g2 = st.columns(2)
-
-        with g1:
-            st.markdown("**OS por Status**")
-            if not df_os.empty and "status" in df_os.columns:
-                os_status = (
-                    df_os["status"].astype(str).str.title().value_counts()
-                    .rename_axis("Status").reset_index(name="Qtd")
-                )
-                st.altair_chart(_bar(os_status, "Status", "Qtd", "", height=260), use_container_width=True)
-            else:
-                st.info("Sem dados de OS para este gráfico.")
-
-        with g2:
-            st.markdown("**Manutenções por Tipo**")
-            if not df_man.empty and "tipo" in df_man.columns:
-                man_tipo = (
-                    df_man["tipo"].astype(str).value_counts()
-                    .rename_axis("Tipo").reset_index(name="Qtd")
-                )
-                st.altair_chart(_bar(man_tipo, "Tipo", "Qtd", "", height=260), use_container_width=True)
-            else:
-                st.info("Sem dados de Manutenções para este gráfico.")
-
-        st.markdown("---")
-        st.markdown("**Top 10 Placas por Custo de Manutenção**")
-        if not df_man.empty and {"placa","custo"}.issubset(df_man.columns):
-            rank = df_man.copy()
-            rank["custo"] = pd.to_numeric(rank["custo"], errors="coerce").fillna(0)
-            top = (
-                rank.groupby("placa", dropna=False)["custo"].sum()
-                    .sort_values(ascending=False).head(10)
-                    .rename_axis("Placa").reset_index(name="Custo Total")
-            )
-            st.altair_chart(_bar(top, "Placa", "Custo Total", "", height=280), use_container_width=True)
-
-            # CSV com valores formatados em R$
-            top_fmt = top.copy()
-            top_fmt["Custo Total"] = top_fmt["Custo Total"].map(lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X","."))
-            _download_csv_button(top_fmt, "⬇️ Exportar CSV (Top Placas por Custo)", "top_placas_custo.csv")
-        else:
-            st.info("Sem dados para ranking de custo.")
+        _sla_cards(filtros)
+        _graficos_panel(df_os, df_man, filtros)
         return  # fim do modo graphs_only
 
     # ================== TABELAS (modo completo) ==================
-    tab_os, tab_man, tab_frota, tab_grafs = st.tabs(["🧾 OS", "🛠️ Manutenções", "🚛 Frota", "📈 Gráficos"])
-
+    tab_os, tab_man, tab_frota, tab_grafs, tab_cubo, tab_anom, tab_jobs = st.tabs(
+        ["🧾 OS", "🛠️ Manutenções", "🚛 Frota", "📈 Gráficos", "🧊 Cubo de custos", "🚨 Anomalias", "📦 Exportações"]
+    )
     # -- OS --
     with tab_os:
-        df = df_os.copy()
-        if not df.empty:
-            df = _fmt_br_date_col(df, ["data_abertura","previsao_saida","data_liberacao"])
-            if "orcamento" in df.columns:
-                df["orcamento"] = pd.to_numeric(df["orcamento"], errors="coerce").fillna(0)
-                df["orcamento"] = df["orcamento"].map(lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X","."))
-
-            if "id" in df.columns: df = df.drop(columns=["id"])
-            friendly = {
-                "num_os":"Nº da OS","num_frota":"Nº da Frota","placa":"Placa",
-                "data_abertura":"Data de Abertura","previsao_saida":"Previsão de Saída","data_liberacao":"Data de Liberação",
-                "modelo":"Modelo","marca":"Marca","ano_fabricacao":"Ano de Fabricação","chassi":"Chassi (VIN)",
-                "descricao":"Descrição do Serviço","prioridade":"Prioridade","sc":"SC (Chamado)","orcamento":"Orçamento",
-                "responsavel":"Responsável","status":"Status",
-            }
-            df = df.rename(columns={k:v for k,v in friendly.items() if k in df.columns})
-            order = ["Nº da OS","Nº da Frota","Placa","Data de Abertura","Previsão de Saída","Data de Liberação",
-                     "Status","Prioridade","Responsável","Modelo","Marca","Ano de Fabricação","Chassi (VIN)","SC (Chamado)","Orçamento","Descrição do Serviço"]
-            exist = [c for c in order if c in df.columns]; other = [c for c in df.columns if c not in exist]
-            df = df[exist + other]
-            _download_csv_button(df, "⬇️ Exportar CSV (OS)", "relatorio_os.csv")
-            st.dataframe(df, use_container_width=True)
+        if not df_os.empty:
+            _export_job_button("os", filtros, "⬇️ Exportar CSV (OS)")
+            st.dataframe(tabela_os(df_os), use_container_width=True)
         else:
             st.info("Sem dados de OS neste filtro.")
 
     # -- Manutenções --
     with tab_man:
-        df = df_man.copy()
-        if not df.empty:
-            df = _fmt_br_date_col(df, ["data"])
-            if "custo" in df.columns:
-                df["custo"] = pd.to_numeric(df["custo"], errors="coerce").fillna(0)
-                df["custo"] = df["custo"].map(lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X","."))
-
-            if "id" in df.columns: df = df.drop(columns=["id"])
-            friendly = {
-                "num_frota":"Nº da Frota","placa":"Placa","tipo":"Tipo",
-                "data":"Data","mes":"Mês (aaaa-mm)","sc":"SC",
-                "cod_peca":"Código Peça","desc_peca":"Descrição",
-                "qtd":"Qtd","vlr_unitario":"Vlr Unitário","fornecedor":"Fornecedor",
-                "nf":"NF.","custo":"Custo",
-                "modelo":"Modelo","marca":"Marca","ano_fabricacao":"Ano de Fabricação","chassi":"Chassi (VIN)",
-            }
-            df = df.rename(columns={k:v for k,v in friendly.items() if k in df.columns})
-
-            # Mês amigável
-            if "Mês (aaaa-mm)" in df.columns:
-                tmp = pd.to_datetime(df["Mês (aaaa-mm)"]+"-01", errors="coerce")
-                df["Mês"] = tmp.dt.strftime("%b/%y").str.lower()
-                df = df.drop(columns=["Mês (aaaa-mm)"])
-
-            order = ["Nº da Frota","Placa","Data","Mês","Tipo","SC","Código Peça","Descrição","Qtd","Vlr Unitário","Custo","Fornecedor","NF.",
-                     "Modelo","Marca","Ano de Fabricação","Chassi (VIN)"]
-            exist = [c for c in order if c in df.columns]; other = [c for c in df.columns if c not in exist]
-            df = df[exist + other]
-            _download_csv_button(df, "⬇️ Exportar CSV (Manutenções)", "relatorio_manutencoes.csv")
-            st.dataframe(df, use_container_width=True)
+        if not df_man.empty:
+            _export_job_button("manutencoes", filtros, "⬇️ Exportar CSV (Manutenções)")
+            st.dataframe(tabela_man(df_man), use_container_width=True)
         else:
             st.info("Sem dados de Manutenções neste filtro.")
 
     # -- Frota --
     with tab_frota:
-        df = df_frota.copy()
-        if not df.empty:
-            if "id" in df.columns: df = df.drop(columns=["id"])
-            friendly = {
-                "num_frota":"Nº da Frota","placa":"Placa","modelo":"Modelo","marca":"Marca",
-                "ano_fabricacao":"Ano de Fabricação","classe_mecanica":"Classe Mecânica",
-                "classe_operacional":"Classe Operacional","chassi":"Chassi (VIN)","status":"Status"
-            }
-            df = df.rename(columns={k:v for k,v in friendly.items() if k in df.columns})
-            order = ["Nº da Frota","Placa","Modelo","Marca","Ano de Fabricação","Classe Mecânica","Classe Operacional","Chassi (VIN)","Status"]
-            exist = [c for c in order if c in df.columns]; other = [c for c in df.columns if c not in exist]
-            df = df[exist + other]
-            _download_csv_button(df, "⬇️ Exportar CSV (Frota)", "relatorio_frota.csv")
-            st.dataframe(df, use_container_width=True)
+        if not df_frota.empty:
+            _export_job_button("frota", filtros, "⬇️ Exportar CSV (Frota)")
+            st.dataframe(tabela_frota(df_frota), use_container_width=True)
         else:
             st.info("Sem dados de Frota neste filtro.")
 
+    # -- Cubo de custos --
+    with tab_cubo:
+        _cubo_panel(dt_start, dt_end)
+
+    # -- Anomalias de custo --
+    with tab_anom:
+        _anomalias_panel(dt_start, dt_end)
+
+    # -- Exportações (jobs em segundo plano) --
+    with tab_jobs:
+        _exportacoes_panel()
+
     # -- Gráficos (modo completo) --
     with tab_grafs:
-        g1, g2 = st.columns(2)
-        with g1:
-            st.markdown("**OS por Status**")
-            if not df_os.empty and "status" in df_os.columns:
-                os_status = df_os["status"].astype(str).str.title().value_counts().rename_axis("Status").reset_index(name="Qtd")
-                st.altair_chart(_bar(os_status, "Status", "Qtd", "", height=260), use_container_width=True)
-            else:
-                st.info("Sem dados de OS para este gráfico.")
-        with g2:
-            st.markdown("**Manutenções por Tipo**")
-            if not df_man.empty and "tipo" in df_man.columns:
-                man_tipo = df_man["tipo"].astype(str).value_counts().rename_axis("Tipo").reset_index(name="Qtd")
-                st.altair_chart(_bar(man_tipo, "Tipo", "Qtd", "", height=260), use_container_width=True)
-            else:
-                st.info("Sem dados de Manutenções para este gráfico.")
-
-        st.markdown("---")
-        st.markdown("**Top 10 Placas por Custo de Manutenção**")
-        if not df_man.empty and {"placa","custo"}.issubset(df_man.columns):
-            rank = df_man.copy()
-            rank["custo"] = pd.to_numeric(rank["custo"], errors="coerce").fillna(0)
-            top = (rank.groupby("placa", dropna=False)["custo"].sum()
-                        .sort_values(ascending=False).head(10)
-                        .rename_axis("Placa").reset_index(name="Custo Total"))
-            st.altair_chart(_bar(top, "Placa", "Custo Total", "", height=280), use_container_width=True)
-
-            top_fmt = top.copy()
-            top_fmt["Custo Total"] = top_fmt["Custo Total"].map(lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X","."))
-            _download_csv_button(top_fmt, "⬇️ Exportar CSV (Top Placas por Custo)", "top_placas_custo.csv")
-        else:
-            st.info("Sem dados para ranking de custo.")
+        _graficos_panel(df_os, df_man, filtros)
@@ -1,174 +1,306 @@
+"""
+Popula um banco SQLite com dados de exemplo.
+
+Sem argumentos mantém o seed de sempre em ./data.db (3 usuários, 30 veículos, 10 OS e
+15 manutenções). Com --escala gera uma frota sintética grande e determinística (mesmo
+--seed => mesmo banco), usada pelos benchmarks:
+
+    escala 1  ->  1.000 veículos,  6.000 OS,   120.000 linhas de manutenção
+    escala 10 -> 10.000 veículos, 60.000 OS, 1.200.000 linhas de manutenção
+
+    python seed_data.py
+    python seed_data.py --db /tmp/bench.db --escala 10 --seed 7
+"""
+import argparse
 import sqlite3
 import hashlib
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import random
 
+# por unidade de escala
+VEICULOS_POR_ESCALA = 1000
+OS_POR_VEICULO = 6
+MANUTENCOES_POR_VEICULO = 120
+
+# data de referência fixa -> datasets com o mesmo seed são idênticos
+DATA_REF = date(2025, 12, 31)
+
+# distribuições (valor, peso)
+TIPOS = (("Peça", 55), ("Serviço", 20), ("Fluido", 12), ("Pneu", 8), ("Outro", 5))
+STATUS_VEICULO = (("ativo", 88), ("manutenção", 7), ("inativo", 5))
+STATUS_OS = (("fechada", 70), ("aberta", 18), ("em execução", 12))
+PRIORIDADES = (("baixa", 25), ("média", 45), ("alta", 22), ("crítica", 8))
+MODELOS = {
+    "VOLVO": ("FH540 6X4T", "FH460 4X2T", "VM 270"),
+    "SCANIA": ("R450 A6X4", "P320 B8X4", "G410"),
+    "MERCEDES-BENZ": ("ACTROS 2651", "ATEGO 2430", "ACCELO 1016"),
+    "VOLKSWAGEN": ("METEOR 28.460", "CONSTELLATION 24.280", "DELIVERY 11.180"),
+    "IVECO": ("S-WAY 540", "TECTOR 240E28"),
+    "FORD": ("CARGO 2429", "RANGER XLS"),
+    "TOYOTA": ("HILUX SR",),
+}
+PESO_MARCAS = (22, 20, 18, 15, 10, 8, 7)
+CLASSES = (  # (classe mecânica, classe operacional, peso)
+    ("CAMINHÃO TRATOR", "CAVALO MECÂNICO", 30),
+    ("CAMINHÃO TRUCK", "CARROCERIA", 20),
+    ("CAMINHÃO TRUCK", "BASCULANTE", 15),
+    ("CAMINHÃO TOCO", "MUNCK", 10),
+    ("PICAPE", "APOIO", 15),
+    ("UTILITÁRIO", "APOIO", 10),
+)
+SERVICOS_OS = ("Revisão preventiva", "Troca de embreagem", "Reparo no sistema de freio",
+               "Alinhamento e balanceamento", "Reparo elétrico", "Troca de pneus",
+               "Reparo na suspensão", "Vazamento de óleo", "Revisão do ar-condicionado")
+DESC_PECAS = {"Peça": ("Catraca de freio", "Lona de freio", "Filtro de ar", "Rolamento", "Disco de embreagem"),
+              "Serviço": ("Mão de obra mecânica", "Serviço de solda", "Retífica", "Diagnóstico eletrônico"),
+              "Fluido": ("Óleo motor 15W40", "Arla 32", "Fluido de freio", "Graxa"),
+              "Pneu": ("Pneu 295/80 R22.5", "Pneu 275/80 R22.5", "Recapagem"),
+              "Outro": ("Lavagem", "Guincho", "Taxa de pedágio")}
+
 # Função para gerar hash SHA-256 da senha
 def hash_password(password):
     return hashlib.sha256(password.encode('utf-8')).hexdigest()
 
-# Conecta/cria o banco
-conn = sqlite3.connect("data.db")
-cur = conn.cursor()
-
 # ===== Criação das tabelas =====
-cur.execute("""
-CREATE TABLE IF NOT EXISTS usuarios (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT NOT NULL UNIQUE,
-    email TEXT NOT NULL,
-    nome TEXT NOT NULL,
-    senha_hash TEXT NOT NULL,
-    role TEXT NOT NULL DEFAULT 'user',
-    active INTEGER NOT NULL DEFAULT 1,
-    created_at TEXT NOT NULL
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS veiculos (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    placa TEXT NOT NULL,
-    modelo TEXT NOT NULL,
-    ano INTEGER,
-    status TEXT NOT NULL DEFAULT 'ativo',
-    criado_em TEXT NOT NULL,
-    num_frota TEXT,
-    marca TEXT,
-    ano_fabricacao TEXT,
-    chassi TEXT,
-    classe_mecanica TEXT,
-    classe_operacional TEXT
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS ordens_servico (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    veiculo_id INTEGER,
-    data_abertura TEXT,
-    num_os TEXT,
-    placa TEXT,
-    descricao TEXT,
-    prioridade TEXT,
-    sc TEXT,
-    orcamento REAL,
-    previsao_saida TEXT,
-    data_liberacao TEXT,
-    responsavel TEXT,
-    status TEXT,
-    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS manutencoes (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    veiculo_id INTEGER,
-    placa TEXT,
-    data TEXT,
-    mes TEXT,
-    sc TEXT,
-    tipo TEXT,
-    cod_peca TEXT,
-    desc_peca TEXT,
-    qtd INTEGER,
-    vlr_unitario REAL,
-    fornecedor TEXT,
-    nf TEXT,
-    vlr_peca REAL,
-    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-)
-""")
-
-# ===== Inserindo usuários =====
-usuarios = [
-    ("admin", "admin@teste.com", "Administrador", hash_password("admin123"), "admin", 1, datetime.now().isoformat()),
-    ("user01", "user01@teste.com", "Usuário 01", hash_password("teste123"), "user", 1, datetime.now().isoformat()),
-    ("user02", "user02@teste.com", "Usuário 02", hash_password("teste123"), "user", 1, datetime.now().isoformat())
-]
-cur.executemany("""
-INSERT INTO usuarios (username, email, nome, senha_hash, role, active, created_at)
-VALUES (?, ?, ?, ?, ?, ?, ?)
-""", usuarios)
-
-# ===== Inserindo 30 veículos =====
-veiculos = []
-for i in range(1, 31):
-    veiculos.append((
-        f"ABC{i:03d}0",
-        f"Modelo {i}",
-        2010 + (i % 13),
-        "ativo",
-        datetime.now().isoformat(),
-        f"FROTA-{i:03d}",
-        f"Marca {i % 5 + 1}",
-        str(2010 + (i % 13)),
-        f"CHASSI{i:05d}",
-        f"Classe Mecânica {i % 3 + 1}",
-        f"Classe Operacional {i % 4 + 1}"
-    ))
-cur.executemany("""
-INSERT INTO veiculos (
-    placa, modelo, ano, status, criado_em, num_frota, marca, ano_fabricacao, chassi, classe_mecanica, classe_operacional
-) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-""", veiculos)
-
-# ===== Inserindo 10 OS de exemplo =====
-ordens = []
-for i in range(1, 11):
-    veiculo_id = random.randint(1, 30)
-    data_abertura = datetime.now() - timedelta(days=random.randint(0, 60))
-    ordens.append((
-        veiculo_id,
-        data_abertura.isoformat(),
-        f"OS-{1000 + i}",
-        f"ABC{veiculo_id:03d}0",
-        f"Reparo geral no veículo {veiculo_id}",
-        random.choice(["Alta", "Média", "Baixa"]),
-        f"SC-{i:03d}",
-        round(random.uniform(500, 5000), 2),
-        (data_abertura + timedelta(days=5)).isoformat(),
-        (data_abertura + timedelta(days=7)).isoformat(),
-        random.choice(["João", "Maria", "Carlos"]),
-        random.choice(["Aberta", "Em execução", "Fechada"])
-    ))
-    
-cur.executemany("""
-INSERT INTO ordens_servico (
-    veiculo_id, data_abertura, num_os, placa, descricao, prioridade, sc, orcamento,
-    previsao_saida, data_liberacao, responsavel, status
-) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-""", ordens)
-
-# ===== Inserindo 15 manutenções de exemplo =====
-manutencoes = []
-for i in range(1, 16):
-    veiculo_id = random.randint(1, 30)
-    data_manut = datetime.now() - timedelta(days=random.randint(0, 180))
-    manutencoes.append((
-        veiculo_id,
-        f"ABC{veiculo_id:03d}0",
-        data_manut.isoformat(),
-        data_manut.strftime("%m/%Y"),
-        f"SC-MAN-{i:03d}",
-        random.choice(["Preventiva", "Corretiva"]),
-        f"PC-{i:04d}",
-        f"Peça exemplo {i}",
-        random.randint(1, 5),
-        round(random.uniform(50, 500), 2),
-        f"Fornecedor {random.randint(1, 5)}",
-        f"NF-{10000 + i}",
-        round(random.uniform(100, 2000), 2)
-    ))
-cur.executemany("""
-INSERT INTO manutencoes (
-    veiculo_id, placa, data, mes, sc, tipo, cod_peca, desc_peca, qtd, vlr_unitario,
-    fornecedor, nf, vlr_peca
-) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-""", manutencoes)
-
-conn.commit()
-conn.close()
-
-print("Banco criado e populado com sucesso!")
+def criar_tabelas(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        email TEXT NOT NULL,
+        nome TEXT NOT NULL,
+        senha_hash TEXT NOT NULL,
+        role TEXT NOT NULL DEFAULT 'user',
+        active INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS veiculos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        placa TEXT NOT NULL,
+        modelo TEXT NOT NULL,
+        ano INTEGER,
+        status TEXT NOT NULL DEFAULT 'ativo',
+        criado_em TEXT NOT NULL,
+        num_frota TEXT,
+        marca TEXT,
+        ano_fabricacao TEXT,
+        chassi TEXT,
+        classe_mecanica TEXT,
+        classe_operacional TEXT
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ordens_servico (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        veiculo_id INTEGER,
+        data_abertura TEXT,
+        num_os TEXT,
+        placa TEXT,
+        descricao TEXT,
+        prioridade TEXT,
+        sc TEXT,
+        orcamento REAL,
+        previsao_saida TEXT,
+        data_liberacao TEXT,
+        responsavel TEXT,
+        status TEXT,
+        FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS manutencoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        veiculo_id INTEGER,
+        placa TEXT,
+        data TEXT,
+        mes TEXT,
+        sc TEXT,
+        tipo TEXT,
+        cod_peca TEXT,
+        desc_peca TEXT,
+        qtd INTEGER,
+        vlr_unitario REAL,
+        fornecedor TEXT,
+        nf TEXT,
+        vlr_peca REAL,
+        FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+    )
+    """)
+
+# ===== Gerador =====
+def _escolher(rnd, opcoes, k):
+    valores = [v for v, _ in opcoes]
+    return rnd.choices(valores, weights=[p for _, p in opcoes], k=k)
+
+def _placa(i: int) -> str:
+    """Placa Mercosul única por índice (AAA0A00)."""
+    letras = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    n = i // 10000
+    pref = letras[(n // 676) % 26] + letras[(n // 26) % 26] + letras[n % 26]
+    return f"{pref}{(i // 1000) % 10}{letras[(i // 100) % 10]}{i % 100:02d}"
+
+def _data_recente(rnd, hoje: date, dias: int) -> date:
+    """Datas mais densas perto de `hoje` (a frota e o volume crescem com o tempo)."""
+    return hoje - timedelta(days=int(rnd.triangular(0, dias, 0)))
+
+def _lotes(it, tamanho=20_000):
+    lote = []
+    for item in it:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def gerar(conn, veiculos=30, ordens=10, manutencoes=15, usuarios=3, seed=None,
+          anos=5, hoje: date = DATA_REF, verbose=False):
+    """
+    Insere `veiculos`, `ordens` (OS), `manutencoes` (linhas de peça/serviço) e `usuarios`
+    com distribuições realistas (tipo, status, fornecedor concentrado em poucos, datas
+    mais densas no período recente). Mesmo `seed` e `hoje` => mesmos dados.
+    """
+    rnd = random.Random(seed)
+    cur = conn.cursor()
+    agora = datetime.combine(hoje, datetime.min.time()).isoformat()
+    dias = 365 * anos
+
+    # --- usuários (admin + comuns)
+    base = [("admin", "admin@teste.com", "Administrador", hash_password("admin123"), "admin", 1, agora)]
+    base += [(f"user{i:02d}", f"user{i:02d}@teste.com", f"Usuário {i:02d}", hash_password("teste123"), "user", 1, agora)
+             for i in range(1, usuarios)]
+    cur.executemany("""
+    INSERT INTO usuarios (username, email, nome, senha_hash, role, active, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, base)
+
+    # --- veículos
+    marcas = list(MODELOS)
+    linhas = []
+    status_v = _escolher(rnd, STATUS_VEICULO, veiculos)
+    for i in range(veiculos):
+        marca = rnd.choices(marcas, weights=PESO_MARCAS)[0]
+        classe_mec, classe_op, _ = rnd.choices(CLASSES, weights=[c[2] for c in CLASSES])[0]
+        ano_fab = rnd.randint(hoje.year - 15, hoje.year)
+        linhas.append((
+            _placa(i), rnd.choice(MODELOS[marca]), min(ano_fab + rnd.randint(0, 1), hoje.year + 1),
+            status_v[i], agora, f"FR-{i + 1:05d}", marca, str(ano_fab),
+            "9" + "".join(rnd.choices("ABCDEFGHJKLMNPRSTUVWXYZ0123456789", k=16)),
+            classe_mec, classe_op,
+        ))
+    cur.executemany("""
+    INSERT INTO veiculos (
+        placa, modelo, ano, status, criado_em, num_frota, marca, ano_fabricacao, chassi, classe_mecanica, classe_operacional
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, linhas)
+    frota = cur.execute("SELECT id, placa FROM veiculos ORDER BY id DESC LIMIT ?", (veiculos,)).fetchall()
+    if verbose:
+        print(f"veículos: {len(frota):,}")
+
+    # fornecedores: poucos concentram a maior parte (Zipf)
+    n_forn = max(5, veiculos // 20)
+    fornecedores = [f"FORNECEDOR {i + 1:03d}" for i in range(n_forn)]
+    peso_forn = [1 / (i + 1) for i in range(n_forn)]
+
+    # catálogo de peças: cada código tem tipo e preço base próprios
+    n_pecas = max(20, min(5000, veiculos * 2))
+    tipos_cat = _escolher(rnd, TIPOS, n_pecas)
+    catalogo = [(f"{rnd.randint(1000, 99999)}-{i:04d}", t, rnd.choice(DESC_PECAS[t]), round(rnd.lognormvariate(4.8, 1.0), 2))
+                for i, t in enumerate(tipos_cat)]
+    peso_cat = [1 / (i + 1) ** 0.6 for i in range(n_pecas)]
+
+    # --- OS
+    def _ordens():
+        for seq in range(ordens):
+            vid, placa = rnd.choice(frota)
+            abertura = _data_recente(rnd, hoje, dias)
+            prazo = rnd.randint(1, 15)
+            status = _escolher(rnd, STATUS_OS, 1)[0]
+            liberacao = None
+            if status == "fechada":
+                # ~35% saem depois da previsão
+                liberacao = abertura + timedelta(days=max(0, int(rnd.expovariate(1 / prazo))))
+            yield (
+                vid, abertura.isoformat(), f"OS-{abertura.year}-{seq + 1:06d}", placa,
+                rnd.choice(SERVICOS_OS), _escolher(rnd, PRIORIDADES, 1)[0],
+                f"SC-{abertura.year}{seq + 1:06d}", round(rnd.lognormvariate(7.5, 0.9), 2),
+                (abertura + timedelta(days=prazo)).isoformat(),
+                liberacao.isoformat() if liberacao else None,
+                rnd.choice(["João", "Maria", "Carlos", "Ana", "Paulo", "Fernanda"]), status,
+            )
+    for lote in _lotes(_ordens()):
+        cur.executemany("""
+        INSERT INTO ordens_servico (
+            veiculo_id, data_abertura, num_os, placa, descricao, prioridade, sc, orcamento,
+            previsao_saida, data_liberacao, responsavel, status
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, lote)
+    if verbose:
+        print(f"OS: {ordens:,}")
+
+    # --- manutenções (linhas de peça/serviço)
+    def _manutencoes():
+        for seq in range(manutencoes):
+            vid, placa = rnd.choice(frota)
+            d = _data_recente(rnd, hoje, dias)
+            cod, tipo, desc, preco = rnd.choices(catalogo, weights=peso_cat)[0]
+            qtd = 1 + int(rnd.expovariate(0.7))
+            unit = preco * rnd.lognormvariate(0, 0.15)
+            if rnd.random() < 0.003:
+                unit *= rnd.uniform(3, 8)   # sobrepreço ocasional (útil p/ detecção de anomalias)
+            unit = round(unit, 2)
+            yield (
+                vid, placa, d.isoformat(), d.strftime("%Y-%m"), f"SC-{d.year}{seq % 500000:06d}",
+                tipo, cod, desc, qtd, unit,
+                rnd.choices(fornecedores, weights=peso_forn)[0], str(rnd.randint(100000, 999999)),
+                round(qtd * unit, 2),
+            )
+    total = 0
+    for lote in _lotes(_manutencoes()):
+        cur.executemany("""
+        INSERT INTO manutencoes (
+            veiculo_id, placa, data, mes, sc, tipo, cod_peca, desc_peca, qtd, vlr_unitario,
+            fornecedor, nf, vlr_peca
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, lote)
+        total += len(lote)
+        if verbose and total % 200_000 < len(lote):
+            print(f"manutenções: {total:,}")
+
+    conn.commit()
+
+def gerar_escala(db_path, escala: float, seed: int = 42, usuarios: int = 3, verbose=False):
+    """Cria (ou completa) `db_path` com a frota sintética na escala pedida."""
+    veiculos = max(1, int(VEICULOS_POR_ESCALA * escala))
+    conn = sqlite3.connect(db_path)
+    try:
+        criar_tabelas(conn.cursor())
+        gerar(conn, veiculos=veiculos, ordens=veiculos * OS_POR_VEICULO,
+              manutencoes=veiculos * MANUTENCOES_POR_VEICULO, usuarios=usuarios,
+              seed=seed, verbose=verbose)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default="data.db")
+    ap.add_argument("--escala", type=float, help="gera frota sintética (1 = 1.000 veículos)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--usuarios", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.escala:
+        gerar_escala(args.db, args.escala, seed=args.seed, usuarios=args.usuarios, verbose=True)
+    else:
+        # seed de exemplo (30 veículos, 10 OS, 15 manutenções) com datas recentes
+        conn = sqlite3.connect(args.db)
+        criar_tabelas(conn.cursor())
+        gerar(conn, veiculos=30, ordens=10, manutencoes=15, usuarios=args.usuarios, hoje=date.today(), anos=1)
+        conn.close()
+
+    print("Banco criado e populado com sucesso!")
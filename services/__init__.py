@@ -0,0 +1,21 @@
+# services/__init__.py
+"""
+Camada de serviço: regras, SQL e formatação de dados, sem Streamlit.
+
+As páginas (modules/) só desenham a tela e chamam estas funções; a API, os jobs, a
+linha de comando e os benchmarks usam as mesmas, sem precisar de um runtime do Streamlit.
+
+    veiculos        cadastro, validação de placa/chassi, listagem e edição da frota
+    ordens_servico  upsert (unitário e em lote) e listagem das OS
+    manutencoes     lançamentos (unitário e em lote) e listagem
+    relatorios      cargas, filtros globais, rankings, tabelas formatadas e CSV
+    usuarios        usuários, senhas e sessões
+    preventiva      planos preventivos, agenda de vencimentos e OS rascunho
+    leituras        hodômetro/horímetro: série temporal, carga em lote, última leitura e uso médio
+"""
+
+class ErroValidacao(ValueError):
+    """Dados recusados pela validação; `erros` traz uma mensagem por problema encontrado."""
+    def __init__(self, erros):
+        self.erros = list(erros)
+        super().__init__(" ".join(self.erros))
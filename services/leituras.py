@@ -0,0 +1,374 @@
+# services/leituras.py
+"""
+Leituras de hodômetro (km) e horímetro (horas) por veículo, como série temporal.
+
+- `leituras`: uma linha por (veiculo_id, ts), WITHOUT ROWID: a chave primária é o índice
+  clusterizado, então as leituras de um veículo ficam contíguas e em ordem de data —
+  "última leitura", "leitura até tal dia" e "janela dos últimos N dias" são uma busca na
+  B-tree, sem índice extra;
+- `leituras_atual`: última leitura de km e de horas de cada veículo, mantida por triggers
+  (a inserção só compara com a atual; exclusão/alteração da leitura atual recalcula a do
+  veículo pela chave). É o que as telas da frota juntam em `veiculos v` (COLUNAS/JUNCAO).
+
+Entrada: `registrar()` (uma leitura, formulário) e `importar()`/`importar_csv()` (CSV,
+dumps de telemetria, API), que grava em lotes de DEFAULT_CHUNK ordenados pela chave, um
+lote por transação. Linhas inválidas não derrubam a carga: voltam contadas, com as
+primeiras mensagens. A mesma (veículo, ts) enviada de novo atualiza a leitura.
+
+Uso:
+    leituras.registrar(12, km=48_350)
+    leituras.importar_csv("telemetria.csv", origem="telemetria")   # placa;data_hora;km;horas
+    leituras.ultima(12), leituras.uso_medio(12)                    # km/dia e horas/dia (90 dias)
+"""
+import csv
+import io
+import os
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from config import DB_PATH
+from db import DEFAULT_CHUNK, get_conn, run_write
+from services import ErroValidacao
+
+TABLE = "leituras"
+ATUAL = "leituras_atual"
+
+_FMT = "%Y-%m-%d %H:%M:%S"
+_FORMATOS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y")
+_MAX_ERROS = 20
+USO_DIAS = 90
+
+# colunas/junção para consultas sobre `veiculos v`
+COLUNAS = "la.km AS km_atual, la.ts_km AS km_em, la.horas AS horas_atual"
+JUNCAO = f"LEFT JOIN {ATUAL} la ON la.veiculo_id = v.id"
+
+def km_ate(veiculo: str, ts: str) -> str:
+    """
+    SQL: km da última leitura de `veiculo` até `ts` (expressões SQL, qualificadas pela
+    tabela: sem prefixo, `veiculo_id` seria o da própria leitura); busca na chave.
+    """
+    return (f"(SELECT l.km FROM {TABLE} l WHERE l.veiculo_id = {veiculo} AND l.ts <= {ts} "
+            f"AND l.km IS NOT NULL ORDER BY l.ts DESC LIMIT 1)")
+
+def km_primeira(veiculo: str) -> str:
+    return f"(SELECT l.km FROM {TABLE} l WHERE l.veiculo_id = {veiculo} AND l.km IS NOT NULL ORDER BY l.ts LIMIT 1)"
+
+def uso_diario(medida: str = "km", atual: str = "la", dias: int = USO_DIAS) -> str:
+    """
+    SQL: uso médio por dia (`km` ou `horas`) na janela de `dias` até a última leitura da
+    linha `atual` de leituras_atual: (atual - mais antiga da janela) / dias entre as duas.
+    NULL sem leitura anterior de pelo menos 1 dia.
+    """
+    ts = f"{atual}.ts_{medida}"
+    return f"""(SELECT ({atual}.{medida} - l.{medida}) / (julianday({ts}) - julianday(l.ts))
+        FROM {TABLE} l
+        WHERE l.veiculo_id = {atual}.veiculo_id AND l.{medida} IS NOT NULL
+          AND l.ts >= datetime({ts}, '-{int(dias)} days') AND l.ts <= datetime({ts}, '-1 day')
+        ORDER BY l.ts LIMIT 1)"""
+
+def _recalcula_atual(p: str) -> str:
+    # só quando a leitura removida/alterada era a atual; sem linha (veículo excluído) é no-op
+    return f"""
+        UPDATE {ATUAL} SET
+            (ts_km, km) = (SELECT ts, km FROM {TABLE}
+                           WHERE veiculo_id = {p}veiculo_id AND km IS NOT NULL ORDER BY ts DESC LIMIT 1),
+            (ts_horas, horas) = (SELECT ts, horas FROM {TABLE}
+                                 WHERE veiculo_id = {p}veiculo_id AND horas IS NOT NULL ORDER BY ts DESC LIMIT 1)
+        WHERE veiculo_id = {p}veiculo_id AND ({p}ts = ts_km OR {p}ts = ts_horas);
+    """
+
+def _soma_atual(p: str) -> str:
+    # nos SET, as colunas sem `excluded.` ainda são as da linha antiga
+    novo_km, novo_h = "excluded.ts_km >= COALESCE(ts_km, '')", "excluded.ts_horas >= COALESCE(ts_horas, '')"
+    return f"""
+        INSERT INTO {ATUAL} (veiculo_id, ts_km, km, ts_horas, horas)
+        SELECT {p}veiculo_id, CASE WHEN {p}km IS NOT NULL THEN {p}ts END, {p}km,
+               CASE WHEN {p}horas IS NOT NULL THEN {p}ts END, {p}horas
+        WHERE {p}km IS NOT NULL OR {p}horas IS NOT NULL
+        ON CONFLICT(veiculo_id) DO UPDATE SET
+            km = CASE WHEN {novo_km} THEN excluded.km ELSE km END,
+            ts_km = CASE WHEN {novo_km} THEN excluded.ts_km ELSE ts_km END,
+            horas = CASE WHEN {novo_h} THEN excluded.horas ELSE horas END,
+            ts_horas = CASE WHEN {novo_h} THEN excluded.ts_horas ELSE ts_horas END;
+    """
+
+_schema_ready: set = set()
+
+def ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        novo = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_leituras_ins';"
+        ).fetchone() is None
+        conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            veiculo_id INTEGER NOT NULL REFERENCES veiculos(id) ON DELETE CASCADE,
+            ts TEXT NOT NULL,                   -- aaaa-mm-dd hh:mm:ss (hora local)
+            km REAL,
+            horas REAL,
+            origem TEXT,                        -- manual / csv / telemetria / api
+            PRIMARY KEY (veiculo_id, ts)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS {ATUAL} (
+            veiculo_id INTEGER PRIMARY KEY,
+            ts_km TEXT, km REAL,
+            ts_horas TEXT, horas REAL
+        );
+
+        CREATE TRIGGER IF NOT EXISTS trg_leituras_ins AFTER INSERT ON {TABLE} BEGIN
+            {_soma_atual("NEW.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_leituras_del AFTER DELETE ON {TABLE} BEGIN
+            {_recalcula_atual("OLD.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_leituras_upd AFTER UPDATE ON {TABLE} BEGIN
+            {_recalcula_atual("OLD.")}
+            {_soma_atual("NEW.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_leituras_veiculo_del AFTER DELETE ON veiculos BEGIN
+            DELETE FROM {ATUAL} WHERE veiculo_id = OLD.id;
+        END;
+        """)
+        if novo:
+            conn.execute(f"DELETE FROM {ATUAL};")
+            _carregar(conn)
+    _schema_ready.add(str(DB_PATH))
+
+def _carregar(conn) -> None:
+    """Preenche leituras_atual a partir de todas as leituras (1ª vez no banco / reconstruir)."""
+    # MAX(ts) com coluna "solta": o SQLite devolve km/horas da própria linha do máximo
+    conn.execute(f"""
+        INSERT INTO {ATUAL} (veiculo_id, ts_km, km)
+        SELECT veiculo_id, MAX(ts), km FROM {TABLE} WHERE km IS NOT NULL GROUP BY veiculo_id;
+    """)
+    conn.execute(f"""
+        INSERT INTO {ATUAL} (veiculo_id, ts_horas, horas)
+        SELECT veiculo_id, MAX(ts), horas FROM {TABLE} WHERE horas IS NOT NULL GROUP BY veiculo_id
+        ON CONFLICT(veiculo_id) DO UPDATE SET ts_horas = excluded.ts_horas, horas = excluded.horas;
+    """)
+
+def reconstruir() -> None:
+    """Refaz leituras_atual (ex.: após carga feita com os triggers desligados)."""
+    ensure_schema()
+    def _tudo(conn):
+        conn.execute(f"DELETE FROM {ATUAL};")
+        _carregar(conn)
+    run_write(_tudo)
+
+# =============== Normalização ===============
+def _ts(v) -> str:
+    """Data/hora da leitura -> 'aaaa-mm-dd hh:mm:ss' local. Aceita ISO 8601 (com fuso), dd/mm/aaaa [hh:mm[:ss]] e epoch."""
+    if isinstance(v, datetime):
+        dt = v
+    elif isinstance(v, date):
+        dt = datetime(v.year, v.month, v.day)
+    elif isinstance(v, (int, float)) and not isinstance(v, bool):
+        dt = datetime.fromtimestamp(v)
+    else:
+        s = str(v or "").strip()
+        if not s:
+            raise ValueError("data/hora vazia")
+        if s.isdigit() and len(s) >= 9:
+            dt = datetime.fromtimestamp(int(s))
+        else:
+            try:
+                dt = datetime.fromisoformat(s)
+            except ValueError:
+                for fmt in _FORMATOS:
+                    try:
+                        dt = datetime.strptime(s, fmt)
+                        break
+                    except ValueError:
+                        pass
+                else:
+                    raise ValueError(f"data/hora inválida: {s!r}") from None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt.strftime(_FMT)
+
+def _num(v, nome: str) -> Optional[float]:
+    if v is None or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, (int, float)):
+        n = float(v)
+    else:
+        s = str(v).strip().replace(",", ".")
+        if not s:
+            return None
+        try:
+            n = float(s)
+        except ValueError:
+            raise ValueError(f"{nome} inválido: {v!r}") from None
+    if n < 0:
+        raise ValueError(f"{nome} negativo")
+    return n
+
+def _placa(p) -> str:
+    return str(p or "").strip().upper().replace("-", "").replace(" ", "")
+
+def _linha(row: dict, por_placa: dict, ids: set, origem: str, limite_ts: str) -> tuple:
+    """Linha recebida -> (veiculo_id, ts, km, horas, origem); ValueError com o motivo."""
+    vid = row.get("veiculo_id")
+    if vid not in (None, ""):
+        try:
+            vid = int(vid)
+        except (TypeError, ValueError):
+            raise ValueError(f"veiculo_id inválido: {vid!r}") from None
+        if vid not in ids:
+            raise ValueError(f"veiculo_id {vid} não cadastrado")
+    else:
+        placa = _placa(row.get("placa"))
+        if not placa:
+            raise ValueError("sem placa/veiculo_id")
+        if placa not in por_placa:
+            raise ValueError(f"placa {placa} não cadastrada")
+        vid = por_placa[placa]
+    ts = _ts(row.get("ts"))
+    if ts > limite_ts:
+        raise ValueError(f"data/hora no futuro: {ts}")
+    km, horas = _num(row.get("km"), "km"), _num(row.get("horas"), "horas")
+    if km is None and horas is None:
+        raise ValueError("sem km/horas")
+    return vid, ts, km, horas, origem
+
+_UPSERT = f"""
+    INSERT INTO {TABLE} (veiculo_id, ts, km, horas, origem) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(veiculo_id, ts) DO UPDATE SET
+        km = COALESCE(excluded.km, km), horas = COALESCE(excluded.horas, horas), origem = excluded.origem
+"""
+
+def _limite_ts() -> str:
+    # tolerância para relógio adiantado do rastreador
+    return (datetime.now() + timedelta(days=1)).strftime(_FMT)
+
+# =============== Gravação ===============
+def registrar(veiculo_id: int, km=None, horas=None, ts=None, origem: str = "manual") -> None:
+    """
+    Grava uma leitura (ts padrão: agora). ErroValidacao para dados inválidos e para km
+    menor que o da leitura anterior (provável erro de digitação).
+    """
+    ensure_schema()
+    try:
+        vid, ts, km, horas, origem = _linha(
+            {"veiculo_id": veiculo_id, "ts": ts or datetime.now(), "km": km, "horas": horas},
+            {}, {int(veiculo_id)}, origem, _limite_ts(),
+        )
+    except ValueError as e:
+        raise ErroValidacao([f"Leitura inválida: {e}."]) from None
+
+    def _tx(conn):
+        if km is not None:
+            ant = conn.execute(
+                f"SELECT ts, km FROM {TABLE} WHERE veiculo_id = ? AND ts < ? AND km IS NOT NULL ORDER BY ts DESC LIMIT 1",
+                (vid, ts),
+            ).fetchone()
+            if ant and km < ant[1]:
+                raise ErroValidacao([f"Km {km:,.0f} menor que o da leitura de ".replace(",", ".")
+                                      + f"{datetime.fromisoformat(ant[0]):%d/%m/%Y} ({ant[1]:,.0f}).".replace(",", ".")])
+        conn.execute(_UPSERT, (vid, ts, km, horas, origem))
+
+    run_write(_tx)
+
+def importar(linhas: Iterable[dict], origem: str = "importação", conn=None, *,
+             lote: int = DEFAULT_CHUNK, inicio: int = 1) -> dict:
+    """
+    Carga em massa: `linhas` com placa ou veiculo_id, ts, km e/ou horas (gerador ok; só um
+    lote fica em memória). Cada lote vai ordenado por (veículo, ts) numa transação própria.
+    Retorna {"gravadas", "rejeitadas", "erros"} (erros: as primeiras mensagens, com o nº
+    da linha contado a partir de `inicio`).
+    """
+    ensure_schema()
+    with get_conn() as c:
+        veics = c.execute("SELECT id, placa FROM veiculos").fetchall()
+    ids = {r[0] for r in veics}
+    por_placa = {_placa(r[1]): r[0] for r in veics if r[1]}
+    limite_ts = _limite_ts()
+
+    gravadas, rejeitadas, erros, buf = 0, 0, [], []
+    def _flush(buf):
+        buf.sort(key=lambda r: (r[0], r[1]))
+        run_write(lambda c: c.executemany(_UPSERT, buf), conn)
+        return len(buf)
+
+    for n, row in enumerate(linhas, start=inicio):
+        try:
+            buf.append(_linha(row, por_placa, ids, origem, limite_ts))
+        except ValueError as e:
+            rejeitadas += 1
+            if len(erros) < _MAX_ERROS:
+                erros.append(f"linha {n}: {e}")
+            continue
+        if len(buf) >= lote:
+            gravadas += _flush(buf)
+            buf = []
+    if buf:
+        gravadas += _flush(buf)
+    return {"gravadas": gravadas, "rejeitadas": rejeitadas, "erros": erros}
+
+# cabeçalho do CSV (minúsculo, sem acento) -> campo
+_CABECALHOS = {
+    "veiculo_id": "veiculo_id", "placa": "placa",
+    "ts": "ts", "data_hora": "ts", "datahora": "ts", "data": "ts", "timestamp": "ts",
+    "km": "km", "hodometro": "km", "odometro": "km",
+    "horas": "horas", "horimetro": "horas",
+}
+
+def _cabecalho(c: str) -> str:
+    c = unicodedata.normalize("NFKD", str(c or "")).encode("ascii", "ignore").decode().strip().lower()
+    c = c.replace(" ", "_")
+    return _CABECALHOS.get(c, c)
+
+def importar_csv(arquivo, origem: str = "csv", conn=None) -> dict:
+    """
+    importar() de um CSV (caminho ou arquivo aberto, texto ou bytes; `;`, `,` ou tab).
+    Cabeçalhos aceitos: placa|veiculo_id, data_hora|data|ts|timestamp, km|hodometro,
+    horas|horimetro. Lido linha a linha.
+    """
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, "rb") as f:
+            return importar_csv(f, origem, conn)
+    if isinstance(arquivo.read(0), bytes):
+        arquivo = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    primeira = arquivo.readline()
+    if not primeira.strip():
+        return {"gravadas": 0, "rejeitadas": 0, "erros": []}
+    delim = max(";,\t", key=primeira.count)
+    campos = [_cabecalho(c) for c in next(csv.reader([primeira], delimiter=delim))]
+    if "ts" not in campos or not {"placa", "veiculo_id"} & set(campos) or not {"km", "horas"} & set(campos):
+        raise ErroValidacao(["O CSV precisa das colunas placa (ou veiculo_id), data_hora e km (ou horas)."])
+    linhas = csv.DictReader(arquivo, fieldnames=campos, delimiter=delim)
+    return importar(linhas, origem, conn, inicio=2)
+
+# =============== Consultas ===============
+def ultima(veiculo_id: int) -> Optional[dict]:
+    """{"km", "km_em", "horas", "horas_em"} da última leitura do veículo (None sem leituras)."""
+    ensure_schema()
+    with get_conn("dict") as conn:
+        return conn.execute(
+            f"SELECT km, ts_km AS km_em, horas, ts_horas AS horas_em FROM {ATUAL} WHERE veiculo_id = ?",
+            (veiculo_id,),
+        ).fetchone()
+
+def uso_medio(veiculo_id: int, dias: int = USO_DIAS) -> dict:
+    """{"km_dia", "horas_dia"} na janela de `dias` até a última leitura (None sem histórico)."""
+    ensure_schema()
+    with get_conn("dict") as conn:
+        row = conn.execute(
+            f"SELECT {uso_diario('km', 'la', dias)} AS km_dia, {uso_diario('horas', 'la', dias)} AS horas_dia "
+            f"FROM {ATUAL} la WHERE la.veiculo_id = ?",
+            (veiculo_id,),
+        ).fetchone()
+    return row or {"km_dia": None, "horas_dia": None}
+
+def historico(veiculo_id: int, desde: Optional[date] = None, limite: int = 500) -> pd.DataFrame:
+    """Leituras do veículo, mais recentes primeiro (a partir de `desde`, se dado)."""
+    ensure_schema()
+    with get_conn() as conn:
+        return pd.read_sql(
+            f"SELECT ts, km, horas, origem FROM {TABLE} WHERE veiculo_id = ? AND ts >= ? ORDER BY ts DESC LIMIT ?",
+            conn, params=(veiculo_id, desde.isoformat() if desde else "", limite),
+        )
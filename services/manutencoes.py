@@ -0,0 +1,165 @@
+# services/manutencoes.py
+"""
+Lançamentos de manutenção: inserção (formulário e lote da API, tudo ou nada) e listagem
+com os dados do veículo, filtros e formatação da aba de listagem.
+"""
+from datetime import date, datetime
+
+import pandas as pd
+
+from db import get_read_conn, run_write
+from helpers import clean_placa, to_date, to_float
+from instrumentation import phase
+
+TABLE = "manutencoes"
+
+# colunas gravadas pelo formulário / API
+MAN_COLS = ("veiculo_id", "placa", "data", "mes", "sc", "tipo", "cod_peca", "desc_peca", "qtd",
+            "vlr_unitario", "fornecedor", "nf", "vlr_peca")
+
+TIPOS = ["Peça", "Serviço", "Fluido", "Pneu", "Outro"]
+
+def _iso(d):
+    if isinstance(d, date): return d.strftime("%Y-%m-%d")
+    if isinstance(d, datetime): return d.date().strftime("%Y-%m-%d")
+    return str(d) if d else None
+
+def money_fmt(v: float | int | None) -> str:
+    try:
+        v = float(v)
+    except Exception:
+        return ""
+    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X",".")
+
+# =============== Persistência ===============
+def _normalize_man_row(row: dict) -> dict:
+    """Linha recebida (form/API) -> payload: datas, valores com vírgula, textos em maiúsculas, mes e vlr_peca."""
+    def txt(k, upper=False):
+        v = row.get(k)
+        if v is None or (not isinstance(v, str) and pd.isna(v)):
+            return None
+        v = str(v).strip()
+        return (v.upper() if upper else v) or None
+    out = {
+        "placa": clean_placa(row.get("placa")),
+        "data": to_date(row.get("data")) if row.get("data") else None,
+        "sc": txt("sc", True), "tipo": txt("tipo"), "cod_peca": txt("cod_peca", True),
+        "desc_peca": txt("desc_peca"), "fornecedor": txt("fornecedor", True), "nf": txt("nf", True),
+        "qtd": int(to_float(row.get("qtd"))) if to_float(row.get("qtd")) is not None else None,
+        "vlr_unitario": to_float(row.get("vlr_unitario")),
+    }
+    if row.get("veiculo_id") not in (None, ""):
+        out["veiculo_id"] = int(row["veiculo_id"])
+    out["mes"] = out["data"][:7] if out["data"] else txt("mes")
+    vlr = to_float(row.get("vlr_peca")) if row.get("vlr_peca") is not None else None
+    if vlr is None and out["qtd"] is not None and out["vlr_unitario"] is not None:
+        vlr = out["qtd"] * out["vlr_unitario"]
+    out["vlr_peca"] = vlr
+    return out
+
+def inserir_manutencoes(rows, conn=None) -> list[int]:
+    """
+    Insere vários lançamentos numa única transação (tudo ou nada). Sem veiculo_id, resolve
+    pela placa; linha sem veículo encontrado -> ValueError. Retorna os ids na ordem das linhas.
+    """
+    payloads = [_normalize_man_row(dict(r)) for r in rows]
+
+    def _tx(conn):
+        placas = sorted({p["placa"] for p in payloads if p.get("placa") and "veiculo_id" not in p})
+        por_placa = {}
+        for i in range(0, len(placas), 500):
+            lote = placas[i:i + 500]
+            por_placa.update(conn.execute(
+                f"SELECT placa, id FROM veiculos WHERE placa IN ({', '.join('?' * len(lote))})", lote
+            ).fetchall())
+        sem_veiculo = []
+        for i, p in enumerate(payloads):
+            if "veiculo_id" not in p:
+                if p.get("placa") not in por_placa:
+                    sem_veiculo.append(i + 1)
+                    continue
+                p["veiculo_id"] = por_placa[p["placa"]]
+        if sem_veiculo:
+            raise ValueError(f"Linhas sem veículo cadastrado (placa/veiculo_id): {sem_veiculo[:10]}")
+        sql = f"INSERT INTO {TABLE} ({', '.join(MAN_COLS)}) VALUES ({', '.join('?' * len(MAN_COLS))}) RETURNING id"
+        return [conn.execute(sql, [p.get(c) for c in MAN_COLS]).fetchone()[0] for p in payloads]
+
+    return run_write(_tx, conn)
+
+# =============== Listagem ===============
+@phase("manutencao.listar")
+def listar_manutencoes(filtros: dict = None) -> pd.DataFrame:
+    """
+    Manutenções com dados do veículo, mais recentes primeiro. filtros: num_frota/placa/sc/
+    fornecedor (contém), tipo (igual), mes ("jun/25"), data (exata); vazios não filtram.
+    """
+    with get_read_conn() as conn:
+        df = pd.read_sql("""
+            SELECT
+                m.id,
+                m.veiculo_id,
+                v.num_frota,
+                m.placa,
+                v.modelo,
+                v.marca,
+                v.ano_fabricacao,
+                v.chassi,
+                m.data,
+                m.mes,
+                m.sc,
+                m.tipo,
+                m.cod_peca,
+                m.desc_peca,
+                m.qtd,
+                m.vlr_unitario,
+                m.fornecedor,
+                m.nf,
+                m.vlr_peca
+            FROM manutencoes m
+            LEFT JOIN veiculos v ON v.id = m.veiculo_id
+            ORDER BY COALESCE(m.data, '') DESC, m.id DESC
+        """, conn)
+    f = filtros or {}
+    if df.empty:
+        return df
+    for col in ("num_frota", "placa", "sc", "fornecedor"):
+        if f.get(col): df = df[df[col].astype(str).str.contains(f[col], case=False, na=False)]
+    if f.get("tipo"): df = df[df["tipo"] == f["tipo"]]
+    if f.get("mes"):
+        ym = pd.to_datetime("01/" + f["mes"], format="%d/%b/%y", errors="coerce")
+        if pd.notna(ym):
+            df = df[df["mes"] == ym.strftime("%Y-%m")]
+    if f.get("data") is not None:
+        df = df[df["data"] == _iso(f["data"])]
+    return df
+
+_FRIENDLY = {
+    "num_frota":"Nº da Frota", "placa":"Placa", "modelo":"Modelo", "marca":"Marca",
+    "ano_fabricacao":"Ano de Fabricação", "chassi":"Chassi (VIN)",
+    "data":"Data", "mes":"Mês (aaaa-mm)", "sc":"SC",
+    "tipo":"Tipo", "cod_peca":"Código Peça", "desc_peca":"Descrição",
+    "qtd":"Qtd", "vlr_unitario":"Vlr Unitário", "fornecedor":"Fornecedor",
+    "nf":"NF.", "vlr_peca":"Vlr Total",
+}
+_ORDEM = ["Nº da Frota","Placa","Modelo","Marca","Ano de Fabricação","Chassi (VIN)",
+          "Data","Mês","SC","Tipo","Código Peça","Descrição","Qtd","Vlr Unitário","Fornecedor","NF.","Vlr Total"]
+
+def formatar_listagem(df: pd.DataFrame) -> pd.DataFrame:
+    """Rótulos da tela, data dd/mm/aaaa, mês "jun/25", valores em R$ e colunas na ordem da listagem."""
+    df = df.rename(columns={k:v for k,v in _FRIENDLY.items() if k in df.columns})
+
+    if "Data" in df.columns:
+        df["Data"] = pd.to_datetime(df["Data"], errors="coerce").dt.strftime("%d/%m/%Y").fillna(df["Data"])
+
+    if "Mês (aaaa-mm)" in df.columns:
+        tmp = pd.to_datetime(df["Mês (aaaa-mm)"]+"-01", errors="coerce")
+        df["Mês"] = tmp.dt.strftime("%b/%y").str.lower()
+        df = df.drop(columns=["Mês (aaaa-mm)"])
+
+    for c in ("Vlr Unitário", "Vlr Total"):
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").map(money_fmt)
+
+    exist = [c for c in _ORDEM if c in df.columns]
+    other = [c for c in df.columns if c not in exist]
+    return df[exist + other]
@@ -0,0 +1,177 @@
+# services/ordens_servico.py
+"""
+Ordens de serviço: upsert por num_os (formulário, planilha, API) e listagem com os dados
+do veículo, filtros e formatação da aba de listagem.
+"""
+from datetime import date, datetime
+
+import pandas as pd
+
+from db import get_read_conn, run_write
+from helpers import clean_placa, to_date, to_float
+from instrumentation import phase
+from services import ErroValidacao
+
+TABLE = "ordens_servico"
+
+# colunas gravadas pelo formulário / importação em lote
+OS_COLS = ("data_abertura", "num_os", "veiculo_id", "placa", "descricao", "prioridade", "sc",
+           "orcamento", "previsao_saida", "data_liberacao", "responsavel", "status")
+
+# rascunho: OS gerada pela preventiva, ainda não aberta (fora das contagens de OS abertas)
+STATUS = ["aberta", "em execução", "fechada", "rascunho"]
+PRIORIDADES = ["baixa", "média", "alta", "crítica"]
+
+def _iso(d):
+    if isinstance(d, date): return d.strftime("%Y-%m-%d")
+    if isinstance(d, datetime): return d.date().strftime("%Y-%m-%d")
+    return str(d) if d else None
+
+# --------- Persistência (UPSERT atômico por num_os) ----------
+def _upsert_sql(cols) -> str:
+    sets = ", ".join(f"{c}=excluded.{c}" for c in cols if c != "num_os")
+    return f"""
+        INSERT INTO {TABLE} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})
+        ON CONFLICT(num_os) DO UPDATE SET {sets}
+        RETURNING id
+    """
+
+def _upsert_one(conn, payload: dict) -> int:
+    cols = [c for c in OS_COLS if c in payload]
+    return conn.execute(_upsert_sql(cols), [payload[c] for c in cols]).fetchone()[0]
+
+def upsert_os(payload: dict) -> int:
+    """
+    Cria ou atualiza a OS (formulário) pelo num_os num único comando/transação. Exige
+    num_os e descrição (ErroValidacao). Retorna o id.
+    """
+    erros = []
+    if not payload.get("num_os"):
+        erros.append("Informe o Nº da OS.")
+    if not (payload.get("descricao") or "").strip():
+        erros.append("Informe a Descrição do Serviço.")
+    if erros:
+        raise ErroValidacao(erros)
+    payload = {**payload, "data_abertura": _iso(payload.get("data_abertura")),
+               "previsao_saida": _iso(payload.get("previsao_saida")),
+               "data_liberacao": _iso(payload.get("data_liberacao"))}
+    return run_write(lambda conn: _upsert_one(conn, payload))
+
+def _normalize_os_row(row: dict) -> dict:
+    """Linha de planilha -> payload (datas dd/mm/aaaa, valores com vírgula, placa em maiúsculas)."""
+    def txt(k):
+        v = row.get(k)
+        return None if v is None or pd.isna(v) else str(v).strip()
+    out = {
+        "num_os": (txt("num_os") or "").upper() or None,
+        "placa": clean_placa(row.get("placa")),
+        "descricao": txt("descricao"),
+        "prioridade": (txt("prioridade") or "").lower() or None,
+        "sc": (txt("sc") or "").upper() or None,
+        "orcamento": to_float(row.get("orcamento")),
+        "responsavel": txt("responsavel"),
+        "status": (txt("status") or "aberta").lower(),
+    }
+    for k in ("data_abertura", "previsao_saida", "data_liberacao"):
+        out[k] = to_date(row.get(k))
+    if row.get("veiculo_id") is not None and not pd.isna(row.get("veiculo_id")):
+        out["veiculo_id"] = int(row["veiculo_id"])
+    # só grava o que veio na planilha (não apaga colunas ausentes numa atualização)
+    return {k: v for k, v in out.items() if k in row}
+
+def upsert_os_lote(rows, conn=None) -> list[int]:
+    """
+    UPSERT de várias OS (ex.: planilha do planejamento, `df.to_dict("records")`) numa
+    única transação: ou entram todas, ou nenhuma. Sem veiculo_id, resolve pela placa.
+    Retorna os ids na mesma ordem das linhas.
+    """
+    payloads = [_normalize_os_row(dict(r)) for r in rows]
+    faltando = [i + 1 for i, p in enumerate(payloads) if not p.get("num_os")]
+    if faltando:
+        raise ValueError(f"Linhas sem num_os: {faltando[:10]}")
+
+    def _tx(conn):
+        placas = sorted({p["placa"] for p in payloads if p.get("placa") and "veiculo_id" not in p})
+        por_placa = {}
+        for i in range(0, len(placas), 500):
+            lote = placas[i:i + 500]
+            por_placa.update(conn.execute(
+                f"SELECT placa, id FROM veiculos WHERE placa IN ({', '.join('?' * len(lote))})", lote
+            ).fetchall())
+        ids = []
+        for p in payloads:
+            if "veiculo_id" not in p and p.get("placa") in por_placa:
+                p["veiculo_id"] = por_placa[p["placa"]]
+            ids.append(_upsert_one(conn, p))
+        return ids
+
+    return run_write(_tx, conn)
+
+# --------- Listagem ----------
+@phase("abertura_os.listar")
+def listar_os(filtros: dict = None) -> pd.DataFrame:
+    """
+    OS com dados do veículo, mais recentes primeiro. filtros: num_frota/num_os/placa
+    (contém), data_abertura (exata), status/prioridade (igual); vazios não filtram.
+    """
+    with get_read_conn() as conn:
+        df = pd.read_sql("""
+            SELECT
+                os.id,
+                os.data_abertura,
+                os.num_os,
+                v.num_frota,
+                os.placa,
+                v.modelo,
+                v.marca,
+                v.ano_fabricacao,
+                v.chassi,
+                os.descricao,
+                os.prioridade,
+                os.sc,
+                os.orcamento,
+                os.previsao_saida,
+                os.data_liberacao,
+                os.responsavel,
+                os.status
+            FROM ordens_servico os
+            LEFT JOIN veiculos v ON v.id = os.veiculo_id
+            ORDER BY COALESCE(os.data_abertura,'' ) DESC, os.id DESC
+        """, conn)
+    f = filtros or {}
+    if df.empty:
+        return df
+    for col in ("num_frota", "num_os", "placa"):
+        if f.get(col): df = df[df[col].astype(str).str.contains(f[col], case=False, na=False)]
+    if f.get("data_abertura"): df = df[df["data_abertura"] == _iso(f["data_abertura"])]
+    for col in ("status", "prioridade"):
+        if f.get(col): df = df[df[col].astype(str).str.lower() == f[col]]
+    return df
+
+_FRIENDLY = {
+    "data_abertura":"Data Abertura","num_os":"Nº da OS","num_frota":"Nº da Frota","placa":"Placa",
+    "modelo":"Modelo","marca":"Marca","ano_fabricacao":"Ano de Fabricação","chassi":"Chassi (VIN)",
+    "descricao":"Descrição Serviço","prioridade":"Prioridade","sc":"SC","orcamento":"Orçamento R$",
+    "previsao_saida":"Previsão Saída","data_liberacao":"Data Liberação","responsavel":"Responsável",
+    "status":"Status",
+}
+_ORDEM = ["Data Abertura","Nº da OS","Nº da Frota","Placa","Modelo","Marca","Ano de Fabricação","Chassi (VIN)",
+          "Descrição Serviço","Prioridade","SC","Orçamento R$","Previsão Saída","Data Liberação","Responsável","Status"]
+
+def formatar_listagem(df: pd.DataFrame) -> pd.DataFrame:
+    """Rótulos da tela, datas dd/mm/aaaa, orçamento em R$ e colunas na ordem da listagem."""
+    df = df.rename(columns={k:v for k,v in _FRIENDLY.items() if k in df.columns})
+
+    def _fmt_br(s): return pd.to_datetime(s, errors="coerce").dt.strftime("%d/%m/%Y").fillna(s)
+    for c in ["Data Abertura","Previsão Saída","Data Liberação"]:
+        if c in df.columns: df[c] = _fmt_br(df[c])
+
+    if "Orçamento R$" in df.columns:
+        df["Orçamento R$"] = pd.to_numeric(df["Orçamento R$"], errors="coerce").fillna(0)
+        df["Orçamento R$"] = df["Orçamento R$"].map(lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X","."))
+
+    if "Data Abertura" in df.columns:
+        df = df.sort_values("Data Abertura", ascending=False, key=lambda s: pd.to_datetime(s, dayfirst=True, errors="coerce"))
+
+    exist = [c for c in _ORDEM if c in df.columns]; other = [c for c in df.columns if c not in exist]
+    return df[exist + other]
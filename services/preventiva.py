@@ -0,0 +1,389 @@
+# services/preventiva.py
+"""
+Manutenção preventiva: planos por classe mecânica/modelo (a cada N dias ou N km), agenda
+de vencimentos por plano × veículo e geração de OS "rascunho".
+
+- `planos_preventiva`: o plano vale para os veículos ativos da classe/modelo (vazio = todos)
+  e é cumprido por um lançamento de manutenção do mesmo tipo/descrição ou pela liberação de
+  uma OS gerada por ele;
+- `preventiva_agenda`: última execução e vencimento de cada plano × veículo. O índice por
+  vencimento é a fila de prioridade: "próximos a vencer" lê o começo da B-tree, sem varrer
+  a frota;
+- planos por km usam as leituras de hodômetro (services.leituras): km na última execução
+  (leitura até aquele dia) + intervalo = km de vencimento; a data estimada sai do uso
+  médio diário. Vence o que chegar primeiro, data ou km estimado;
+- triggers em manutencoes, ordens_servico (só OS da preventiva), veiculos e leituras (só
+  com plano por km ativo) anotam o veículo em `preventiva_pendentes`; `atualizar()` recalcula só a agenda desses veículos. Criar ou
+  editar um plano recalcula só as linhas daquele plano.
+
+Plano por km sem leitura do veículo fica fora da agenda até a 1ª leitura.
+
+Uso:
+    preventiva.criar_plano({"nome": "Troca de óleo", "classe_mecanica": "PESADO", "intervalo_dias": 90,
+                            "tipo": "Fluido", "termo": "óleo"})
+    preventiva.vencimentos(ate=date.today() + timedelta(days=30))
+    preventiva.gerar_rascunhos()     # OS "rascunho" para o que vence dentro da antecedência
+"""
+import math
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+
+from config import DB_PATH
+from db import get_conn, run_write
+from services import ErroValidacao, leituras
+
+PLANOS = "planos_preventiva"
+AGENDA = "preventiva_agenda"
+PENDENTES = "preventiva_pendentes"
+OS_PLANO = "preventiva_os"
+
+PLANO_COLS = ("nome", "classe_mecanica", "modelo", "intervalo_dias", "intervalo_km", "tipo", "termo",
+              "antecedencia_dias", "ativo")
+
+# plano `p` x veículo `v`: última execução (lançamento que casa com o plano ou OS do plano liberada)
+_ULTIMA = f"""(SELECT MAX(d) FROM (
+    SELECT date(m.data) AS d FROM manutencoes m
+    WHERE m.veiculo_id = v.id AND (p.tipo IS NULL OR m.tipo = p.tipo)
+      AND (p.termo IS NULL OR m.desc_peca LIKE '%' || p.termo || '%')
+    UNION ALL
+    SELECT date(o.data_liberacao) FROM {OS_PLANO} po JOIN ordens_servico o ON o.id = po.os_id
+    WHERE po.plano_id = p.id AND po.veiculo_id = v.id
+))"""
+# OS do plano ainda em andamento (rascunho ou aberta) para o veículo
+_OS_ATIVA = f"""(SELECT MAX(po.os_id) FROM {OS_PLANO} po JOIN ordens_servico o ON o.id = po.os_id
+    WHERE po.plano_id = p.id AND po.veiculo_id = v.id
+      AND o.data_liberacao IS NULL AND LOWER(COALESCE(o.status, '')) <> 'fechada')"""
+
+# agenda dos pares plano × veículo que passam em {filtro}: vencimento por data, por km
+# (estimado pelo uso médio; sem uso, só quando o km já passou) ou o que vier primeiro.
+# Os CTEs são MATERIALIZED: achatados, o SQLite repetiria as subconsultas correlacionadas
+# (última execução, leituras) a cada uso das colunas nos níveis de cima.
+_KM_BASE = f"""COALESCE({leituras.km_ate("par.veiculo_id", "COALESCE(par.ultima, par.criado_em) || ' 23:59:59'")},
+                         {leituras.km_primeira("par.veiculo_id")})"""
+_RECALCULO = f"""
+    WITH par AS MATERIALIZED (
+        SELECT p.id AS plano_id, v.id AS veiculo_id, p.criado_em, p.intervalo_dias, p.intervalo_km,
+               {_ULTIMA} AS ultima, {_OS_ATIVA} AS os_id
+        FROM {PLANOS} p
+        JOIN veiculos v ON (p.classe_mecanica IS NULL OR v.classe_mecanica = p.classe_mecanica)
+                       AND (p.modelo IS NULL OR v.modelo = p.modelo)
+                       AND LOWER(COALESCE(v.status, 'ativo')) = 'ativo'
+        WHERE p.ativo = 1 AND {{filtro}}
+    ), km AS MATERIALIZED (
+        SELECT par.*, date(COALESCE(ultima, criado_em), '+' || intervalo_dias || ' days') AS vence_data,
+               CASE WHEN intervalo_km IS NOT NULL THEN {_KM_BASE} END AS km_base,
+               la.km AS km_atual, la.ts_km,
+               CASE WHEN intervalo_km IS NOT NULL THEN {leituras.uso_diario("km", "la")} END AS uso
+        FROM par LEFT JOIN {leituras.ATUAL} la ON la.veiculo_id = par.veiculo_id
+    )
+    INSERT INTO {AGENDA} (plano_id, veiculo_id, ultima_execucao, vence_em, os_id, km_base, vence_km)
+    SELECT plano_id, veiculo_id, ultima, MIN(COALESCE(vence_data, vence_por_km), COALESCE(vence_por_km, vence_data)),
+           os_id, km_base, vence_km
+    FROM (
+        SELECT *, CASE
+                WHEN uso > 0 THEN date(ts_km, printf('%+d days',
+                                  MIN(CAST(ROUND((vence_km - km_atual) / uso) AS INTEGER), 3650)))
+                WHEN km_atual >= vence_km THEN date(ts_km)
+            END AS vence_por_km
+        FROM (SELECT *, km_base + intervalo_km AS vence_km FROM km)
+    )
+    WHERE COALESCE(vence_data, vence_por_km) IS NOT NULL
+"""
+
+_schema_ready: set = set()
+
+def ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    leituras.ensure_schema()
+    com_km = f"EXISTS (SELECT 1 FROM {PLANOS} WHERE intervalo_km IS NOT NULL AND ativo = 1)"
+    with get_conn() as conn:
+        conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {PLANOS} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            classe_mecanica TEXT,               -- NULL = qualquer
+            modelo TEXT,                        -- NULL = qualquer
+            intervalo_dias INTEGER,
+            intervalo_km REAL,
+            tipo TEXT,                          -- manutencoes.tipo que cumpre o plano (NULL = qualquer)
+            termo TEXT,                         -- trecho de manutencoes.desc_peca (NULL = qualquer)
+            antecedencia_dias INTEGER NOT NULL DEFAULT 7,
+            ativo INTEGER NOT NULL DEFAULT 1,
+            criado_em TEXT NOT NULL DEFAULT (date('now', 'localtime'))
+        );
+        CREATE TABLE IF NOT EXISTS {AGENDA} (
+            plano_id INTEGER NOT NULL,
+            veiculo_id INTEGER NOT NULL,
+            ultima_execucao TEXT,               -- aaaa-mm-dd; NULL = nunca (conta da criação do plano)
+            vence_em TEXT NOT NULL,
+            os_id INTEGER,                      -- OS do plano em andamento
+            km_base REAL,                       -- km na última execução (planos por km)
+            vence_km REAL,
+            PRIMARY KEY (plano_id, veiculo_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ix_preventiva_agenda_vence ON {AGENDA}(vence_em);
+        CREATE INDEX IF NOT EXISTS ix_preventiva_agenda_veiculo ON {AGENDA}(veiculo_id);
+        CREATE TABLE IF NOT EXISTS {PENDENTES} (veiculo_id INTEGER PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS {OS_PLANO} (
+            os_id INTEGER PRIMARY KEY,
+            plano_id INTEGER NOT NULL,
+            veiculo_id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_preventiva_os_plano ON {OS_PLANO}(plano_id, veiculo_id);
+        CREATE INDEX IF NOT EXISTS ix_manutencoes_veiculo ON manutencoes(veiculo_id);
+
+        CREATE TRIGGER IF NOT EXISTS trg_prev_man_ins AFTER INSERT ON manutencoes BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (NEW.veiculo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_man_del AFTER DELETE ON manutencoes BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (OLD.veiculo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_man_upd
+        AFTER UPDATE OF veiculo_id, data, tipo, desc_peca ON manutencoes BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (OLD.veiculo_id), (NEW.veiculo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_os_upd
+        AFTER UPDATE OF status, data_liberacao ON ordens_servico BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} SELECT veiculo_id FROM {OS_PLANO} WHERE os_id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_os_del AFTER DELETE ON ordens_servico BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} SELECT veiculo_id FROM {OS_PLANO} WHERE os_id = OLD.id;
+            DELETE FROM {OS_PLANO} WHERE os_id = OLD.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_veiculo_ins AFTER INSERT ON veiculos BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (NEW.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_veiculo_upd
+        AFTER UPDATE OF classe_mecanica, modelo, status ON veiculos BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (NEW.id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_veiculo_del AFTER DELETE ON veiculos BEGIN
+            DELETE FROM {AGENDA} WHERE veiculo_id = OLD.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_leitura_ins AFTER INSERT ON {leituras.TABLE}
+        WHEN NEW.km IS NOT NULL AND {com_km} BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (NEW.veiculo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_leitura_upd AFTER UPDATE OF ts, km ON {leituras.TABLE}
+        WHEN {com_km} BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (NEW.veiculo_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_prev_leitura_del AFTER DELETE ON {leituras.TABLE}
+        WHEN OLD.km IS NOT NULL AND {com_km} BEGIN
+            INSERT OR IGNORE INTO {PENDENTES} VALUES (OLD.veiculo_id);
+        END;
+        """)
+        # agenda anterior aos planos por km: ganha as colunas e é refeita no próximo atualizar()
+        if "vence_km" not in {r["name"] for r in conn.execute(f"PRAGMA table_info({AGENDA})")}:
+            conn.execute(f"ALTER TABLE {AGENDA} ADD COLUMN km_base REAL;")
+            conn.execute(f"ALTER TABLE {AGENDA} ADD COLUMN vence_km REAL;")
+            conn.execute(f"INSERT OR IGNORE INTO {PENDENTES} SELECT id FROM veiculos;")
+    _schema_ready.add(str(DB_PATH))
+
+# =============== Planos ===============
+# campos numéricos do plano -> rótulo nas mensagens de erro
+_NUMEROS_PLANO = {"intervalo_dias": "A cada (dias)", "intervalo_km": "A cada (km)",
+                  "antecedencia_dias": "Antecedência da OS (dias)"}
+
+def _numero(v) -> Optional[float]:
+    """Número do formulário/planilha/API (aceita vírgula decimal); None se vazio ou inválido."""
+    if v in (None, ""):
+        return None
+    try:
+        n = float(v.strip().replace(",", ".")) if isinstance(v, str) else float(v)
+    except (TypeError, ValueError):
+        return None
+    return n if math.isfinite(n) else None
+
+def _normalizar_plano(dados: dict) -> dict:
+    def txt(k):
+        return str(dados.get(k) or "").strip() or None
+    def num(k, tipo):
+        v = _numero(dados.get(k))
+        return tipo(v) if v is not None and v > 0 else None
+    antecedencia = _numero(dados.get("antecedencia_dias", 7))
+    return {
+        "nome": txt("nome"),
+        "classe_mecanica": txt("classe_mecanica"), "modelo": txt("modelo"),
+        "intervalo_dias": num("intervalo_dias", int), "intervalo_km": num("intervalo_km", float),
+        "tipo": txt("tipo"), "termo": txt("termo"),
+        "antecedencia_dias": int(antecedencia) if antecedencia and antecedencia > 0 else 0,
+        "ativo": 1 if dados.get("ativo", True) else 0,
+    }
+
+def _validar_plano(dados: dict, payload: dict) -> None:
+    """ErroValidacao com as mensagens do plano. `dados` é o bruto, `payload` o normalizado."""
+    erros = []
+    if not payload["nome"]:
+        erros.append("Informe o nome do plano.")
+    invalidos = [c for c in _NUMEROS_PLANO if dados.get(c) not in (None, "") and _numero(dados[c]) is None]
+    erros += [f"{_NUMEROS_PLANO[c]}: valor não numérico ({dados[c]!r})." for c in invalidos]
+    if not payload["intervalo_dias"] and not payload["intervalo_km"] \
+            and not {"intervalo_dias", "intervalo_km"} & set(invalidos):
+        erros.append("Informe o intervalo em dias e/ou em km.")
+    if erros:
+        raise ErroValidacao(erros)
+
+def _recalcular_plano(conn, plano_id: int) -> None:
+    conn.execute(f"DELETE FROM {AGENDA} WHERE plano_id = ?", (plano_id,))
+    conn.execute(_RECALCULO.format(filtro="p.id = ?"), (plano_id,))
+
+def criar_plano(dados: dict) -> int:
+    """Cria o plano (ErroValidacao sem nome/intervalo) e monta a agenda dele. Retorna o id."""
+    ensure_schema()
+    payload = _normalizar_plano(dados)
+    _validar_plano(dados, payload)
+
+    def _tx(conn):
+        pid = conn.execute(
+            f"INSERT INTO {PLANOS} ({', '.join(PLANO_COLS)}) VALUES ({', '.join('?' * len(PLANO_COLS))}) RETURNING id",
+            [payload[c] for c in PLANO_COLS],
+        ).fetchone()[0]
+        _recalcular_plano(conn, pid)
+        return pid
+
+    return run_write(_tx)
+
+def atualizar_plano(plano_id: int, dados: dict) -> None:
+    ensure_schema()
+    payload = _normalizar_plano(dados)
+    _validar_plano(dados, payload)
+
+    def _tx(conn):
+        conn.execute(f"UPDATE {PLANOS} SET {', '.join(f'{c} = ?' for c in PLANO_COLS)} WHERE id = ?",
+                     [payload[c] for c in PLANO_COLS] + [plano_id])
+        _recalcular_plano(conn, plano_id)
+
+    run_write(_tx)
+
+def excluir_plano(plano_id: int) -> None:
+    """Remove o plano e a agenda dele; OS já geradas continuam em ordens_servico."""
+    ensure_schema()
+    def _tx(conn):
+        conn.execute(f"DELETE FROM {AGENDA} WHERE plano_id = ?", (plano_id,))
+        conn.execute(f"DELETE FROM {OS_PLANO} WHERE plano_id = ?", (plano_id,))
+        conn.execute(f"DELETE FROM {PLANOS} WHERE id = ?", (plano_id,))
+    run_write(_tx)
+
+def listar_planos() -> pd.DataFrame:
+    """Planos com o nº de veículos na agenda e quantos estão vencidos hoje."""
+    ensure_schema()
+    with get_conn() as conn:
+        return pd.read_sql(f"""
+            SELECT p.*, COUNT(a.veiculo_id) AS veiculos,
+                   COALESCE(SUM(a.vence_em <= date('now', 'localtime')), 0) AS vencidos
+            FROM {PLANOS} p LEFT JOIN {AGENDA} a ON a.plano_id = p.id
+            GROUP BY p.id ORDER BY p.nome
+        """, conn)
+
+# =============== Agenda ===============
+def atualizar() -> int:
+    """Recalcula a agenda dos veículos anotados pelos triggers. Retorna quantos veículos."""
+    ensure_schema()
+
+    def _tx(conn):
+        n = conn.execute(f"SELECT COUNT(*) FROM {PENDENTES}").fetchone()[0]
+        if n:
+            conn.execute(f"DELETE FROM {AGENDA} WHERE veiculo_id IN (SELECT veiculo_id FROM {PENDENTES})")
+            conn.execute(_RECALCULO.format(filtro=f"v.id IN (SELECT veiculo_id FROM {PENDENTES})"))
+            conn.execute(f"DELETE FROM {PENDENTES}")
+        return n
+
+    # leitura barata quando não há nada pendente (o caso comum a cada rerun)
+    with get_conn() as c:
+        if c.execute(f"SELECT 1 FROM {PENDENTES} LIMIT 1").fetchone() is None:
+            return 0
+    return run_write(_tx)
+
+def reconstruir() -> None:
+    """Refaz a agenda de todos os planos (ex.: após carga feita com triggers desligados)."""
+    ensure_schema()
+    def _tx(conn):
+        conn.execute(f"DELETE FROM {AGENDA}")
+        conn.execute(f"DELETE FROM {PENDENTES}")
+        conn.execute(_RECALCULO.format(filtro="1"))
+    run_write(_tx)
+
+def vencimentos(ate: Optional[date] = None, placa: str = "", plano_id: Optional[int] = None,
+                limite: int = 500) -> pd.DataFrame:
+    """
+    Itens da agenda que vencem até `ate` (padrão: hoje), do mais atrasado ao mais distante,
+    com veículo, plano, dias de atraso (negativo = faltam), km atual/de vencimento (planos
+    por km) e a OS em andamento, se houver.
+    """
+    atualizar()
+    ate = (ate or date.today()).isoformat()
+    conds, params = ["a.vence_em <= ?"], [ate]
+    if placa:
+        conds.append("v.placa LIKE ?"); params.append(f"%{placa.strip().upper()}%")
+    if plano_id:
+        conds.append("a.plano_id = ?"); params.append(plano_id)
+    with get_conn() as conn:
+        return pd.read_sql(f"""
+            SELECT a.plano_id, p.nome AS plano, a.veiculo_id, v.num_frota, v.placa, v.modelo, v.classe_mecanica,
+                   a.ultima_execucao, a.vence_em,
+                   CAST(julianday(date('now', 'localtime')) - julianday(a.vence_em) AS INTEGER) AS dias_atraso,
+                   a.km_base, a.vence_km, CASE WHEN a.vence_km IS NOT NULL THEN la.km END AS km_atual,
+                   a.os_id, o.num_os, o.status AS status_os
+            FROM {AGENDA} a
+            JOIN {PLANOS} p ON p.id = a.plano_id
+            JOIN veiculos v ON v.id = a.veiculo_id
+            LEFT JOIN {leituras.ATUAL} la ON la.veiculo_id = a.veiculo_id
+            LEFT JOIN ordens_servico o ON o.id = a.os_id
+            WHERE {' AND '.join(conds)}
+            ORDER BY a.vence_em, a.plano_id, a.veiculo_id
+            LIMIT ?
+        """, conn, params=[*params, limite])
+
+def proximo_vencimento() -> Optional[str]:
+    """Data do próximo vencimento da frota (1ª entrada do índice)."""
+    atualizar()
+    with get_conn() as conn:
+        row = conn.execute(f"SELECT MIN(vence_em) FROM {AGENDA}").fetchone()
+    return row[0] if row else None
+
+def gerar_rascunhos(hoje: Optional[date] = None, limite: int = 500) -> list[int]:
+    """
+    Cria OS "rascunho" para os itens sem OS em andamento que vencem dentro da antecedência
+    do plano. num_os = PREV-<plano>-<veículo>-<vencimento>, então repetir não duplica.
+    Retorna os ids das OS criadas.
+    """
+    atualizar()
+    hoje = hoje or date.today()
+
+    def _tx(conn):
+        itens = conn.execute(f"""
+            SELECT a.plano_id, a.veiculo_id, a.vence_em, a.vence_km, p.nome, v.placa
+            FROM {AGENDA} a
+            JOIN {PLANOS} p ON p.id = a.plano_id
+            JOIN veiculos v ON v.id = a.veiculo_id
+            WHERE a.os_id IS NULL AND a.vence_em <= date(?, '+' || p.antecedencia_dias || ' days')
+            ORDER BY a.vence_em
+            LIMIT ?
+        """, (hoje.isoformat(), limite)).fetchall()
+        criadas = []
+        for plano_id, veiculo_id, vence_em, vence_km, nome, placa in itens:
+            vence = f"vence em {date.fromisoformat(vence_em):%d/%m/%Y}"
+            if vence_km is not None:
+                vence += f" ou aos {vence_km:,.0f} km".replace(",", ".")
+            row = conn.execute("""
+                INSERT INTO ordens_servico (data_abertura, num_os, veiculo_id, placa, descricao, prioridade,
+                                            previsao_saida, responsavel, status)
+                VALUES (?, ?, ?, ?, ?, 'média', ?, 'preventiva', 'rascunho')
+                ON CONFLICT(num_os) DO NOTHING
+                RETURNING id
+            """, (hoje.isoformat(), f"PREV-{plano_id}-{veiculo_id}-{vence_em.replace('-', '')}", veiculo_id, placa,
+                  f"Preventiva: {nome} ({vence})", vence_em)).fetchone()
+            if row is None:
+                continue  # já gerada antes (ex.: a OS foi desvinculada)
+            conn.execute(f"INSERT INTO {OS_PLANO} (os_id, plano_id, veiculo_id) VALUES (?, ?, ?)",
+                         (row[0], plano_id, veiculo_id))
+            conn.execute(f"UPDATE {AGENDA} SET os_id = ? WHERE plano_id = ? AND veiculo_id = ?",
+                         (row[0], plano_id, veiculo_id))
+            criadas.append(row[0])
+        return criadas
+
+    return run_write(_tx)
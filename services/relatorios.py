@@ -0,0 +1,393 @@
+# services/relatorios.py
+"""
+Dados dos relatórios: carga das três bases (OS, manutenções, frota), filtros globais,
+KPIs, rankings de custo lidos em blocos, séries temporais agregadas no banco, tabelas
+formatadas e exportação CSV (também como job em segundo plano, "relatorio_csv").
+"""
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import jobs
+from db import get_read_conn, iter_frames
+from instrumentation import phase
+
+# ======= helpers =======
+def fmt_date_iso(d):
+    if isinstance(d, date): return d.strftime("%Y-%m-%d")
+    if isinstance(d, datetime): return d.date().strftime("%Y-%m-%d")
+    return str(d) if d else None
+
+def _fmt_br_date_col(df: pd.DataFrame, cols):
+    for c in cols:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c], errors="coerce").dt.strftime("%d/%m/%Y").fillna(df[c])
+    return df
+
+def brl(v: float) -> str:
+    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X",".")
+
+# ======= Carga (data.db) =======
+# consultas base dos relatórios (também usadas pelo streaming em blocos)
+_SQL_OS = """
+    SELECT
+        os.id,
+        os.data_abertura,
+        os.num_os,
+        v.num_frota,
+        os.placa,
+        v.modelo,
+        v.marca,
+        v.ano_fabricacao,
+        v.chassi,
+        os.descricao,
+        os.prioridade,
+        os.sc,
+        os.orcamento,
+        os.previsao_saida,
+        os.data_liberacao,
+        os.responsavel,
+        os.status
+    FROM ordens_servico os
+    LEFT JOIN veiculos v ON v.id = os.veiculo_id
+"""
+
+_SQL_MAN = """
+    SELECT
+        m.id,
+        v.num_frota,
+        m.placa,
+        v.modelo,
+        v.marca,
+        v.ano_fabricacao,
+        v.chassi,
+        m.data,
+        m.mes,
+        m.sc,
+        m.tipo,
+        m.cod_peca,
+        m.desc_peca,
+        m.qtd,
+        m.vlr_unitario,
+        COALESCE(m.vlr_peca, m.qtd * m.vlr_unitario) AS custo,
+        m.fornecedor,
+        m.nf
+    FROM manutencoes m
+    LEFT JOIN veiculos v ON v.id = m.veiculo_id
+"""
+
+_SQL_FROTA = """
+    SELECT id, num_frota, placa, modelo, marca, ano_fabricacao,
+           classe_mecanica, classe_operacional, chassi, status
+    FROM veiculos
+"""
+
+@phase("relatorios.carga")
+def carregar():
+    """(df_os, df_man, df_frota) completos."""
+    # conexão de leitura (REPORTING_MODE): não disputa lock com os formulários
+    with get_read_conn() as conn:
+        df_os = pd.read_sql(_SQL_OS, conn)
+        df_man = pd.read_sql(_SQL_MAN, conn)
+        df_frota = pd.read_sql(_SQL_FROTA, conn)
+
+    return df_os, df_man, df_frota
+
+@phase("relatorios.filtros")
+def aplicar_filtros(
+    df_os: pd.DataFrame,
+    df_man: pd.DataFrame,
+    df_frota: pd.DataFrame,
+    dt_range: Tuple[Optional[date], Optional[date]],
+    status_os: str,
+    placa: str,
+    num_frota: str,
+):
+    start, end = dt_range
+    if not df_os.empty:
+        if start: df_os = df_os[df_os["data_abertura"] >= fmt_date_iso(start)]
+        if end:   df_os = df_os[df_os["data_abertura"] <= fmt_date_iso(end)]
+        if status_os: df_os = df_os[df_os["status"].astype(str).str.lower() == status_os.strip().lower()]
+        if placa: df_os = df_os[df_os["placa"].astype(str).str.contains(placa, case=False, na=False)]
+        if num_frota: df_os = df_os[df_os["num_frota"].astype(str).str.contains(num_frota, case=False, na=False)]
+
+    if not df_man.empty:
+        if start: df_man = df_man[df_man["data"] >= fmt_date_iso(start)]
+        if end:   df_man = df_man[df_man["data"] <= fmt_date_iso(end)]
+        if placa: df_man = df_man[df_man["placa"].astype(str).str.contains(placa, case=False, na=False)]
+        if num_frota: df_man = df_man[df_man["num_frota"].astype(str).str.contains(num_frota, case=False, na=False)]
+
+    if not df_frota.empty:
+        if placa: df_frota = df_frota[df_frota["placa"].astype(str).str.contains(placa, case=False, na=False)]
+        if num_frota: df_frota = df_frota[df_frota["num_frota"].astype(str).str.contains(num_frota, case=False, na=False)]
+
+    return df_os, df_man, df_frota
+
+def kpis(df_os: pd.DataFrame, df_man: pd.DataFrame, df_frota: pd.DataFrame) -> dict:
+    """Contagens dos cards do topo (OS por status, manutenções, custo, frota/ativos)."""
+    status = df_os["status"].astype(str).str.lower() if not df_os.empty else pd.Series(dtype=str)
+    return {
+        "total_os": len(df_os),
+        "abertas": int((status == "aberta").sum()),
+        "execucao": int(status.isin(["em execução", "em execucao"]).sum()),
+        "fechadas": int((status == "fechada").sum()),
+        "total_man": len(df_man),
+        "custo_total": float(pd.to_numeric(df_man["custo"], errors="coerce").fillna(0).sum()) if not df_man.empty else 0.0,
+        "frota_total": len(df_frota),
+        "ativos": int((df_frota["status"].astype(str).str.lower() == "ativo").sum()) if not df_frota.empty else 0,
+    }
+
+# ======= Leitura em blocos (exportações e rankings com memória limitada) =======
+_SQL_BASE = {"os": _SQL_OS, "manutencoes": _SQL_MAN, "frota": _SQL_FROTA}
+# filtro global -> coluna em cada consulta base (mesma regra de aplicar_filtros, no SQL)
+_FILTRO_COLS = {
+    "os": {"data": "os.data_abertura", "status": "os.status", "placa": "os.placa", "num_frota": "v.num_frota"},
+    "manutencoes": {"data": "m.data", "placa": "m.placa", "num_frota": "v.num_frota"},
+    "frota": {"placa": "placa", "num_frota": "num_frota"},
+}
+
+def _where(tabela: str, filtros: dict) -> Tuple[str, list]:
+    cols = _FILTRO_COLS[tabela]
+    conds, params = [], []
+    if "data" in cols:
+        if filtros.get("de"):  conds.append(f"{cols['data']} >= ?"); params.append(filtros["de"])
+        if filtros.get("ate"): conds.append(f"{cols['data']} <= ?"); params.append(filtros["ate"])
+    if "status" in cols and (filtros.get("status_os") or "").strip():
+        conds.append(f"LOWER({cols['status']}) = ?"); params.append(filtros["status_os"].strip().lower())
+    for chave in ("placa", "num_frota"):
+        if filtros.get(chave):
+            conds.append(f"{cols[chave]} LIKE ?"); params.append(f"%{filtros[chave]}%")
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+def iter_tabela(tabela: str, filtros: dict, chunk: int = 50_000):
+    """DataFrames de até `chunk` linhas da consulta base, já filtrada no banco."""
+    where, params = _where(tabela, filtros)
+    yield from iter_frames(_SQL_BASE[tabela] + where, params, size=chunk)
+
+def contar(tabela: str, filtros: dict) -> int:
+    where, params = _where(tabela, filtros)
+    with get_read_conn() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM ({_SQL_BASE[tabela]}{where})", params).fetchone()[0]
+
+# chave de agrupamento -> expressão (só as colunas necessárias saem do banco)
+_CHAVES_CUSTO = {
+    "placa": "m.placa", "num_frota": "v.num_frota", "modelo": "v.modelo", "marca": "v.marca",
+    "fornecedor": "m.fornecedor", "tipo": "m.tipo", "mes": "m.mes",
+}
+
+@phase("relatorios.ranking")
+def custos_por(chave: str, filtros: dict, top: Optional[int] = 10, chunk: int = 50_000,
+               df_man: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Custo total de manutenção por `chave` (colunas: chave, custo).
+
+    Com `df_man` (já carregado e filtrado, ex.: pela página) agrupa em memória e ignora
+    `filtros`; sem ele, soma bloco a bloco direto do banco.
+    """
+    if df_man is not None:
+        blocos = [df_man[[chave, "custo"]].rename(columns={chave: "chave"})] if not df_man.empty else []
+    else:
+        where, params = _where("manutencoes", filtros)
+        sql = f"""
+            SELECT {_CHAVES_CUSTO[chave]} AS chave, COALESCE(m.vlr_peca, m.qtd * m.vlr_unitario) AS custo
+            FROM manutencoes m
+            LEFT JOIN veiculos v ON v.id = m.veiculo_id
+        """ + where
+        blocos = iter_frames(sql, params, size=chunk)
+    total = None
+    for df in blocos:
+        parte = pd.to_numeric(df["custo"], errors="coerce").fillna(0).groupby(df["chave"], dropna=False).sum()
+        total = parte if total is None else total.add(parte, fill_value=0)
+    if total is None:
+        return pd.DataFrame(columns=[chave, "custo"])
+    total = total.sort_values(ascending=False)
+    if top:
+        total = total.head(top)
+    return total.rename_axis(chave).reset_index(name="custo")
+
+# ======= Séries temporais (agregadas no SQL, reduzidas por LTTB) =======
+MAX_PONTOS = 300
+
+# resolução -> expressão que leva a data ao 1º dia do balde (segunda-feira na semana)
+_BALDES = {
+    "dia": "date({c})",
+    "semana": "date({c}, 'weekday 0', '-6 days')",
+    "mes": "strftime('%Y-%m-01', {c})",
+}
+_DIAS_BALDE = {"dia": 1, "semana": 7, "mes": 30.44}
+
+# série -> (base do WHERE, coluna de data, medida, FROM)
+_SERIES = {
+    "custo": ("manutencoes", "m.data", "SUM(COALESCE(m.vlr_peca, m.qtd * m.vlr_unitario, 0))",
+              "manutencoes m LEFT JOIN veiculos v ON v.id = m.veiculo_id"),
+    "os": ("os", "os.data_abertura", "COUNT(*)",
+           "ordens_servico os LEFT JOIN veiculos v ON v.id = os.veiculo_id"),
+}
+
+def lttb(x, y, n: int) -> list:
+    """
+    Índices dos pontos mantidos pelo Largest-Triangle-Three-Buckets: o 1º, o último e,
+    em cada um dos n-2 baldes do meio, o que forma o maior triângulo com o ponto já
+    escolhido e a média do balde seguinte (preserva picos e vales).
+    """
+    tam = len(x)
+    if n >= tam or n < 3:
+        return list(range(tam))
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+    def limite(i):  # aritmética inteira: o último balde fecha exatamente em tam-1
+        return (i * (tam - 2)) // (n - 2) + 1
+
+    idx, a = [0], 0
+    for i in range(n - 2):
+        ini, fim, prox = limite(i), limite(i + 1), min(limite(i + 2), tam)
+        mx, my = x[fim:prox].mean(), y[fim:prox].mean()
+        areas = np.abs((x[a] - mx) * (y[ini:fim] - y[a]) - (x[a] - x[ini:fim]) * (my - y[a]))
+        a = ini + int(areas.argmax())
+        idx.append(a)
+    idx.append(tam - 1)
+    return idx
+
+def _resolucao_auto(dias: float, max_pontos: int) -> str:
+    for res in ("dia", "semana"):
+        if dias / _DIAS_BALDE[res] <= max_pontos:
+            return res
+    return "mes"
+
+@phase("relatorios.serie")
+def serie_temporal(serie: str, filtros: dict, resolucao: str = "auto", max_pontos: int = MAX_PONTOS):
+    """
+    Série `serie` ("custo" de manutenção ou volume de "os") por período, com os filtros
+    globais, agrupada no banco. resolucao "auto" escolhe a mais fina (dia/semana/mês) que
+    cabe em max_pontos; se ainda passar, reduz por LTTB.
+    Retorna (DataFrame periodo/valor, resolução usada, nº de baldes antes da redução).
+    """
+    base, col, medida, origem = _SERIES[serie]
+    where, params = _where(base, filtros)
+    where += (" AND " if where else " WHERE ") + f"date({col}) IS NOT NULL"
+    with get_read_conn() as conn:
+        if resolucao == "auto":
+            ini, fim = conn.execute(f"SELECT MIN(date({col})), MAX(date({col})) FROM {origem}{where}", params).fetchone()
+            dias = (date.fromisoformat(fim) - date.fromisoformat(ini)).days + 1 if ini else 0
+            resolucao = _resolucao_auto(dias, max_pontos)
+        balde = _BALDES[resolucao].format(c=col)
+        rows = conn.execute(
+            f"SELECT {balde} AS periodo, {medida} AS valor FROM {origem}{where} GROUP BY 1 ORDER BY 1", params
+        ).fetchall()
+    df = pd.DataFrame(rows, columns=["periodo", "valor"])
+    total = len(df)
+    if total > max_pontos:
+        x = pd.to_datetime(df["periodo"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+        df = df.iloc[lttb(x, df["valor"].to_numpy(dtype=float), max_pontos)].reset_index(drop=True)
+    return df, resolucao, total
+
+# ======= Tabelas formatadas (usadas na tela e nas exportações em job) =======
+def tabela_os(df_os: pd.DataFrame) -> pd.DataFrame:
+    df = df_os.copy()
+    df = _fmt_br_date_col(df, ["data_abertura","previsao_saida","data_liberacao"])
+    if "orcamento" in df.columns:
+        df["orcamento"] = pd.to_numeric(df["orcamento"], errors="coerce").fillna(0).map(brl)
+
+    if "id" in df.columns: df = df.drop(columns=["id"])
+    friendly = {
+        "num_os":"Nº da OS","num_frota":"Nº da Frota","placa":"Placa",
+        "data_abertura":"Data de Abertura","previsao_saida":"Previsão de Saída","data_liberacao":"Data de Liberação",
+        "modelo":"Modelo","marca":"Marca","ano_fabricacao":"Ano de Fabricação","chassi":"Chassi (VIN)",
+        "descricao":"Descrição do Serviço","prioridade":"Prioridade","sc":"SC (Chamado)","orcamento":"Orçamento",
+        "responsavel":"Responsável","status":"Status",
+    }
+    df = df.rename(columns={k:v for k,v in friendly.items() if k in df.columns})
+    order = ["Nº da OS","Nº da Frota","Placa","Data de Abertura","Previsão de Saída","Data de Liberação",
+             "Status","Prioridade","Responsável","Modelo","Marca","Ano de Fabricação","Chassi (VIN)","SC (Chamado)","Orçamento","Descrição do Serviço"]
+    exist = [c for c in order if c in df.columns]; other = [c for c in df.columns if c not in exist]
+    df = df[exist + other]
+    return df
+
+def tabela_man(df_man: pd.DataFrame) -> pd.DataFrame:
+    df = df_man.copy()
+    df = _fmt_br_date_col(df, ["data"])
+    if "custo" in df.columns:
+        df["custo"] = pd.to_numeric(df["custo"], errors="coerce").fillna(0).map(brl)
+
+    if "id" in df.columns: df = df.drop(columns=["id"])
+    friendly = {
+        "num_frota":"Nº da Frota","placa":"Placa","tipo":"Tipo",
+        "data":"Data","mes":"Mês (aaaa-mm)","sc":"SC",
+        "cod_peca":"Código Peça","desc_peca":"Descrição",
+        "qtd":"Qtd","vlr_unitario":"Vlr Unitário","fornecedor":"Fornecedor",
+        "nf":"NF.","custo":"Custo",
+        "modelo":"Modelo","marca":"Marca","ano_fabricacao":"Ano de Fabricação","chassi":"Chassi (VIN)",
+    }
+    df = df.rename(columns={k:v for k,v in friendly.items() if k in df.columns})
+
+    # Mês amigável
+    if "Mês (aaaa-mm)" in df.columns:
+        tmp = pd.to_datetime(df["Mês (aaaa-mm)"]+"-01", errors="coerce")
+        df["Mês"] = tmp.dt.strftime("%b/%y").str.lower()
+        df = df.drop(columns=["Mês (aaaa-mm)"])
+
+    order = ["Nº da Frota","Placa","Data","Mês","Tipo","SC","Código Peça","Descrição","Qtd","Vlr Unitário","Custo","Fornecedor","NF.",
+             "Modelo","Marca","Ano de Fabricação","Chassi (VIN)"]
+    exist = [c for c in order if c in df.columns]; other = [c for c in df.columns if c not in exist]
+    df = df[exist + other]
+    return df
+
+def tabela_frota(df_frota: pd.DataFrame) -> pd.DataFrame:
+    df = df_frota.copy()
+    if "id" in df.columns: df = df.drop(columns=["id"])
+    friendly = {
+        "num_frota":"Nº da Frota","placa":"Placa","modelo":"Modelo","marca":"Marca",
+        "ano_fabricacao":"Ano de Fabricação","classe_mecanica":"Classe Mecânica",
+        "classe_operacional":"Classe Operacional","chassi":"Chassi (VIN)","status":"Status"
+    }
+    df = df.rename(columns={k:v for k,v in friendly.items() if k in df.columns})
+    order = ["Nº da Frota","Placa","Modelo","Marca","Ano de Fabricação","Classe Mecânica","Classe Operacional","Chassi (VIN)","Status"]
+    exist = [c for c in order if c in df.columns]; other = [c for c in df.columns if c not in exist]
+    df = df[exist + other]
+    return df
+
+# ======= Exportações CSV (tela, jobs.py, benchmarks) =======
+# tabela -> (formatação, posição no retorno de carregar, nome do arquivo)
+EXPORTS = {
+    "os": (tabela_os, 0, "relatorio_os.csv"),
+    "manutencoes": (tabela_man, 1, "relatorio_manutencoes.csv"),
+    "frota": (tabela_frota, 2, "relatorio_frota.csv"),
+}
+
+def write_csv(df: pd.DataFrame, out, progresso=None, chunk: int = 50_000):
+    """CSV utf-8-sig gravado em blocos, reportando progresso (0..1)."""
+    out.write("\ufeff".encode("utf-8"))
+    n = len(df)
+    if n == 0:
+        out.write(df.to_csv(index=False).encode("utf-8"))
+        return
+    for i in range(0, n, chunk):
+        out.write(df.iloc[i:i + chunk].to_csv(index=False, header=(i == 0)).encode("utf-8"))
+        if progresso:
+            progresso(min(i + chunk, n) / n)
+
+def write_csv_stream(tabela: str, filtros: dict, out, progresso=None, chunk: int = 50_000) -> int:
+    """CSV utf-8-sig lido e formatado bloco a bloco (memória limitada a `chunk` linhas)."""
+    fmt = EXPORTS[tabela][0]
+    total = contar(tabela, filtros) if progresso else 0
+    out.write("\ufeff".encode("utf-8"))
+    feitos = 0
+    for df in iter_tabela(tabela, filtros, chunk):
+        out.write(fmt(df).to_csv(index=False, header=(feitos == 0)).encode("utf-8"))
+        feitos += len(df)
+        if progresso and total:
+            progresso(min(feitos / total, 1.0))
+    if feitos == 0:
+        with get_read_conn() as conn:
+            vazio = pd.read_sql(_SQL_BASE[tabela] + " LIMIT 0", conn)
+        # mesmo cabeçalho (rótulos do fmt) do caminho com linhas
+        out.write(fmt(vazio).to_csv(index=False).encode("utf-8"))
+    return feitos
+
+@jobs.register("relatorio_csv")
+def _job_relatorio_csv(params: dict, out, progresso):
+    fname = EXPORTS[params["tabela"]][2]
+    progresso(0.02, "Contando linhas…")
+    write_csv_stream(params["tabela"], params, out, lambda f: progresso(0.05 + 0.95 * f, "Gerando CSV…"))
+    return fname, "text/csv"
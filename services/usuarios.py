@@ -0,0 +1,396 @@
+# services/usuarios.py
+"""
+Usuários, senhas (SHA-256, com migração das colunas legadas) e sessões por token, com os
+caches em memória de sessões e da lista de usuários. A tela de login e o admin ficam em
+modules/auth.py e modules/admin_users.py; a API autentica por aqui.
+"""
+from __future__ import annotations
+import hashlib
+import secrets
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, Optional, Dict
+from cache import TTLCache
+from config import DB_PATH
+from db import get_conn, run_write
+
+if TYPE_CHECKING:  # pandas só em list_users (admin): login e API não pagam o import
+    import pandas as pd
+
+USERS_TABLE = "usuarios"
+SESSIONS_TABLE = "sessions"
+
+# validade das sessões (token) e por quanto tempo o processo confia no cache antes
+# de reconsultar o banco (limita a janela de uma revogação feita por outro processo)
+SESSION_TTL = timedelta(hours=12)
+SESSION_CACHE_SECONDS = 60
+USERS_CACHE_SECONDS = 300
+
+# colunas que podem ficar vazias (NULL): bancos antigos e o init_db criaram NOT NULL
+_OPCIONAIS = ("email", "nome")
+
+_session_cache = TTLCache(maxsize=1024, ttl=SESSION_CACHE_SECONDS)  # token_hash -> user dict
+_users_cache = TTLCache(maxsize=4, ttl=USERS_CACHE_SECONDS)          # list_users()
+_schema_ready: set = set()
+
+# ==================== Model ====================
+@dataclass
+class User:
+    id: int
+    username: Optional[str]
+    email: Optional[str]
+    name: Optional[str]
+    role: Optional[str]
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "username": (self.username or "").strip(),
+            "email": (self.email or "").strip(),
+            "name": (self.name or "").strip(),
+            "role": (self.role or "user").lower(),
+        }
+
+# ==================== Infra & schema ====================
+def _hash_password(pwd: str) -> str:
+    return hashlib.sha256(pwd.encode("utf-8")).hexdigest()
+
+def ensure_schema():
+    """Garante colunas/índices e adiciona campos usados pelo admin (active/created_at)."""
+    # roda uma vez por processo/banco; antes era a cada rerun (PRAGMA + CREATE INDEX)
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {USERS_TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT);")
+
+        cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({USERS_TABLE})")}
+        if "email" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN email TEXT;")
+        if "senha_hash" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN senha_hash TEXT;")
+        if "nome" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN nome TEXT;")
+        if "username" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN username TEXT;")
+        if "role" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN role TEXT DEFAULT 'user';")
+        if "active" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN active INTEGER DEFAULT 1;")
+        if "created_at" not in cols:
+            conn.execute(f"ALTER TABLE {USERS_TABLE} ADD COLUMN created_at TEXT DEFAULT (datetime('now'));")
+
+        info = conn.execute(f"PRAGMA table_info({USERS_TABLE})").fetchall()
+        if any(r["notnull"] and r["name"] in _OPCIONAIS for r in info):
+            _recriar_sem_not_null(conn, info)
+
+        # índices (e-mail único só entre os preenchidos)
+        cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({USERS_TABLE})")}
+        if "email" in cols:
+            idx = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'ux_usuarios_email';").fetchone()
+            if idx and "WHERE" not in idx[0].upper():
+                conn.execute("DROP INDEX ux_usuarios_email;")
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_usuarios_email ON {USERS_TABLE}(email) WHERE email IS NOT NULL;")
+        if "username" in cols:
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_usuarios_username ON {USERS_TABLE}(username);")
+
+        # sessões (token guardado só como hash)
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            expires_at TEXT NOT NULL,
+            revoked INTEGER NOT NULL DEFAULT 0
+        );
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_sessions_user ON {SESSIONS_TABLE}(user_id);")
+    _schema_ready.add(str(DB_PATH))
+
+def _recriar_sem_not_null(conn, info) -> None:
+    """
+    SQLite não remove NOT NULL com ALTER: recria `usuarios` com as mesmas colunas, tipos e
+    defaults, só sem NOT NULL em _OPCIONAIS (senão create_user sem e-mail/nome falha). Os
+    índices são recriados em seguida pelo ensure_schema.
+    """
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;", (USERS_TABLE,)).fetchone()[0]
+    defs = []
+    for r in info:
+        d = f"{r['name']} {r['type']}".strip()
+        if r["pk"]:
+            d += " PRIMARY KEY" + (" AUTOINCREMENT" if "AUTOINCREMENT" in sql.upper() else "")
+        elif r["notnull"] and r["name"] not in _OPCIONAIS:
+            d += " NOT NULL"
+        if r["dflt_value"] is not None:
+            d += f" DEFAULT ({r['dflt_value']})"
+        defs.append(d)
+    cols = ", ".join(r["name"] for r in info)
+    conn.executescript(f"""
+        BEGIN IMMEDIATE;
+        DROP TABLE IF EXISTS {USERS_TABLE}_new;
+        CREATE TABLE {USERS_TABLE}_new ({", ".join(defs)});
+        INSERT INTO {USERS_TABLE}_new ({cols}) SELECT {cols} FROM {USERS_TABLE};
+        DROP TABLE {USERS_TABLE};
+        ALTER TABLE {USERS_TABLE}_new RENAME TO {USERS_TABLE};
+        COMMIT;
+    """)
+
+def _invalidate_users() -> None:
+    """Descarta caches de usuários/sessões deste processo (chamado em toda escrita em usuarios)."""
+    _users_cache.clear()
+    _session_cache.clear()
+
+# ==================== Sessões ====================
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def create_session(user_id: int) -> str:
+    """Abre sessão para o usuário e devolve o token (o banco guarda só o hash)."""
+    ensure_schema()
+    token = secrets.token_urlsafe(32)
+    with get_conn() as conn:
+        conn.execute(f"DELETE FROM {SESSIONS_TABLE} WHERE expires_at < datetime('now');")
+        conn.execute(
+            f"INSERT INTO {SESSIONS_TABLE} (token_hash, user_id, expires_at) "
+            f"VALUES (?, ?, datetime('now', ?));",
+            (_hash_token(token), user_id, f"+{int(SESSION_TTL.total_seconds())} seconds")
+        )
+    return token
+
+def get_session_user(token: Optional[str]) -> Optional[dict]:
+    """
+    Usuário (dict) da sessão se o token for válido, não revogado, não expirado e o
+    usuário estiver ativo. Consulta o banco só quando não está no cache.
+    """
+    if not token:
+        return None
+    key = _hash_token(token)
+    user = _session_cache.get(key)
+    if user is not None:
+        return user
+
+    with get_conn() as conn:
+        row = conn.execute(f"""
+            SELECT u.id, u.username, u.email, u.nome AS name, u.role,
+                   (julianday(s.expires_at) - julianday('now')) * 86400 AS restante
+            FROM {SESSIONS_TABLE} s
+            JOIN {USERS_TABLE} u ON u.id = s.user_id
+            WHERE s.token_hash = ? AND s.revoked = 0
+              AND s.expires_at > datetime('now')
+              AND COALESCE(u.active, 1) = 1
+        """, (key,)).fetchone()
+    if not row:
+        return None
+    user = User(row["id"], row["username"], row["email"], row["name"], row["role"]).as_dict()
+    _session_cache.set(key, user, ttl=min(SESSION_CACHE_SECONDS, max(row["restante"], 0)))
+    return user
+
+def revoke_session(token: Optional[str]) -> None:
+    if not token:
+        return
+    key = _hash_token(token)
+    with get_conn() as conn:
+        conn.execute(f"UPDATE {SESSIONS_TABLE} SET revoked = 1 WHERE token_hash = ?;", (key,))
+    _session_cache.pop(key)
+
+def revoke_user_sessions(user_id: int) -> None:
+    """Derruba todas as sessões do usuário (desativação, troca de senha, exclusão)."""
+    with get_conn() as conn:
+        conn.execute(f"UPDATE {SESSIONS_TABLE} SET revoked = 1 WHERE user_id = ? AND revoked = 0;", (user_id,))
+    _invalidate_users()
+
+# ==================== Queries/helpers ====================
+def _fetch_user_where(where_sql: str, params: tuple) -> Optional[User]:
+    with get_conn() as conn:
+        row = conn.execute(
+            f"SELECT id, username, email, nome AS name, role FROM {USERS_TABLE} {where_sql} LIMIT 1;",
+            params
+        ).fetchone()
+    return User(**row) if row else None
+
+def _norm_login(value: Optional[str]) -> Optional[str]:
+    """username/e-mail são gravados sempre em minúsculas e sem espaços (vazio -> NULL)."""
+    return (value or "").strip().lower() or None
+
+def get_user_by_login(login: str) -> Optional[User]:
+    key = _norm_login(login)
+    if not key:
+        return None
+    with get_conn() as conn:
+        # valores já normalizados na escrita -> igualdade simples usa
+        # ux_usuarios_username / ux_usuarios_email (MULTI-INDEX OR), sem full scan.
+        # username tem prioridade sobre e-mail se ambos baterem.
+        row = conn.execute(
+            f"""
+            SELECT id, username, email, nome AS name, role
+            FROM {USERS_TABLE}
+            WHERE username = ? OR email = ?
+            ORDER BY username = ? DESC
+            LIMIT 1
+            """,
+            (key, key, key)
+        ).fetchone()
+        return User(**row) if row else None
+
+def is_active(user_id: int) -> bool:
+    with get_conn() as conn:
+        row = conn.execute(f"SELECT COALESCE(active, 1) AS a FROM {USERS_TABLE} WHERE id = ?;", (user_id,)).fetchone()
+    return bool(row and row["a"])
+
+def verify_password(user: User, pwd: str) -> bool:
+    pwd = (pwd or "")
+    expected_hash = _hash_password(pwd)
+    with get_conn() as conn:
+        # Quais colunas existem?
+        cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({USERS_TABLE})")}
+        select_cols = ["senha_hash"]
+        if "hash_senha" in cols:
+            select_cols.append("hash_senha")
+        if "senha" in cols:
+            select_cols.append("senha")
+
+        row = conn.execute(
+            f"SELECT {', '.join(select_cols)} FROM {USERS_TABLE} WHERE id=?",
+            (user.id,)
+        ).fetchone()
+        if not row:
+            return False
+
+        # Valores salvos (ignorando None)
+        saved_values = [(row[c] if isinstance(row, dict) else row[idx]) for idx, c in enumerate(select_cols)]
+        saved_values = [s or "" for s in saved_values]
+
+        # 1) Bate com SHA-256
+        if expected_hash in saved_values:
+            # garante migração p/ senha_hash se estiver faltando
+            if "senha_hash" in select_cols and (row["senha_hash"] if isinstance(row, dict) else saved_values[select_cols.index("senha_hash")]) != expected_hash:
+                conn.execute(f"UPDATE {USERS_TABLE} SET senha_hash=? WHERE id=?", (expected_hash, user.id))
+            return True
+
+        # 2) Bate com texto puro legado
+        if pwd in saved_values:
+            # migra para senha_hash
+            conn.execute(f"UPDATE {USERS_TABLE} SET senha_hash=? WHERE id=?", (expected_hash, user.id))
+            return True
+
+    return False
+
+def authenticate(login: str, pwd: str) -> Optional[User]:
+    """Usuário do login (username ou e-mail) se a senha conferir; o chamador confere `is_active`."""
+    user = get_user_by_login(login)
+    return user if user and verify_password(user, pwd) else None
+
+def count_users() -> int:
+    ensure_schema()
+    with get_conn() as conn:
+        return conn.execute(f"SELECT COUNT(*) AS c FROM {USERS_TABLE};").fetchone()["c"]
+
+# ==================== CRUD (admin_users.py) ====================
+def list_users() -> pd.DataFrame:
+    """Retorna DataFrame com colunas esperadas pelo admin (id, username, email, name, role, active, created_at)."""
+    import pandas as pd
+    ensure_schema()
+    def _load():
+        with get_conn() as conn:
+            rows = conn.execute(f"""
+                SELECT id, username, email, nome AS name, role, active, created_at
+                FROM {USERS_TABLE}
+                ORDER BY id ASC
+            """).fetchall()
+        return pd.DataFrame(rows, columns=["id","username","email","name","role","active","created_at"])
+    # cache invalidado em toda escrita em usuarios (_invalidate_users); cópia p/ o chamador poder mexer
+    return _users_cache.get_or_set("all", _load).copy()
+
+def get_user_by_id(user_id: int) -> Optional[User]:
+    return _fetch_user_where("WHERE id = ?", (user_id,))
+
+def create_user(username: str, name: Optional[str], password: str,
+                role: str = "user", active: bool = True, *, email: Optional[str] = None) -> int:
+    """Cria usuário (username/e-mail normalizados) e retorna o id."""
+    ensure_schema()
+    username = _norm_login(username)
+    if not username:
+        raise ValueError("Usuário é obrigatório.")
+    if not password or len(password) < 4:
+        raise ValueError("Senha muito curta (mín. 4).")
+    cur = run_write(lambda conn: conn.execute(
+        f"""
+        INSERT INTO {USERS_TABLE} (username, email, nome, senha_hash, role, active, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, datetime('now'));
+        """,
+        (username, _norm_login(email), (name or "").strip() or None,
+         _hash_password(password), (role or "user").lower(), 1 if active else 0)
+    ))
+    _invalidate_users()
+    return cur.lastrowid
+
+def update_user(user_id: int, *, username: Optional[str] = None,
+                email: Optional[str] = None, name: Optional[str] = None,
+                role: Optional[str] = None, active: Optional[bool] = None) -> None:
+    """Atualiza campos do usuário por id (apenas os informados)."""
+    ensure_schema()
+    sets, vals = [], []
+    if username is not None:
+        sets.append("username = ?"); vals.append(_norm_login(username))
+    if email is not None:
+        sets.append("email = ?"); vals.append(_norm_login(email))
+    if name is not None:
+        sets.append("nome = ?"); vals.append((name or "").strip() or None)
+    if role is not None:
+        sets.append("role = ?"); vals.append((role or "user").lower())
+    if active is not None:
+        sets.append("active = ?"); vals.append(1 if active else 0)
+    if not sets:
+        return
+    vals.append(user_id)
+    run_write(lambda conn: conn.execute(f"UPDATE {USERS_TABLE} SET {', '.join(sets)} WHERE id = ?;", vals))
+    if active is False:
+        revoke_user_sessions(user_id)
+    _invalidate_users()
+
+def set_password(username: str, new_password: str) -> None:
+    """Altera a senha pelo username (usado no admin)."""
+    ensure_schema()
+    if not new_password or len(new_password) < 4:
+        raise ValueError("Senha muito curta (mín. 4).")
+    new_hash = _hash_password(new_password)
+    username = _norm_login(username)
+    def _tx(conn):
+        conn.execute(f"UPDATE {USERS_TABLE} SET senha_hash = ? WHERE username = ?;", (new_hash, username))
+        # sincroniza coluna legada se existir
+        cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({USERS_TABLE})")}
+        if "hash_senha" in cols:
+            conn.execute(f"UPDATE {USERS_TABLE} SET hash_senha = ? WHERE username = ?;", (new_hash, username))
+        # senha nova derruba as sessões abertas com a antiga
+        _revoke_by_username(conn, username)
+    run_write(_tx)
+    _invalidate_users()
+
+def _revoke_by_username(conn, username: Optional[str]) -> None:
+    conn.execute(
+        f"UPDATE {SESSIONS_TABLE} SET revoked = 1 "
+        f"WHERE revoked = 0 AND user_id IN (SELECT id FROM {USERS_TABLE} WHERE username = ?);",
+        (username,)
+    )
+
+def set_active(username: str, is_active: bool) -> None:
+    ensure_schema()
+    username = _norm_login(username)
+    def _tx(conn):
+        conn.execute(f"UPDATE {USERS_TABLE} SET active = ? WHERE username = ?;", (1 if is_active else 0, username))
+        if not is_active:
+            _revoke_by_username(conn, username)
+    run_write(_tx)
+    _invalidate_users()
+
+def set_role(username: str, role: str) -> None:
+    role = (role or "user").lower()
+    run_write(lambda conn: conn.execute(f"UPDATE {USERS_TABLE} SET role = ? WHERE username = ?;", (role, _norm_login(username))))
+    _invalidate_users()
+
+def delete_user(user_id: int) -> None:
+    ensure_schema()
+    def _tx(conn):
+        conn.execute(f"UPDATE {SESSIONS_TABLE} SET revoked = 1 WHERE user_id = ?;", (user_id,))
+        conn.execute(f"DELETE FROM {USERS_TABLE} WHERE id = ?;", (user_id,))
+    run_write(_tx)
+    _invalidate_users()
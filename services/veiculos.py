@@ -0,0 +1,266 @@
+# services/veiculos.py
+"""
+Frota: normalização/validação do cadastro, upsert, listagens e edição de `veiculos`.
+Usado por cadastro_frota, listar_editar_carros, pelos formulários de OS/manutenção (opcoes)
+e pela API. Última manutenção, OS abertas e custo no ano vêm de `veiculo_resumo` (triggers);
+o km atual, de `leituras_atual` (services.leituras).
+"""
+import csv
+import io
+import os
+import re
+from typing import Optional
+
+import pandas as pd
+
+import veiculo_resumo
+from db import get_conn, run_write, select_page, table_columns
+from services import ErroValidacao, leituras
+from services.manutencoes import money_fmt
+
+TABLE     = "veiculos"
+FOTOS_DIR = "fotos_frota"
+
+# colunas exibidas/exportadas na listagem (na ordem da tela) -> rótulo
+LIST_COLS = {
+    "num_frota": "Nº da Frota",
+    "placa": "Placa",
+    "modelo": "Modelo",
+    "marca": "Marca",
+    "ano_fabricacao": "Ano de Fabricação",
+    "classe_mecanica": "Classe Mecânica",
+    "classe_operacional": "Classe Operacional",
+    "chassi": "Chassi (VIN)",
+    "status": "Status",
+}
+
+# colunas editáveis na tela de listar/editar
+COLS_REQUIRED = ["id", "placa", "modelo", "ano", "marca", "status", "criado_em"]
+COLS_OPTIONAL = ["num_frota", "ano_fabricacao", "chassi", "classe_mecanica", "classe_operacional"]
+COLS = COLS_REQUIRED + COLS_OPTIONAL
+
+# ========= Validações =========
+_PLACA_LEGADO   = re.compile(r"^[A-Z]{3}\d{4}$")         # AAA1234
+_PLACA_MERCOSUL = re.compile(r"^[A-Z]{3}\d[A-Z]\d{2}$")  # ABC1D23
+_CHASSI_RE      = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")   # sem I,O,Q
+
+def validar_placa(placa: str) -> bool:
+    if not placa or len(placa) != 7:
+        return False
+    placa = placa.upper()
+    return bool(_PLACA_LEGADO.match(placa) or _PLACA_MERCOSUL.match(placa))
+
+def validar_chassi(chassi: str) -> bool:
+    if not chassi:
+        return True  # opcional
+    c = chassi.replace(" ", "").upper()
+    return bool(_CHASSI_RE.match(c))
+
+def coerce_ano(v) -> int | None:
+    try:
+        iv = int(v)
+    except Exception:
+        return None
+    return iv if 1980 <= iv <= 2100 else None
+
+def _normalize_str(s: str, upper=False) -> str:
+    if s is None:
+        return ""
+    s = str(s).strip()
+    return s.upper() if upper else s
+
+def normalizar(dados: dict) -> dict:
+    """Campos do cadastro -> payload gravado (maiúsculas, chassi sem espaços, status minúsculo)."""
+    return {
+        "num_frota": _normalize_str(dados.get("num_frota"), upper=True),
+        "classe_mecanica": _normalize_str(dados.get("classe_mecanica")),
+        "classe_operacional": _normalize_str(dados.get("classe_operacional")),
+        "placa": _normalize_str(dados.get("placa"), upper=True),
+        "modelo": _normalize_str(dados.get("modelo")),
+        "marca": _normalize_str(dados.get("marca"), upper=True),
+        "ano_fabricacao": coerce_ano(dados.get("ano_fabricacao")),
+        "chassi": _normalize_str(dados.get("chassi"), upper=True).replace(" ", ""),
+        "status": _normalize_str(dados.get("status") or "ativo").lower(),  # casa com default 'ativo'
+    }
+
+def validar(dados: dict, payload: dict) -> list:
+    """Mensagens de erro do cadastro (lista vazia = ok). `dados` é o bruto, `payload` o normalizado."""
+    erros = []
+    if not payload["num_frota"] and not payload["placa"]:
+        erros.append("Informe pelo menos Nº da Frota ou Placa.")
+    if payload["placa"] and not validar_placa(payload["placa"]):
+        erros.append("Placa inválida. Use formato AAA1234 (antigo) ou ABC1D23 (Mercosul).")
+    if payload["chassi"] and not validar_chassi(payload["chassi"]):
+        erros.append("Chassi inválido. Deve ter 17 caracteres alfanuméricos (sem I, O, Q).")
+    if dados.get("ano_fabricacao") and payload["ano_fabricacao"] is None:
+        erros.append("Ano de Fabricação fora do intervalo permitido (1980–2100).")
+    return erros
+
+# ========= Persistência =========
+def salvar_veiculo(dados: dict, foto: Optional[bytes] = None) -> dict:
+    """
+    Cria ou atualiza o veículo (chave: num_frota, ou placa sem nº de frota) e grava a foto
+    em FOTOS_DIR/<placa>.jpg. Dados inválidos -> ErroValidacao. Retorna o payload gravado.
+    """
+    payload = normalizar(dados)
+    erros = validar(dados, payload)
+    if erros:
+        raise ErroValidacao(erros)
+
+    upsert_key = "num_frota" if payload["num_frota"] else "placa"
+    cols = ", ".join(payload.keys())
+    qs   = ", ".join(["?"] * len(payload))
+    set_clause = ", ".join([f"{k}=excluded.{k}" for k in payload.keys() if k != upsert_key])
+    sql = f"""
+        INSERT INTO {TABLE} ({cols}) VALUES ({qs})
+        ON CONFLICT({upsert_key}) DO UPDATE SET {set_clause};
+    """
+    run_write(lambda c: c.execute(sql, list(payload.values())))  # BEGIN IMMEDIATE + retry se ocupado
+    if foto and payload["placa"]:
+        os.makedirs(FOTOS_DIR, exist_ok=True)
+        with open(os.path.join(FOTOS_DIR, f"{payload['placa']}.jpg"), "wb") as f:
+            f.write(foto)
+    return payload
+
+def colunas_presentes() -> list:
+    """Colunas de COLS existentes na tabela (RuntimeError se faltar alguma obrigatória)."""
+    with get_conn() as conn:
+        existentes = table_columns(conn, TABLE)
+    miss = [c for c in COLS_REQUIRED if c not in existentes]
+    if miss:
+        raise RuntimeError(f"Tabela `{TABLE}` não tem as colunas obrigatórias: {', '.join(miss)}")
+    return [c for c in COLS if c in existentes]
+
+def buscar(vid: int, cols_present) -> Optional[dict]:
+    with get_conn() as conn:
+        row = conn.execute(f"SELECT {', '.join(cols_present)} FROM {TABLE} WHERE id = ?", (vid,)).fetchone()
+    return dict(zip(cols_present, row)) if row else None
+
+def atualizar(vid: int, data: dict, cols_present) -> None:
+    settable = [c for c in cols_present if c not in ("id", "criado_em")]
+    parts, params = [], []
+    for c in settable:
+        if c in data: parts.append(f"{c} = ?"); params.append(data[c])
+    if not parts: return
+    sql = f"UPDATE {TABLE} SET {', '.join(parts)} WHERE id = ?"
+    params.append(vid)
+    run_write(lambda c: c.execute(sql, params))  # BEGIN IMMEDIATE + retry se ocupado
+
+def excluir(vid: int) -> None:
+    run_write(lambda c: c.execute(f"DELETE FROM {TABLE} WHERE id = ?", (vid,)))
+
+# ========= Listagens =========
+def listar_veiculos(filtros: dict, page: int = 1, per_page=50, colunas=None):
+    """
+    Página da frota só com as colunas de `colunas` (padrão: LIST_COLS), filtros no SQL.
+    filtros: num_frota/classe_mecanica/classe_operacional/marca/placa (contém), status (igual).
+    Retorna (DataFrame com rótulos da tela, total de linhas do filtro).
+    """
+    cols, rows, total = select_page(
+        TABLE, list(colunas or LIST_COLS),
+        contains={k: filtros.get(k) for k in ("num_frota", "classe_mecanica", "classe_operacional", "marca", "placa")},
+        equals={"status": filtros.get("status")},
+        page=page, per_page=per_page,
+    )
+    df = pd.DataFrame.from_records(rows, columns=cols)
+    return df.rename(columns={k: v for k, v in LIST_COLS.items() if k in df.columns}), total
+
+def listar_resumo(filtro: str = "", placa: str = ""):
+    """
+    (colunas, linhas) de id/placa/modelo/ano/marca/status + última manutenção, OS abertas,
+    custo no ano e última leitura, por placa; mesmos filtros de pagina_resumo (exportação).
+    """
+    veiculo_resumo.ensure_schema()
+    leituras.ensure_schema()
+    base = (f"SELECT v.id, v.placa, v.modelo, v.ano, v.marca, v.status, {veiculo_resumo.COLUNAS}, {leituras.COLUNAS} "
+            f"FROM {TABLE} v {veiculo_resumo.JUNCAO} {leituras.JUNCAO}")
+    with get_conn() as conn:
+        if placa:
+            cur = conn.execute(base + " WHERE v.placa = ?", (placa,))
+        elif filtro:
+            cur = conn.execute(base + " WHERE v.placa LIKE ? ORDER BY v.placa", (f"%{filtro}%",))
+        else:
+            cur = conn.execute(base + " ORDER BY v.placa")
+        return [d[0] for d in cur.description], cur.fetchall()
+
+def pagina_resumo(filtro: str = "", placa: str = "", page: int = 1, per_page: int = 25):
+    """
+    Uma página de listar_resumo: id/placa/modelo/ano/marca/status via select_page (filtro
+    por placa contém, ou `placa` exata) e o resumo/km só dos veículos da página.
+    Retorna (colunas, linhas, total do filtro).
+    """
+    cols, rows, total = select_page(
+        TABLE, ["id", "placa", "modelo", "ano", "marca", "status"],
+        contains={"placa": filtro}, equals={"placa": placa},
+        order_by="placa", page=page, per_page=per_page, read=False,
+    )
+    if not rows:
+        return cols, rows, total
+    veiculo_resumo.ensure_schema()
+    leituras.ensure_schema()
+    ids = [r[0] for r in rows]
+    with get_conn() as conn:
+        cur = conn.execute(
+            f"SELECT v.id, {veiculo_resumo.COLUNAS}, {leituras.COLUNAS} "
+            f"FROM {TABLE} v {veiculo_resumo.JUNCAO} {leituras.JUNCAO} "
+            f"WHERE v.id IN ({', '.join('?' * len(ids))})", ids)
+        extra_cols = [d[0] for d in cur.description][1:]
+        extra = {r[0]: tuple(r[1:]) for r in cur.fetchall()}
+    vazio = (None,) * len(extra_cols)
+    return cols + extra_cols, [tuple(r) + extra.get(r[0], vazio) for r in rows], total
+
+def rotulos_placa() -> list:
+    """[(placa, "PLACA — modelo · marca")] da frota, por placa (autocomplete da listagem)."""
+    _, rows, _ = select_page(TABLE, ["placa", "modelo", "marca"], order_by="placa", per_page=None, read=False)
+    return [(p, f"{p.upper()} — {m or ''}{(' · ' + ma) if ma else ''}") for p, m, ma in rows if p]
+
+def resumo_label(d) -> str:
+    """"últ. manut. 12/05/2025 · 2 OS abertas · R$ 1.234,56 no ano · 48.350 km" (partes vazias omitidas)."""
+    partes = []
+    if d["ultima_manutencao"]:
+        partes.append("últ. manut. " + "/".join(reversed(d["ultima_manutencao"].split("-"))))
+    if d["os_abertas"]:
+        partes.append(f"{d['os_abertas']} OS aberta{'s' if d['os_abertas'] > 1 else ''}")
+    if d["custo_ano"]:
+        partes.append(f"{money_fmt(d['custo_ano'])} no ano")
+    if d["km_atual"] is not None:
+        partes.append(f"{d['km_atual']:,.0f} km".replace(",", "."))
+    return " · ".join(partes)
+
+def csv_resumo(cols, rows) -> bytes:
+    wanted = [c for c in ["placa","modelo","marca","ano","status","num_frota","chassi",
+                          "ultima_manutencao","os_abertas","custo_ano",
+                          "km_atual","km_em","horas_atual"] if c in cols]
+    buf = io.StringIO(); w = csv.writer(buf); w.writerow(wanted)
+    for r in rows:
+        d = dict(zip(cols, r)); w.writerow([d.get(c, "") for c in wanted])
+    return buf.getvalue().encode("utf-8-sig")
+
+def valores(coluna: str) -> list:
+    """Valores distintos e não vazios de `coluna` (de LIST_COLS) na frota, em ordem (seletores)."""
+    if coluna not in LIST_COLS:
+        raise ValueError(f"Coluna não listável: {coluna}")
+    with get_conn() as conn:
+        return [r[0] for r in conn.execute(
+            f"SELECT DISTINCT {coluna} FROM {TABLE} WHERE COALESCE({coluna}, '') <> '' ORDER BY 1"
+        )]
+
+def opcoes() -> list:
+    """
+    Veículos para os seletores dos formulários: [{id, placa, label}] por nº de frota/placa;
+    o label traz o resumo (última manutenção, OS abertas, custo no ano, km atual).
+    """
+    veiculo_resumo.ensure_schema()
+    leituras.ensure_schema()
+    with get_conn() as conn:
+        rows = conn.execute(f"""
+            SELECT v.id, v.num_frota, v.placa, v.modelo, v.marca, {veiculo_resumo.COLUNAS}, {leituras.COLUNAS}
+            FROM veiculos v {veiculo_resumo.JUNCAO} {leituras.JUNCAO}
+            ORDER BY COALESCE(v.num_frota, v.placa)
+        """).fetchall()
+    out = []
+    for r in rows:
+        label = f"{r['num_frota'] or '--'} · {r['placa'] or '--'} · {r['marca'] or ''} {r['modelo'] or ''}".strip()
+        resumo = resumo_label(r)
+        out.append({"id": r["id"], "placa": r["placa"], "label": f"{label} — {resumo}" if resumo else label})
+    return out
@@ -0,0 +1,244 @@
+# sla_os.py
+"""
+Métricas de SLA das ordens de serviço, mantidas por triggers em `ordens_servico`:
+
+- `sla_mensal`: por mês de liberação × prioridade × veículo, OS fechadas, dias em oficina
+  (liberação - abertura), quantas tinham previsão, quantas saíram depois dela e os dias de
+  atraso somados. Cada INSERT/UPDATE/DELETE de OS aplica só o delta da própria linha
+  (subtrai a versão antiga, soma a nova);
+- `sla_abertas`: espelho das OS ainda sem liberação, base do aging por prioridade (o
+  envelhecimento depende do dia de hoje, então é agrupado na consulta).
+
+Quando os triggers ainda não existem no banco as duas tabelas são (re)preenchidas a partir
+das OS existentes; `reconstruir()` refaz tudo do zero.
+
+Uso:
+    sla_os.resumo(de="2025-01-01")       # KPIs do período
+    sla_os.aging()                       # OS abertas por prioridade e faixa de dias
+"""
+from datetime import date
+from typing import Optional
+
+import pandas as pd
+
+from config import DB_PATH
+from db import get_conn, run_write
+
+TABLE = "sla_mensal"
+ABERTAS = "sla_abertas"
+FAIXAS = [(0, 2, "0-2 dias"), (3, 7, "3-7 dias"), (8, 15, "8-15 dias"), (16, 30, "16-30 dias"), (31, None, "> 30 dias")]
+
+# fechada = tem abertura e liberação válidas; aberta = sem liberação, nem fechada nem rascunho
+_FECHADA = "{p}data_liberacao IS NOT NULL AND julianday({p}data_liberacao) IS NOT NULL AND julianday({p}data_abertura) IS NOT NULL"
+_ABERTA = "{p}data_liberacao IS NULL AND LOWER(COALESCE({p}status, '')) NOT IN ('fechada', 'rascunho')"
+_DIAS = "MAX(julianday({p}data_liberacao) - julianday({p}data_abertura), 0)"
+_COM_PREV = "(julianday({p}previsao_saida) IS NOT NULL)"
+_ATRASO = "MAX(COALESCE(julianday({p}data_liberacao) - julianday({p}previsao_saida), 0), 0)"
+
+def _delta(p: str, sinal: str) -> str:
+    """UPSERT que soma (sinal '+') ou subtrai ('-') a contribuição da linha `p` (NEW./OLD./o.)."""
+    f = {"p": p}
+    return f"""
+        INSERT INTO {TABLE} (mes, prioridade, veiculo_id, placa, fechadas, dias_oficina, com_previsao, atrasadas, dias_atraso)
+        SELECT strftime('%Y-%m', {p}data_liberacao), COALESCE({p}prioridade, ''), COALESCE({p}veiculo_id, 0),
+               COALESCE({p}placa, ''),
+               {sinal}1, {sinal}{_DIAS.format(**f)}, {sinal}{_COM_PREV.format(**f)},
+               {sinal}({_ATRASO.format(**f)} > 0), {sinal}{_ATRASO.format(**f)}
+        WHERE {_FECHADA.format(**f)}
+        ON CONFLICT(mes, prioridade, veiculo_id) DO UPDATE SET
+            placa = excluded.placa,
+            fechadas = fechadas + excluded.fechadas,
+            dias_oficina = dias_oficina + excluded.dias_oficina,
+            com_previsao = com_previsao + excluded.com_previsao,
+            atrasadas = atrasadas + excluded.atrasadas,
+            dias_atraso = dias_atraso + excluded.dias_atraso;
+    """
+
+def _aberta(p: str) -> str:
+    return f"""
+        INSERT OR REPLACE INTO {ABERTAS} (os_id, veiculo_id, placa, prioridade, data_abertura, previsao_saida)
+        SELECT {p}id, {p}veiculo_id, {p}placa, COALESCE({p}prioridade, ''), {p}data_abertura, {p}previsao_saida
+        WHERE {_ABERTA.format(p=p)};
+    """
+
+_schema_ready: set = set()
+
+def _ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        # sem o trigger (banco novo ou ordens_servico recriada numa migração) as tabelas
+        # podem estar defasadas: recarrega tudo depois de criar. Triggers de antes das OS
+        # "rascunho" (preventiva) as contavam como abertas: são recriados também.
+        gatilho = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_sla_os_ins';"
+        ).fetchone()
+        novo = gatilho is None or "rascunho" not in gatilho[0]
+        if novo:
+            conn.executescript("""
+            DROP TRIGGER IF EXISTS trg_sla_os_ins;
+            DROP TRIGGER IF EXISTS trg_sla_os_del;
+            DROP TRIGGER IF EXISTS trg_sla_os_upd;
+            """)
+        conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            mes TEXT NOT NULL,              -- aaaa-mm da liberação
+            prioridade TEXT NOT NULL,
+            veiculo_id INTEGER NOT NULL,    -- 0 = OS sem veículo
+            placa TEXT NOT NULL,
+            fechadas INTEGER NOT NULL,
+            dias_oficina REAL NOT NULL,
+            com_previsao INTEGER NOT NULL,
+            atrasadas INTEGER NOT NULL,
+            dias_atraso REAL NOT NULL,
+            PRIMARY KEY (mes, prioridade, veiculo_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS {ABERTAS} (
+            os_id INTEGER PRIMARY KEY,
+            veiculo_id INTEGER,
+            placa TEXT,
+            prioridade TEXT NOT NULL,
+            data_abertura TEXT,
+            previsao_saida TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_sla_abertas_prioridade ON {ABERTAS}(prioridade, data_abertura);
+
+        CREATE TRIGGER IF NOT EXISTS trg_sla_os_ins AFTER INSERT ON ordens_servico BEGIN
+            {_delta("NEW.", "+")}
+            {_aberta("NEW.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_sla_os_del AFTER DELETE ON ordens_servico BEGIN
+            {_delta("OLD.", "-")}
+            DELETE FROM {ABERTAS} WHERE os_id = OLD.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_sla_os_upd AFTER UPDATE ON ordens_servico BEGIN
+            {_delta("OLD.", "-")}
+            {_delta("NEW.", "+")}
+            DELETE FROM {ABERTAS} WHERE os_id = OLD.id;
+            {_aberta("NEW.")}
+        END;
+        """)
+        if novo:
+            conn.execute(f"DELETE FROM {TABLE};")
+            conn.execute(f"DELETE FROM {ABERTAS};")
+            _carregar(conn)
+    _schema_ready.add(str(DB_PATH))
+
+def _carregar(conn) -> None:
+    """Preenche as tabelas a partir de todas as OS (1ª vez no banco / reconstruir)."""
+    o = {"p": "o."}
+    conn.execute(f"""
+        INSERT INTO {TABLE} (mes, prioridade, veiculo_id, placa, fechadas, dias_oficina, com_previsao, atrasadas, dias_atraso)
+        SELECT strftime('%Y-%m', o.data_liberacao), COALESCE(o.prioridade, ''), COALESCE(o.veiculo_id, 0),
+               MAX(COALESCE(o.placa, '')), COUNT(*), SUM({_DIAS.format(**o)}), SUM({_COM_PREV.format(**o)}),
+               SUM({_ATRASO.format(**o)} > 0), SUM({_ATRASO.format(**o)})
+        FROM ordens_servico o
+        WHERE {_FECHADA.format(**o)}
+        GROUP BY 1, 2, 3;
+    """)
+    conn.execute(f"""
+        INSERT INTO {ABERTAS} (os_id, veiculo_id, placa, prioridade, data_abertura, previsao_saida)
+        SELECT o.id, o.veiculo_id, o.placa, COALESCE(o.prioridade, ''), o.data_abertura, o.previsao_saida
+        FROM ordens_servico o WHERE {_ABERTA.format(**o)};
+    """)
+
+def reconstruir() -> None:
+    """Recalcula as métricas a partir de `ordens_servico` (ex.: após carga feita com triggers desligados)."""
+    _ensure_schema()
+    def _tudo(conn):
+        conn.execute(f"DELETE FROM {TABLE};")
+        conn.execute(f"DELETE FROM {ABERTAS};")
+        _carregar(conn)
+    run_write(_tudo)
+
+def _where(de: Optional[str], ate: Optional[str], placa: str = "", col: str = "mes") -> tuple:
+    conds, params = ["fechadas <> 0"] if col == "mes" else [], []
+    if de:
+        conds.append(f"{col} >= ?"); params.append(de[:7] if col == "mes" else de)
+    if ate:
+        conds.append(f"{col} <= ?"); params.append(ate[:7] if col == "mes" else ate)
+    if placa:
+        conds.append("UPPER(placa) LIKE ?"); params.append(f"%{placa.strip().upper()}%")
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+def por_prioridade(de: Optional[str] = None, ate: Optional[str] = None, placa: str = "") -> pd.DataFrame:
+    """OS fechadas no período por prioridade: dias médios em oficina, % atrasadas e atraso médio."""
+    _ensure_schema()
+    where, params = _where(de, ate, placa)
+    with get_conn() as conn:
+        df = pd.read_sql(f"""
+            SELECT prioridade, SUM(fechadas) AS fechadas, SUM(dias_oficina) AS dias_oficina,
+                   SUM(com_previsao) AS com_previsao, SUM(atrasadas) AS atrasadas, SUM(dias_atraso) AS dias_atraso
+            FROM {TABLE}{where} GROUP BY prioridade ORDER BY prioridade
+        """, conn, params=params)
+    return _taxas(df)
+
+def _taxas(df: pd.DataFrame) -> pd.DataFrame:
+    df["dias_medios"] = (df["dias_oficina"] / df["fechadas"]).round(1)
+    df["pct_atraso"] = (100 * df["atrasadas"] / df["com_previsao"].where(df["com_previsao"] > 0)).round(1)
+    df["atraso_medio"] = (df["dias_atraso"] / df["atrasadas"].where(df["atrasadas"] > 0)).round(1)
+    return df
+
+def por_veiculo(de: Optional[str] = None, ate: Optional[str] = None, placa: str = "",
+                top: Optional[int] = 10, hoje: Optional[date] = None) -> pd.DataFrame:
+    """
+    Dias parados por veículo: OS fechadas no período + dias corridos das OS ainda abertas
+    (até `hoje`). Ordenado pelo total.
+    """
+    _ensure_schema()
+    hoje = (hoje or date.today()).isoformat()
+    where, params = _where(de, ate, placa)
+    where_ab, params_ab = _where(None, None, placa, col="data_abertura")
+    with get_conn() as conn:
+        fechadas = pd.read_sql(f"""
+            SELECT veiculo_id, MAX(placa) AS placa, SUM(fechadas) AS fechadas, SUM(dias_oficina) AS dias_oficina
+            FROM {TABLE}{where} GROUP BY veiculo_id
+        """, conn, params=params)
+        abertas = pd.read_sql(f"""
+            SELECT COALESCE(veiculo_id, 0) AS veiculo_id, MAX(COALESCE(placa, '')) AS placa, COUNT(*) AS abertas,
+                   SUM(MAX(julianday(?) - julianday(data_abertura), 0)) AS dias_em_aberto
+            FROM {ABERTAS}{where_ab} GROUP BY 1
+        """, conn, params=[hoje, *params_ab])
+    df = fechadas.merge(abertas, on="veiculo_id", how="outer", suffixes=("", "_ab"))
+    df["placa"] = df["placa"].fillna(df.pop("placa_ab"))
+    df = df.fillna({"fechadas": 0, "dias_oficina": 0, "abertas": 0, "dias_em_aberto": 0})
+    df["dias_parado"] = (df["dias_oficina"] + df["dias_em_aberto"]).round(1)
+    df = df[df["veiculo_id"] != 0].sort_values("dias_parado", ascending=False)
+    return df.head(top) if top else df
+
+def aging(hoje: Optional[date] = None, placa: str = "") -> pd.DataFrame:
+    """OS abertas por prioridade (linhas) e faixa de dias desde a abertura (colunas)."""
+    _ensure_schema()
+    hoje = (hoje or date.today()).isoformat()
+    casos = " ".join(
+        f"WHEN idade <= {ate} THEN '{rotulo}'" if ate is not None else f"ELSE '{rotulo}'"
+        for _, ate, rotulo in FAIXAS
+    )
+    where, params = _where(None, None, placa, col="data_abertura")
+    with get_conn() as conn:
+        df = pd.read_sql(f"""
+            SELECT prioridade, CASE {casos} END AS faixa, COUNT(*) AS qtd
+            FROM (SELECT prioridade, COALESCE(julianday(?) - julianday(data_abertura), 0) AS idade
+                  FROM {ABERTAS}{where})
+            GROUP BY 1, 2
+        """, conn, params=[hoje, *params])
+    rotulos = [r for _, _, r in FAIXAS]
+    if df.empty:
+        return pd.DataFrame(columns=rotulos)
+    tabela = df.pivot_table(index="prioridade", columns="faixa", values="qtd", aggfunc="sum", fill_value=0)
+    return tabela.reindex(columns=rotulos, fill_value=0)
+
+def resumo(de: Optional[str] = None, ate: Optional[str] = None, placa: str = "",
+           hoje: Optional[date] = None) -> dict:
+    """KPIs do período: fechadas, dias médios em oficina, % com atraso, atraso médio, abertas e abertas > 15 dias."""
+    tot = por_prioridade(de, ate, placa)[["fechadas", "dias_oficina", "com_previsao", "atrasadas", "dias_atraso"]].sum()
+    tot = _taxas(tot.to_frame().T.astype(float)).iloc[0]
+    faixas = aging(hoje, placa).sum()
+    return {
+        "fechadas": int(tot["fechadas"]),
+        "dias_medios": None if pd.isna(tot["dias_medios"]) else float(tot["dias_medios"]),
+        "pct_atraso": None if pd.isna(tot["pct_atraso"]) else float(tot["pct_atraso"]),
+        "atraso_medio": None if pd.isna(tot["atraso_medio"]) else float(tot["atraso_medio"]),
+        "abertas": int(faixas.sum()),
+        "abertas_15d": int(faixas[["16-30 dias", "> 30 dias"]].sum()) if not faixas.empty else 0,
+    }
@@ -0,0 +1,9 @@
+# tests/conftest.py
+# banco temporário: FROTA_DB_PATH precisa estar definido antes do primeiro import de config/db
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("FROTA_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="frota_test_"), "test.db"))
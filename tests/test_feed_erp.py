@@ -0,0 +1,27 @@
+# tests/test_feed_erp.py
+import pytest
+
+import db
+import feed_erp
+
+
+@pytest.fixture(scope="module", autouse=True)
+def banco():
+    db.bootstrap()
+
+@pytest.mark.parametrize("limite", [0, -1])
+def test_limite_invalido(limite):
+    with pytest.raises(ValueError):
+        feed_erp.pagina(limite=limite)
+
+def test_limite_invalido_na_linha_de_comando():
+    with pytest.raises(SystemExit):
+        feed_erp.main(["--limite", "0"])
+
+def test_pagina_respeita_o_limite():
+    with db.get_conn() as conn:
+        conn.executemany("INSERT INTO ordens_servico (num_os, descricao) VALUES (?, 'x');",
+                         [(f"T-{i}",) for i in range(5)])
+    registros, cursor, fim = feed_erp.pagina(tabelas=["ordens_servico"], limite=2)
+    assert len(registros) == 2 and not fim
+    assert cursor.startswith("carga:ordens_servico:")
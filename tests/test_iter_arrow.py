@@ -0,0 +1,51 @@
+# tests/test_iter_arrow.py
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import db
+
+
+@pytest.fixture
+def tabela():
+    with db.get_conn() as conn:
+        conn.execute("DROP TABLE IF EXISTS t_arrow;")
+        conn.execute("CREATE TABLE t_arrow (id INTEGER PRIMARY KEY, esparsa, misturada, numero);")
+    yield "t_arrow"
+    with db.get_conn() as conn:
+        conn.execute("DROP TABLE IF EXISTS t_arrow;")
+
+def _inserir(linhas):
+    with db.get_conn() as conn:
+        conn.executemany("INSERT INTO t_arrow (id, esparsa, misturada, numero) VALUES (?, ?, ?, ?);", linhas)
+
+def test_blocos_com_o_mesmo_schema(tabela):
+    # bloco 1: esparsa só NULL, misturada int, numero int; blocos seguintes: int, texto, float
+    _inserir([(1, None, 10, 1), (2, None, 20, 2),
+              (3, 7, "abc", 3.5), (4, None, 30, 4),
+              (5, 8, 40, 5), (6, None, "x", 6.25)])
+    lotes = list(db.iter_arrow(f"SELECT * FROM {tabela} ORDER BY id", size=2))
+    assert len(lotes) == 3
+    assert len({b.schema for b in lotes}) == 1
+    t = pa.Table.from_batches(lotes)
+    assert t.num_rows == 6
+    assert t.schema.field("esparsa").type == pa.int64()
+    assert t.schema.field("misturada").type == pa.string()
+    assert t.schema.field("numero").type == pa.float64()
+    assert t.column("esparsa").to_pylist() == [None, None, 7, None, 8, None]
+    assert t.column("misturada").to_pylist() == ["10", "20", "abc", "30", "40", "x"]
+
+def test_coluna_so_nula_vira_texto(tabela):
+    _inserir([(i, None, i, i) for i in range(1, 8)])
+    t = pa.Table.from_batches(db.iter_arrow(f"SELECT * FROM {tabela} ORDER BY id", size=1))
+    assert t.num_rows == 7
+    assert t.schema.field("esparsa").type == pa.string()
+
+def test_valor_incompativel_depois_do_schema(tabela):
+    # esparsa vira int64 no 1º bloco (já entregue); texto depois não cabe mais
+    _inserir([(1, 1, 1, 1), (2, "texto", 2, 2)])
+    with pytest.raises(ValueError):
+        list(db.iter_arrow(f"SELECT * FROM {tabela} ORDER BY id", size=1))
+
+def test_resultado_vazio(tabela):
+    assert list(db.iter_arrow(f"SELECT * FROM {tabela}")) == []
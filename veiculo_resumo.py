@@ -0,0 +1,174 @@
+# veiculo_resumo.py
+"""
+Resumo por veículo para seletores e listas da frota, mantido por triggers:
+
+- `veiculo_resumo`: última manutenção, nº de lançamentos e OS em aberto de cada veículo;
+- `veiculo_resumo_custos`: custo de manutenção por veículo × ano (o "no ano" da tela é a
+  linha do ano corrente, então a virada de ano não exige recálculo).
+
+INSERT/UPDATE/DELETE em `manutencoes` e `ordens_servico` aplicam só o delta da linha
+(subtrai a versão antiga, soma a nova). A última manutenção só é recalculada (pelo índice
+de veiculo_id) quando o lançamento removido/alterado era o mais recente.
+
+Quando os triggers ainda não existem no banco as tabelas são (re)preenchidas a partir dos
+lançamentos e OS existentes; `reconstruir()` refaz tudo do zero.
+
+Uso (quem lista `veiculos v`):
+    veiculo_resumo.ensure_schema()
+    f"SELECT v.id, v.placa, {veiculo_resumo.COLUNAS} FROM veiculos v {veiculo_resumo.JUNCAO}"
+"""
+from config import DB_PATH
+from db import get_conn, run_write
+
+TABLE = "veiculo_resumo"
+CUSTOS = "veiculo_resumo_custos"
+
+# colunas/junção para consultas sobre `veiculos v` (custo do ano corrente, 0 sem lançamentos)
+COLUNAS = ("r.ultima_manutencao, COALESCE(r.os_abertas, 0) AS os_abertas, "
+           "COALESCE(c.custo, 0) AS custo_ano")
+JUNCAO = (f"LEFT JOIN {TABLE} r ON r.veiculo_id = v.id "
+          f"LEFT JOIN {CUSTOS} c ON c.veiculo_id = v.id AND c.ano = strftime('%Y', 'now', 'localtime')")
+
+# mesmas regras do cubo de custos (ano da data, senão do mes) e do SLA (OS aberta; rascunho não conta)
+_ANO = "COALESCE(strftime('%Y', {p}data), strftime('%Y', {p}mes || '-01'))"
+_CUSTO = "COALESCE({p}vlr_peca, {p}qtd * {p}vlr_unitario, 0)"
+_ABERTA = "{p}data_liberacao IS NULL AND LOWER(COALESCE({p}status, '')) NOT IN ('fechada', 'rascunho')"
+
+def _man_soma(p: str) -> str:
+    f = {"p": p}
+    return f"""
+        INSERT INTO {TABLE} (veiculo_id, ultima_manutencao, manutencoes)
+        SELECT {p}veiculo_id, date({p}data), 1 WHERE {p}veiculo_id IS NOT NULL
+        ON CONFLICT(veiculo_id) DO UPDATE SET
+            manutencoes = manutencoes + 1,
+            ultima_manutencao = CASE WHEN ultima_manutencao IS NULL OR excluded.ultima_manutencao > ultima_manutencao
+                                     THEN excluded.ultima_manutencao ELSE ultima_manutencao END;
+        INSERT INTO {CUSTOS} (veiculo_id, ano, custo)
+        SELECT {p}veiculo_id, {_ANO.format(**f)}, {_CUSTO.format(**f)}
+        WHERE {p}veiculo_id IS NOT NULL AND {_ANO.format(**f)} IS NOT NULL
+        ON CONFLICT(veiculo_id, ano) DO UPDATE SET custo = custo + excluded.custo;
+    """
+
+def _man_subtrai(p: str) -> str:
+    # AFTER DELETE/UPDATE: o MAX já não enxerga a versão antiga da linha
+    f = {"p": p}
+    return f"""
+        UPDATE {TABLE} SET
+            manutencoes = manutencoes - 1,
+            ultima_manutencao = CASE WHEN ultima_manutencao = date({p}data)
+                THEN (SELECT MAX(date(m.data)) FROM manutencoes m WHERE m.veiculo_id = {p}veiculo_id)
+                ELSE ultima_manutencao END
+        WHERE veiculo_id = {p}veiculo_id;
+        UPDATE {CUSTOS} SET custo = custo - {_CUSTO.format(**f)}
+        WHERE veiculo_id = {p}veiculo_id AND ano = {_ANO.format(**f)};
+    """
+
+def _os_soma(p: str) -> str:
+    return f"""
+        INSERT INTO {TABLE} (veiculo_id, os_abertas)
+        SELECT {p}veiculo_id, 1 WHERE {p}veiculo_id IS NOT NULL AND {_ABERTA.format(p=p)}
+        ON CONFLICT(veiculo_id) DO UPDATE SET os_abertas = os_abertas + 1;
+    """
+
+def _os_subtrai(p: str) -> str:
+    return f"""
+        UPDATE {TABLE} SET os_abertas = os_abertas - 1
+        WHERE veiculo_id = {p}veiculo_id AND {_ABERTA.format(p=p)};
+    """
+
+_schema_ready: set = set()
+
+def ensure_schema():
+    if str(DB_PATH) in _schema_ready:
+        return
+    with get_conn() as conn:
+        # triggers de OS anteriores ao status "rascunho" contavam rascunhos como abertas
+        gatilho = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_resumo_os_ins';"
+        ).fetchone()
+        novo = gatilho is None or "rascunho" not in gatilho[0]
+        if novo:
+            conn.executescript("".join(
+                f"DROP TRIGGER IF EXISTS trg_resumo_{t};"
+                for t in ("man_ins", "man_del", "man_upd", "os_ins", "os_del", "os_upd", "veiculo_del")
+            ))
+        conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            veiculo_id INTEGER PRIMARY KEY,
+            ultima_manutencao TEXT,             -- aaaa-mm-dd
+            manutencoes INTEGER NOT NULL DEFAULT 0,
+            os_abertas INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS {CUSTOS} (
+            veiculo_id INTEGER NOT NULL,
+            ano TEXT NOT NULL,                  -- aaaa
+            custo REAL NOT NULL,
+            PRIMARY KEY (veiculo_id, ano)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS ix_manutencoes_veiculo ON manutencoes(veiculo_id);
+
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_man_ins AFTER INSERT ON manutencoes BEGIN
+            {_man_soma("NEW.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_man_del AFTER DELETE ON manutencoes BEGIN
+            {_man_subtrai("OLD.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_man_upd
+        AFTER UPDATE OF veiculo_id, data, mes, qtd, vlr_unitario, vlr_peca ON manutencoes BEGIN
+            {_man_subtrai("OLD.")}
+            {_man_soma("NEW.")}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_os_ins AFTER INSERT ON ordens_servico BEGIN
+            {_os_soma("NEW.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_os_del AFTER DELETE ON ordens_servico BEGIN
+            {_os_subtrai("OLD.")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_os_upd
+        AFTER UPDATE OF veiculo_id, status, data_liberacao ON ordens_servico BEGIN
+            {_os_subtrai("OLD.")}
+            {_os_soma("NEW.")}
+        END;
+
+        -- as exclusões em cascata dos lançamentos viram UPDATE sem linha (no-op)
+        CREATE TRIGGER IF NOT EXISTS trg_resumo_veiculo_del AFTER DELETE ON veiculos BEGIN
+            DELETE FROM {TABLE} WHERE veiculo_id = OLD.id;
+            DELETE FROM {CUSTOS} WHERE veiculo_id = OLD.id;
+        END;
+        """)
+        if novo:
+            conn.execute(f"DELETE FROM {TABLE};")
+            conn.execute(f"DELETE FROM {CUSTOS};")
+            _carregar(conn)
+    _schema_ready.add(str(DB_PATH))
+
+def _carregar(conn) -> None:
+    """Preenche as tabelas a partir de todos os lançamentos e OS (1ª vez no banco / reconstruir)."""
+    m, o = {"p": "m."}, {"p": "o."}
+    conn.execute(f"""
+        INSERT INTO {TABLE} (veiculo_id, ultima_manutencao, manutencoes)
+        SELECT m.veiculo_id, MAX(date(m.data)), COUNT(*)
+        FROM manutencoes m WHERE m.veiculo_id IS NOT NULL GROUP BY 1;
+    """)
+    conn.execute(f"""
+        INSERT INTO {TABLE} (veiculo_id, os_abertas)
+        SELECT o.veiculo_id, COUNT(*) FROM ordens_servico o
+        WHERE o.veiculo_id IS NOT NULL AND {_ABERTA.format(**o)} GROUP BY 1
+        ON CONFLICT(veiculo_id) DO UPDATE SET os_abertas = excluded.os_abertas;
+    """)
+    conn.execute(f"""
+        INSERT INTO {CUSTOS} (veiculo_id, ano, custo)
+        SELECT m.veiculo_id, {_ANO.format(**m)}, SUM({_CUSTO.format(**m)})
+        FROM manutencoes m
+        WHERE m.veiculo_id IS NOT NULL AND {_ANO.format(**m)} IS NOT NULL GROUP BY 1, 2;
+    """)
+
+def reconstruir() -> None:
+    """Recalcula o resumo a partir de `manutencoes` e `ordens_servico` (ex.: após carga com triggers desligados)."""
+    ensure_schema()
+    def _tudo(conn):
+        conn.execute(f"DELETE FROM {TABLE};")
+        conn.execute(f"DELETE FROM {CUSTOS};")
+        _carregar(conn)
+    run_write(_tudo)